@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+Image Batch Resizer Benchmark
+Відтворюваний бенчмарк рушія ресайзу на синтетичному наборі зображень
+
+Приклади:
+    python image-resizer-benchmark.py --quick
+    python image-resizer-benchmark.py --workers 1 2 4 8 --output before.json
+    python image-resizer-benchmark.py --compare before.json after.json
+    python image-resizer-benchmark.py --cover-sweep
+    python image-resizer-benchmark.py --numpy-sweep
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import PIL
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def load_engine():
+    """Завантажує рушій з image-resizer-script.py (ім'я файлу не є модулем Python)"""
+    if 'image_resizer' in sys.modules:
+        return sys.modules['image_resizer']
+    path = Path(__file__).with_name('image-resizer-script.py')
+    spec = importlib.util.spec_from_file_location('image_resizer', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['image_resizer'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+image_resizer = load_engine()
+
+
+# Синтетичний набір: (назва, ширина, висота, режим, формат)
+CORPUS = [
+    ('photo_1mp', 1280, 800, 'RGB', 'JPEG'),
+    ('photo_12mp', 4000, 3000, 'RGB', 'JPEG'),
+    ('photo_24mp', 6000, 4000, 'RGB', 'JPEG'),
+    ('photo_50mp', 8660, 5774, 'RGB', 'JPEG'),
+    ('portrait_12mp', 3000, 4000, 'RGB', 'JPEG'),
+    ('panorama_15mp', 9600, 1600, 'RGB', 'JPEG'),
+    ('logo_rgba_4mp', 2000, 2000, 'RGBA', 'PNG'),
+    ('palette_2mp', 1920, 1080, 'P', 'PNG'),
+    ('gray_8mp', 3264, 2448, 'L', 'TIFF'),
+    ('scan_12mp', 4000, 3000, 'RGB', 'TIFF'),
+    ('web_6mp', 3000, 2000, 'RGB', 'WEBP'),
+    ('sticker_rgba_3mp', 1500, 2000, 'RGBA', 'WEBP'),
+]
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'TIFF': '.tiff', 'WEBP': '.webp'}
+
+# Налаштування кодувача: назва -> аргументи ImageResizer
+ENCODERS = {
+    'high': {'encoder': 'high'},
+    'balanced': {'encoder': 'balanced'},
+    'fast': {'encoder': 'fast'},
+    'smallest': {'encoder': 'smallest'},
+    'webp': {'encoder': 'balanced', 'output_format': 'webp'},
+    'avif': {'encoder': 'balanced', 'output_format': 'avif'},
+    'png': {'encoder': 'balanced', 'output_format': 'png'},
+    'reference': {'encoder': 'high', 'reference_quality': True},
+}
+
+# Набір за замовчуванням (webp/avif/png - через --encoders)
+DEFAULT_ENCODERS = ['high', 'balanced', 'fast', 'smallest', 'reference']
+
+
+def noise_tile(seed: int, size: int = 256) -> Image.Image:
+    """Детермінована RGB плитка шуму (однакова на всіх машинах)"""
+    rng = random.Random(seed)
+    data = bytes(rng.getrandbits(8) for _ in range(size * size * 3))
+    return Image.frombytes('RGB', (size, size), data)
+
+
+def synth_image(width: int, height: int, mode: str, seed: int) -> Image.Image:
+    """
+    Синтетичне "фото": градієнти + дрібний шум + геометрія
+
+    Результат детермінований для однакових аргументів.
+    """
+    gradient = Image.linear_gradient('L')
+    radial = Image.radial_gradient('L')
+    base = Image.merge('RGB', (
+        gradient.resize((width, height)),
+        radial.resize((width, height)),
+        gradient.rotate(90).resize((width, height)),
+    ))
+
+    # Плитка шуму дає JPEG/PNG реалістичну кількість деталей
+    tile = noise_tile(seed)
+    noise = Image.new('RGB', (width, height))
+    for y in range(0, height, tile.height):
+        for x in range(0, width, tile.width):
+            noise.paste(tile, (x, y))
+    img = Image.blend(base, noise, 0.15)
+
+    if mode == 'RGBA':
+        alpha = radial.resize((width, height)).point(lambda v: 255 - v)
+        img.putalpha(alpha)
+    elif mode == 'P':
+        img = img.quantize(64)
+    elif mode == 'L':
+        img = img.convert('L')
+    return img
+
+
+def generate_corpus(folder: str, scale: float = 1.0) -> list:
+    """
+    Створює (або перевикористовує) синтетичний набір у папці
+
+    Args:
+        folder: Папка для набору
+        scale: Множник лінійних розмірів (0.25 - швидкий прогін)
+
+    Returns:
+        Список описів файлів (назва, розмір, режим, формат, байти)
+    """
+    Path(folder).mkdir(parents=True, exist_ok=True)
+    files = []
+    for seed, (name, width, height, mode, fmt) in enumerate(CORPUS):
+        width, height = max(16, int(width * scale)), max(16, int(height * scale))
+        path = os.path.join(folder, f"{name}_{width}x{height}{EXTENSIONS[fmt]}")
+        if not os.path.exists(path):
+            print(f"   🧪 {os.path.basename(path)}")
+            img = synth_image(width, height, mode, seed)
+            save_args = {'quality': 92} if fmt in ('JPEG', 'WEBP') else {}
+            img.save(path + '.tmp', fmt, **save_args)
+            os.replace(path + '.tmp', path)
+        files.append({
+            'path': path, 'width': width, 'height': height, 'mode': mode,
+            'format': fmt, 'bytes': os.path.getsize(path),
+        })
+    return files
+
+
+def max_process_rss_mb():
+    """
+    Пікова RSS найбільшого окремого процесу (бенчмарк або один воркер), MB
+
+    getrusage не сумує процеси: RUSAGE_CHILDREN - максимум серед дочірніх.
+    """
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux повертає KB, macOS - байти
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+class MemorySampler:
+    """
+    Пікова сумарна пам'ять процесу бенчмарку разом з воркерами пулу
+
+    Потік раз на INTERVAL секунд обходить /proc і сумує PSS (proportional set
+    size з /proc/<pid>/smaps_rollup) процесу та всіх його нащадків. На відміну
+    від RSS, PSS ділить спільні після fork сторінки (copy-on-write) між
+    процесами, тож сума не рахує одну сторінку кілька разів. Процес, що жив
+    коротше за INTERVAL, може не потрапити в замір.
+    """
+
+    INTERVAL = 0.05
+
+    def __init__(self, pid: int = None):
+        self.pid = pid or os.getpid()
+        self.peak = 0
+        self.available = os.path.exists(f"/proc/{self.pid}/smaps_rollup")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='memory-sampler', daemon=True)
+
+    @staticmethod
+    def _pss(pid: int) -> int:
+        """PSS процесу в байтах (0, якщо процес уже завершився)"""
+        try:
+            with open(f"/proc/{pid}/smaps_rollup", encoding='ascii') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    def tree(self) -> list:
+        """pid процесу та всіх його нащадків"""
+        children = {}
+        for name in os.listdir('/proc'):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat", encoding='ascii', errors='replace') as f:
+                    # Поле після "(ім'я)": стан, далі ppid
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            children.setdefault(ppid, []).append(int(name))
+        pids, pending = [], [self.pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            pending.extend(children.get(pid, ()))
+        return pids
+
+    def sample(self) -> int:
+        """Поточна сумарна PSS дерева процесів, байти"""
+        total = sum(self._pss(pid) for pid in self.tree())
+        self.peak = max(self.peak, total)
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.INTERVAL):
+            self.sample()
+
+    def __enter__(self):
+        if self.available:
+            self.sample()
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.available:
+            self._stop.set()
+            self._thread.join()
+
+    def peak_mb(self):
+        """Пік у MB (None без /proc/<pid>/smaps_rollup - не Linux або старе ядро)"""
+        return round(self.peak / 1024 ** 2, 1) if self.available else None
+
+
+def percentile(values: list, pct: float) -> float:
+    """Перцентиль (найближчий ранг)"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class BenchResizer(image_resizer.ImageResizer):
+    """ImageResizer, що віддає заміри файлів бенчмарку замість запису звіту"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bench_records = []
+
+    def save_profile_report(self, output_folder: str, slowest: int = 10, log=print):
+        self.bench_records.extend(self.take_profile_records())
+        return None
+
+
+def run_config(config: dict) -> dict:
+    """
+    Один прогін конфігурації (викликається в окремому процесі, щоб пікова
+    пам'ять не змішувалась між конфігураціями)
+
+    Набір проганяється через ImageResizer.process_folder - той самий шлях,
+    що й у консолі та GUI (PoolScheduler, preflight, бюджет пам'яті, таймаут),
+    тож цифри відповідають реальному запуску. Затримка файлу - сума стадій
+    з профілювання (без часу в черзі).
+    """
+    resizer = BenchResizer(config['width'], config['height'], profile=True,
+                           timeout=image_resizer.ImageResizer.DEFAULT_TIMEOUT,
+                           **ENCODERS[config['encoder']])
+    input_folder = tempfile.mkdtemp(prefix='resize-bench-in-')
+    output_folder = tempfile.mkdtemp(prefix='resize-bench-out-')
+    for copy in range(config['copies']):
+        for item in config['files']:
+            path = Path(item['path'])
+            link = os.path.join(input_folder, f"{path.stem}_{copy}{path.suffix}")
+            try:
+                os.link(item['path'], link)
+            except OSError:
+                shutil.copyfile(item['path'], link)
+    images = len(config['files']) * config['copies']
+
+    started = time.perf_counter()
+    with MemorySampler() as memory, contextlib.redirect_stdout(io.StringIO()):
+        _, errors = resizer.process_folder(input_folder, output_folder, config['mode'],
+                                           workers=config['workers'], incremental=False,
+                                           dedupe=False)
+    elapsed = time.perf_counter() - started
+
+    output_bytes = sum(f.stat().st_size for f in Path(output_folder).iterdir()
+                       if f.suffix == resizer.extension)
+    shutil.rmtree(input_folder, ignore_errors=True)
+    shutil.rmtree(output_folder, ignore_errors=True)
+
+    latencies = [sum(wall for wall, _ in record['stages'].values())
+                 for record in resizer.bench_records] or [0.0]
+    input_bytes = sum(item['bytes'] for item in config['files']) * config['copies']
+    return {
+        'mode': config['mode'],
+        'workers': config['workers'],
+        'encoder': config['encoder'],
+        'images': images,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'images_per_sec': round(images / elapsed, 2),
+        'mb_per_sec': round(input_bytes / elapsed / 1e6, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'peak_pss_mb': memory.peak_mb(),
+        'max_process_rss_mb': max_process_rss_mb(),
+        'output_bytes': output_bytes,
+    }
+
+
+# Пропорції джерела для --cover-sweep (чим далі від цілі, тим більше обрізається)
+SWEEP_RATIOS = [('1:1', 1.0), ('4:3', 4 / 3), ('16:9', 16 / 9), ('2:1', 2.0),
+                ('3:1', 3.0), ('3:4', 3 / 4), ('9:16', 9 / 16), ('1:3', 1 / 3)]
+
+
+def cover_sweep(width: int, height: int, scale: float = 1.0, repeats: int = 3) -> list:
+    """
+    Cover: ресемплінг лише видимої ділянки (box) проти ресайзу всього кадру + crop()
+
+    Для кожної пропорції джерела (~12 MP при scale 1.0) міряється лише стадія
+    ресайзу на вже декодованому зображенні - найкращий час з repeats прогонів.
+    """
+    resizer = image_resizer.ImageResizer(width, height)
+    target = (width, height)
+    pixels = 12e6 * scale * scale
+    results = []
+    for name, ratio in SWEEP_RATIOS:
+        src_width = int((pixels * ratio) ** 0.5)
+        src_height = int(src_width / ratio)
+        img = synth_image(src_width, src_height, 'RGB', seed=len(results))
+        new_size = resizer._scaled_size(src_width, src_height, True, target)
+
+        def crop_after():
+            return resizer._compose(resizer._resize(img, new_size), 'cover', target=target)
+
+        def crop_before():
+            return resizer.render(img, [new_size], [target], 'cover')[0]
+
+        timings = []
+        for func in (crop_after, crop_before):
+            best = float('inf')
+            for _ in range(repeats):
+                started = time.perf_counter()
+                func()
+                best = min(best, time.perf_counter() - started)
+            timings.append(best)
+        kept = (width / new_size[0]) * (height / new_size[1])
+        results.append({
+            'ratio': name,
+            'source': [src_width, src_height],
+            'kept_share': round(kept, 3),
+            'crop_after_ms': round(timings[0] * 1000, 1),
+            'crop_before_ms': round(timings[1] * 1000, 1),
+            'saving': round(1 - timings[1] / timings[0], 3),
+        })
+        print(f"✂️  {name:<5} {src_width}x{src_height:<6} у кадрі {kept * 100:>3.0f}%  "
+              f"resize+crop {timings[0] * 1000:>7.1f} мс → box {timings[1] * 1000:>7.1f} мс "
+              f"({-results[-1]['saving'] * 100:+.0f}%)")
+    return results
+
+
+# Геометрії джерела для --numpy-sweep: (назва, ширина, висота) при scale 1.0
+NUMPY_SOURCES = [('12MP 4:3', 4000, 3000), ('8MP 16:9', 3840, 2160), ('2MP 16:9', 1920, 1080)]
+NUMPY_GROUPS = [1, 4, 8, 16]
+
+
+def numpy_sweep(width: int, height: int, scale: float = 1.0, repeats: int = 3) -> list:
+    """
+    engine='numpy' проти Pillow: ресайз групи декодованих кадрів однакової геометрії
+
+    Міряється стадія ресайзу (для numpy - разом з копіюванням у стек і полями
+    contain) у швидкому режимі - найкращий час з repeats прогонів, мс на кадр.
+    max_diff - найбільша різниця з результатом Pillow, у рівнях.
+    """
+    import numpy as np
+
+    pillow = image_resizer.ImageResizer(width, height)
+    engine = image_resizer.ImageResizer(width, height, engine='numpy')
+    target = (width, height)
+    results = []
+    for name, src_width, src_height in NUMPY_SOURCES:
+        src_width, src_height = int(src_width * scale), int(src_height * scale)
+        frames = [synth_image(src_width, src_height, 'RGB', seed=i) for i in range(max(NUMPY_GROUPS))]
+        new_size = pillow._scaled_size(src_width, src_height, False, target)
+        expected = np.asarray(pillow.render(frames[0], [new_size], [target])[0], dtype=int)
+        for group in NUMPY_GROUPS:
+            images = frames[:group]
+            timings = []
+            for func in (lambda: [pillow.render(img, [new_size], [target]) for img in images],
+                         lambda: engine._render_stack(list(images), [new_size], [target],
+                                                      'contain', (0, 0, 0))):
+                best = float('inf')
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    output = func()
+                    best = min(best, time.perf_counter() - started)
+                timings.append(best / group)
+            max_diff = int(np.abs(output[0][0].astype(int) - expected).max())
+            results.append({
+                'source': name,
+                'size': [src_width, src_height],
+                'group': group,
+                'pillow_ms': round(timings[0] * 1000, 1),
+                'numpy_ms': round(timings[1] * 1000, 1),
+                'speedup': round(timings[0] / timings[1], 2),
+                'max_diff': max_diff,
+            })
+            print(f"🧮 {name:<9} x{group:<3} Pillow {timings[0] * 1000:>7.1f} мс/кадр → "
+                  f"numpy {timings[1] * 1000:>7.1f} мс/кадр ({timings[0] / timings[1]:.2f}x, "
+                  f"різниця ≤{max_diff})")
+    return results
+
+
+def git_commit() -> str:
+    """Короткий хеш поточного коміту (або 'unknown')"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def config_key(result: dict) -> tuple:
+    return result['mode'], result['workers'], result['encoder']
+
+
+def compare(old_path: str, new_path: str):
+    """Порівнює два файли результатів (швидкість і пам'ять по конфігураціях)"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    old_results = {config_key(r): r for r in old['results']}
+    print(f"📊 {old['meta']['commit']} → {new['meta']['commit']}")
+    print(f"{'режим':<8} {'проц.':>5} {'кодувач':<10} {'img/s':>14} {'p95, мс':>18} "
+          f"{'пам. Σ, MB':>14}")
+    for result in new['results']:
+        before = old_results.get(config_key(result))
+        if before is None:
+            continue
+        change = (result['images_per_sec'] / before['images_per_sec'] - 1) * 100
+        print(f"{result['mode']:<8} {result['workers']:>5} {result['encoder']:<10} "
+              f"{result['images_per_sec']:>7} ({change:+.0f}%) "
+              f"{before['p95_ms']:>8} → {result['p95_ms']:<8} "
+              f"{before.get('peak_pss_mb')} → {result.get('peak_pss_mb')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк рушія Image Batch Resizer")
+    parser.add_argument('--corpus', default=os.path.join(tempfile.gettempdir(), 'resize-bench-corpus'),
+                        help="Папка для синтетичного набору (перевикористовується)")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Множник розмірів зображень (1.0 - від 1 до 50 MP)")
+    parser.add_argument('--quick', action='store_true',
+                        help="Швидкий прогін: --scale 0.25, лише contain і high")
+    parser.add_argument('--copies', type=int, default=1, help="Скільки разів обробити набір")
+    parser.add_argument('--modes', nargs='+', default=['contain', 'cover'])
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument('--encoders', nargs='+', default=DEFAULT_ENCODERS, choices=list(ENCODERS))
+    parser.add_argument('--size', default='1280x720', help="Цільовий розмір WxH")
+    parser.add_argument('--output', help="Файл результатів (за замовчуванням benchmark-<коміт>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="Порівняти два файли результатів")
+    parser.add_argument('--cover-sweep', action='store_true',
+                        help="Лише cover: обрізання до ресемплінгу по різних пропорціях")
+    parser.add_argument('--numpy-sweep', action='store_true',
+                        help="Лише contain: engine='numpy' проти Pillow для груп кадрів")
+    parser.add_argument('--run-config', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_config:
+        print(json.dumps(run_config(json.loads(args.run_config))))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.quick:
+        args.scale = min(args.scale, 0.25)
+        args.modes = ['contain']
+        args.encoders = ['high']
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    commit = git_commit()
+
+    if args.cover_sweep:
+        results = cover_sweep(width, height, args.scale)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'meta': {'commit': commit, 'target': [width, height],
+                                    'scale': args.scale},
+                           'cover_sweep': results}, f, ensure_ascii=False, indent=2)
+        return
+    if args.numpy_sweep:
+        results = numpy_sweep(width, height, args.scale)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'meta': {'commit': commit, 'target': [width, height],
+                                    'scale': args.scale},
+                           'numpy_sweep': results}, f, ensure_ascii=False, indent=2)
+        return
+
+    print("🧪 Генеруємо набір...")
+    corpus_folder = os.path.join(args.corpus, f"scale-{args.scale:g}")
+    files = generate_corpus(corpus_folder, args.scale)
+
+    results = []
+    for mode in args.modes:
+        for workers in sorted(set(args.workers)):
+            for encoder in args.encoders:
+                config = {'mode': mode, 'workers': workers, 'encoder': encoder,
+                          'width': width, 'height': height, 'copies': args.copies,
+                          'files': files}
+                completed = subprocess.run(
+                    [sys.executable, __file__, '--run-config', json.dumps(config)],
+                    check=True, stdout=subprocess.PIPE, text=True
+                )
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+                results.append(result)
+                print(f"⏱️  {mode:<8} процесів {workers:<3} {encoder:<10} "
+                      f"{result['images_per_sec']:>7} img/s {result['mb_per_sec']:>7} MB/s "
+                      f"p50 {result['p50_ms']:>7} мс p95 {result['p95_ms']:>7} мс "
+                      f"пам. Σ {result['peak_pss_mb']} MB "
+                      f"(макс. процес {result['max_process_rss_mb']} MB)")
+
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'target': [width, height],
+            'scale': args.scale,
+            'copies': args.copies,
+            'corpus': [{k: v for k, v in item.items() if k != 'path'} for item in files],
+        },
+        'results': results,
+    }
+    output = args.output or f"benchmark-{commit}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Результати: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,32 +4,181 @@ Image Batch Resizer GUI
 Графічний інтерфейс для зміни розміру зображень
 """
 
+import importlib.util
+import itertools
 import os
+import queue
+import sys
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
 from pathlib import Path
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def load_engine():
+    """
+    Завантажує рушій з image-resizer-script.py
+    
+    Ім'я файлу містить дефіси, тому звичайний import неможливий.
+    Модуль реєструється як image_resizer, щоб його об'єкти можна було
+    передавати в процеси-воркери.
+    """
+    if 'image_resizer' in sys.modules:
+        return sys.modules['image_resizer']
+    path = Path(__file__).with_name('image-resizer-script.py')
+    spec = importlib.util.spec_from_file_location('image_resizer', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['image_resizer'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+image_resizer = load_engine()
+
+
+class ProxyCache:
+    """
+    LRU кеш зменшених копій (проксі) вхідних файлів для попереднього перегляду
+    
+    Оригінал декодується лише раз: JPEG одразу зменшеним (draft), інші
+    формати повністю, після чого зберігається копія не більша за PROXY_SIZE.
+    Ключ - (шлях, mtime, розмір файлу), тож змінений файл декодується заново.
+    Кеш обмежений сумарним розміром пікселів проксі в байтах; при
+    переповненні витісняються найдавніше переглянуті файли.
+    """
+    
+    # Найбільший розмір проксі (з запасом для перегляду до ~1000 px)
+    PROXY_SIZE = (1024, 1024)
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # ключ -> (проксі, розмір оригіналу)
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    @staticmethod
+    def _key(path):
+        st = os.stat(path)
+        return str(path), st.st_mtime_ns, st.st_size
+    
+    @staticmethod
+    def _size_of(img):
+        return img.width * img.height * len(img.getbands())
+    
+    def peek(self, path):
+        """(проксі, розмір оригіналу) з кешу або None - без декодування"""
+        try:
+            key = self._key(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+    
+    def get(self, path):
+        """
+        (проксі, розмір оригіналу); при промаху декодує файл
+        
+        Raises:
+            Exception: Файл не вдалося відкрити як зображення
+        """
+        entry = self.peek(path)
+        if entry is not None:
+            return entry
+        key = self._key(path)
+        entry = self.load(path)
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._entries[key] = entry
+                self.used += self._size_of(entry[0])
+            while self.used > self.max_bytes and len(self._entries) > 1:
+                _, (old, _) = self._entries.popitem(last=False)
+                self.used -= self._size_of(old)
+        return entry
+    
+    @classmethod
+    def load(cls, path):
+        """Декодує проксі: RGB, або RGBA для зображень з прозорістю"""
+        with image_resizer.open_image(path) as img:
+            original = img.size
+            # JPEG: декодування одразу в 1/2-1/8 розміру, не менше за PROXY_SIZE
+            img.draft(None, cls.PROXY_SIZE)
+            if img.mode in ('RGB', 'RGBA'):
+                proxy = img.copy()
+            else:
+                proxy = img.convert('RGBA' if img.mode in ('LA', 'P', 'PA') else 'RGB')
+        proxy.thumbnail(cls.PROXY_SIZE, Image.Resampling.LANCZOS,
+                        reducing_gap=image_resizer.ImageResizer.REDUCING_GAP)
+        return proxy, original
 
 
 class ImageResizerGUI:
+    # Як часто головний потік забирає події воркера (мс)
+    POLL_INTERVAL_MS = 100
+    # Скільки рядків тримати в лозі (старіші видаляються)
+    MAX_LOG_LINES = 2000
+    # Попередній перегляд: розмір панелі, затримка після зміни налаштувань (мс),
+    # кеш проксі (MB) і скільки файлів показувати у списку
+    PREVIEW_SIZE = (320, 240)
+    PREVIEW_DELAY_MS = 150
+    PREVIEW_CACHE_MB = 128
+    PREVIEW_FILES = 500
+    
     def __init__(self, root):
         self.root = root
         self.root.title("🖼️ Image Batch Resizer")
-        self.root.geometry("700x600")
+        self.root.geometry("1080x860")
         self.root.resizable(False, False)
         
         # Змінні
         self.input_folder = tk.StringVar()
         self.output_folder = tk.StringVar()
+        self.recursive = tk.BooleanVar(value=False)
+        self.include = tk.StringVar(value='')
+        self.exclude = tk.StringVar(value='')
         self.mode = tk.StringVar(value='contain')
+        self.anchor = tk.StringVar(value='center')
         self.bg_color = tk.StringVar(value='black')
         self.target_width = tk.IntVar(value=1280)
         self.target_height = tk.IntVar(value=720)
+        self.preset_vars = {name: tk.BooleanVar(value=False) for name in image_resizer.PRESETS}
+        self.profile = tk.BooleanVar(value=False)
+        self.reference_quality = tk.BooleanVar(value=False)
+        self.encoder = tk.StringVar(value='high')
+        self.output_format = tk.StringVar(value='jpeg')
+        self.max_kb = tk.StringVar(value='')
+        self.workers = tk.IntVar(value=os.cpu_count() or 1)
+        self.preview_file = tk.StringVar(value='')
+        
+        # Перегляд працює з проксі з кешу; декодування - в окремому потоці
+        self.proxy_cache = ProxyCache(self.PREVIEW_CACHE_MB * 1024 * 1024)
+        self.preview_loader = ThreadPoolExecutor(max_workers=1)
+        self._preview_job = None
+        self._files_job = None
+        self._preview_generation = 0
+        self._preview_photos = []  # PhotoImage мають жити, поки їх показують
         
         self.processing = False
+        # Воркер не чіпає Tk напряму: він кладе події в чергу,
+        # а головний потік забирає їх таймером (drain_events)
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
         
         self.setup_ui()
+        self.setup_preview()
     
     def setup_ui(self):
         """Створення інтерфейсу"""
@@ -49,7 +198,7 @@ class ImageResizerGUI:
         
         # Основний контейнер
         main_frame = tk.Frame(self.root, padx=20, pady=20)
-        main_frame.pack(fill='both', expand=True)
+        main_frame.pack(side='left', fill='both', expand=True)
         
         # Секція 1: Вибір папки
         folder_frame = ttk.LabelFrame(main_frame, text="📁 Папки", padding=15)
@@ -75,6 +224,26 @@ class ImageResizerGUI:
         output_btn = ttk.Button(folder_frame, text="Вибрати", command=self.select_output_folder)
         output_btn.grid(row=1, column=2, pady=5)
         
+        # Підпапки і фільтри
+        recursive_check = ttk.Checkbutton(
+            folder_frame,
+            text="Включно з підпапками (структура зберігається)",
+            variable=self.recursive
+        )
+        recursive_check.grid(row=2, column=1, sticky='w', padx=10, pady=5)
+        
+        filter_label = ttk.Label(folder_frame, text="Лише / крім:")
+        filter_label.grid(row=3, column=0, sticky='w', pady=5)
+        
+        filter_container = tk.Frame(folder_frame)
+        filter_container.grid(row=3, column=1, sticky='w', padx=10, pady=5)
+        
+        include_entry = ttk.Entry(filter_container, textvariable=self.include, width=22)
+        include_entry.pack(side='left', padx=(0, 10))
+        
+        exclude_entry = ttk.Entry(filter_container, textvariable=self.exclude, width=22)
+        exclude_entry.pack(side='left')
+        
         # Секція 2: Налаштування
         settings_frame = ttk.LabelFrame(main_frame, text="⚙️ Налаштування", padding=15)
         settings_frame.pack(fill='x', pady=(0, 15))
@@ -118,6 +287,15 @@ class ImageResizerGUI:
         )
         cover_radio.pack(side='left')
         
+        anchor_combo = ttk.Combobox(
+            mode_container,
+            textvariable=self.anchor,
+            values=list(image_resizer.ANCHORS),
+            state='readonly',
+            width=8
+        )
+        anchor_combo.pack(side='left', padx=(10, 0))
+        
         # Колір фону
         color_label = ttk.Label(settings_frame, text="Колір фону:")
         color_label.grid(row=2, column=0, sticky='w', pady=5)
@@ -131,6 +309,84 @@ class ImageResizerGUI:
         )
         color_combo.grid(row=2, column=1, sticky='w', pady=5)
         
+        # Пресети (кілька розмірів за одне декодування)
+        presets_label = ttk.Label(settings_frame, text="Пресети:")
+        presets_label.grid(row=3, column=0, sticky='nw', pady=5)
+        
+        presets_container = tk.Frame(settings_frame)
+        presets_container.grid(row=3, column=1, sticky='w', pady=5)
+        
+        for i, (name, (width, height)) in enumerate(image_resizer.PRESETS.items()):
+            preset_check = ttk.Checkbutton(
+                presets_container,
+                text=f"{name} {width}x{height}",
+                variable=self.preset_vars[name]
+            )
+            preset_check.grid(row=i // 3, column=i % 3, sticky='w', padx=(0, 10))
+        
+        # Формат і профіль кодувача
+        encoder_label = ttk.Label(settings_frame, text="Кодування:")
+        encoder_label.grid(row=4, column=0, sticky='w', pady=5)
+        
+        encoder_container = tk.Frame(settings_frame)
+        encoder_container.grid(row=4, column=1, sticky='w', pady=5)
+        
+        format_combo = ttk.Combobox(
+            encoder_container,
+            textvariable=self.output_format,
+            values=[name for name in image_resizer.OUTPUT_FORMATS
+                    if image_resizer.encoder_available(name)],
+            state='readonly',
+            width=8
+        )
+        format_combo.pack(side='left', padx=(0, 10))
+        
+        encoder_combo = ttk.Combobox(
+            encoder_container,
+            textvariable=self.encoder,
+            values=list(image_resizer.ENCODER_PROFILES),
+            state='readonly',
+            width=12
+        )
+        encoder_combo.pack(side='left')
+        
+        max_kb_label = ttk.Label(encoder_container, text="Макс. KB:")
+        max_kb_label.pack(side='left', padx=(10, 5))
+        
+        max_kb_entry = ttk.Entry(encoder_container, textvariable=self.max_kb, width=7)
+        max_kb_entry.pack(side='left')
+        
+        # Профілювання стадій і точний режим декодування
+        checks_container = ttk.Frame(settings_frame)
+        checks_container.grid(row=5, column=1, sticky='w', pady=5)
+        
+        profile_check = ttk.Checkbutton(
+            checks_container,
+            text="Заміряти стадії (звіт resize-profile.json)",
+            variable=self.profile
+        )
+        profile_check.pack(side='left')
+        
+        reference_check = ttk.Checkbutton(
+            checks_container,
+            text="Точний LANCZOS (повільніше, як до швидкого декодування)",
+            variable=self.reference_quality
+        )
+        reference_check.pack(side='left', padx=(10, 0))
+        
+        # Кількість процесів
+        workers_label = ttk.Label(settings_frame, text="Процесів:")
+        workers_label.grid(row=6, column=0, sticky='w', pady=5)
+        
+        workers_spin = ttk.Spinbox(
+            settings_frame,
+            from_=1,
+            to=os.cpu_count() or 1,
+            textvariable=self.workers,
+            width=5
+        )
+        workers_spin.grid(row=6, column=1, sticky='w', pady=5)
+        
         # Секція 3: Прогрес
         progress_frame = ttk.LabelFrame(main_frame, text="📊 Прогрес", padding=15)
         progress_frame.pack(fill='both', expand=True, pady=(0, 15))
@@ -157,6 +413,188 @@ class ImageResizerGUI:
             command=self.start_processing
         )
         self.start_btn.pack(fill='x')
+        
+        # Кнопка скасування (активна лише під час обробки)
+        self.cancel_btn = tk.Button(
+            main_frame,
+            text="⏹ СКАСУВАТИ",
+            font=('Arial', 10, 'bold'),
+            bg='#c0392b',
+            fg='white',
+            state='disabled',
+            command=self.cancel_processing
+        )
+        self.cancel_btn.pack(fill='x', pady=(5, 0))
+    
+    def setup_preview(self):
+        """Панель попереднього перегляду: вибраний файл до і після обробки"""
+        preview_frame = ttk.LabelFrame(self.root, text="🔍 Попередній перегляд", padding=15)
+        preview_frame.pack(side='right', fill='y', padx=(0, 20), pady=20)
+        
+        self.preview_combo = ttk.Combobox(
+            preview_frame,
+            textvariable=self.preview_file,
+            state='readonly',
+            width=40
+        )
+        self.preview_combo.pack(fill='x', pady=(0, 10))
+        
+        width, height = self.PREVIEW_SIZE
+        self.preview_canvases = []
+        for title in ("До:", "Після:"):
+            label = ttk.Label(preview_frame, text=title)
+            label.pack(anchor='w')
+            canvas = tk.Canvas(preview_frame, width=width, height=height,
+                               bg='#ecf0f1', highlightthickness=0)
+            canvas.pack(pady=(0, 10))
+            canvas.create_image(width // 2, height // 2, anchor='center', tags='image')
+            self.preview_canvases.append(canvas)
+        
+        self.preview_info = ttk.Label(preview_frame, text="Виберіть вхідну папку",
+                                      wraplength=width, justify='left')
+        self.preview_info.pack(anchor='w')
+        
+        # Будь-яка зміна налаштувань перемальовує перегляд (з затримкою)
+        for var in (self.target_width, self.target_height, self.mode, self.anchor,
+                    self.bg_color, self.preview_file, *self.preset_vars.values()):
+            var.trace_add('write', self.schedule_preview)
+        for var in (self.input_folder, self.output_folder, self.recursive,
+                    self.include, self.exclude):
+            var.trace_add('write', self.schedule_preview_files)
+    
+    def schedule_preview(self, *_):
+        """Перемалювати перегляд після паузи у змінах (не на кожну клавішу)"""
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+        self._preview_job = self.root.after(self.PREVIEW_DELAY_MS, self.update_preview)
+    
+    def schedule_preview_files(self, *_):
+        """Оновити список файлів перегляду після паузи у змінах папки чи фільтрів"""
+        if self._files_job is not None:
+            self.root.after_cancel(self._files_job)
+        self._files_job = self.root.after(self.PREVIEW_DELAY_MS, self.refresh_preview_files)
+    
+    def refresh_preview_files(self):
+        """Перші PREVIEW_FILES файлів вхідної папки (з тими самими фільтрами, що й обробка)"""
+        self._files_job = None
+        folder = self.input_folder.get()
+        files = []
+        if folder and os.path.isdir(folder):
+            output = self.output_folder.get()
+            found = image_resizer.iter_image_files(folder, self.recursive.get(),
+                                                   self.get_patterns(self.include),
+                                                   self.get_patterns(self.exclude),
+                                                   skip=[output] if output else None)
+            files = [os.path.relpath(str(path), folder)
+                     for path in itertools.islice(found, self.PREVIEW_FILES)]
+        self.preview_combo.config(values=files)
+        if self.preview_file.get() not in files:
+            self.preview_file.set(files[0] if files else '')
+        else:
+            self.schedule_preview()
+    
+    def preview_target(self):
+        """
+        Ціль перегляду: перший вибраний пресет або розмір з полів
+        
+        Returns:
+            ((ширина, висота), підпис)
+        
+        Raises:
+            ValueError: Розмір не є додатними числами
+        """
+        presets = self.get_presets()
+        if presets:
+            name, size = next(iter(presets.items()))
+            return size, name
+        try:
+            size = (int(self.target_width.get()), int(self.target_height.get()))
+        except tk.TclError as e:
+            raise ValueError(str(e))
+        if min(size) <= 0:
+            raise ValueError("розмір має бути більшим за 0")
+        return size, "розмір з полів"
+    
+    def update_preview(self):
+        """Перемальовує перегляд з проксі; при промаху кешу чекає на фонове декодування"""
+        self._preview_job = None
+        self._preview_generation += 1
+        name = self.preview_file.get()
+        if not name:
+            self.show_preview(None, None, "Виберіть вхідну папку з зображеннями")
+            return
+        path = os.path.join(self.input_folder.get(), name)
+        entry = self.proxy_cache.peek(path)
+        if entry is not None:
+            self.render_preview(entry)
+            return
+        self.preview_info.config(text=f"⏳ Декодування {name}...")
+        future = self.preview_loader.submit(self.proxy_cache.get, path)
+        self.root.after(self.POLL_INTERVAL_MS, self.wait_proxy, future,
+                        self._preview_generation)
+    
+    def wait_proxy(self, future, generation):
+        """Чекає на проксі з фонового потоку (Tk чіпаємо лише з головного)"""
+        if not future.done():
+            self.root.after(self.POLL_INTERVAL_MS, self.wait_proxy, future, generation)
+            return
+        if generation != self._preview_generation:
+            # Поки декодувалось, вибрали інший файл - проксі вже в кеші
+            return
+        try:
+            self.render_preview(future.result())
+        except Exception as e:
+            self.show_preview(None, None, f"❌ {e}")
+    
+    def render_preview(self, entry):
+        """Показує проксі і результат з поточними налаштуваннями"""
+        proxy, original = entry
+        try:
+            target, label = self.preview_target()
+        except ValueError as e:
+            self.show_preview(proxy, None, f"❌ Некоректний розмір: {e}")
+            return
+        mode = self.mode.get()
+        started = time.perf_counter()
+        result = self.render_proxy(proxy, target, mode, self.anchor.get(), self.get_bg_color())
+        elapsed = time.perf_counter() - started
+        cache = self.proxy_cache
+        self.show_preview(
+            proxy, result,
+            f"{original[0]}x{original[1]} → {target[0]}x{target[1]} ({label}), {mode}\n"
+            f"⚡ {elapsed * 1000:.1f} мс, кеш: {len(cache)} файлів, "
+            f"{cache.used / 1024 / 1024:.0f} MB"
+        )
+    
+    @classmethod
+    def render_proxy(cls, proxy, target, mode, anchor='center', bg_color=(0, 0, 0)):
+        """
+        Результат contain/cover для проксі в масштабі панелі перегляду
+        
+        Ціль пропорційно зменшується до PREVIEW_SIZE, а поля і обрізання
+        рахує той самий рушій, що й обробку, тож перегляд відрізняється від
+        результату лише масштабом.
+        """
+        scale = min(cls.PREVIEW_SIZE[0] / target[0], cls.PREVIEW_SIZE[1] / target[1], 1.0)
+        size = (max(1, round(target[0] * scale)), max(1, round(target[1] * scale)))
+        resizer = image_resizer.ImageResizer(*size, anchor=anchor)
+        img = resizer._to_rgb(proxy, mode, bg_color)
+        new_size = resizer._scaled_size(img.width, img.height, mode == 'cover')
+        return resizer.render(img, [new_size], None, mode, bg_color)[0]
+    
+    def show_preview(self, before, after, text):
+        """Виводить зображення "до" і "після" (None - порожньо) і підпис"""
+        self._preview_photos = []
+        for canvas, img in zip(self.preview_canvases, (before, after)):
+            photo = ''
+            if img is not None:
+                if img.width > self.PREVIEW_SIZE[0] or img.height > self.PREVIEW_SIZE[1]:
+                    img = img.copy()
+                    img.thumbnail(self.PREVIEW_SIZE, Image.Resampling.LANCZOS)
+                photo = ImageTk.PhotoImage(img)
+                self._preview_photos.append(photo)
+            canvas.itemconfig('image', image=photo)
+        self.preview_info.config(text=text)
     
     def select_input_folder(self):
         """Вибір вхідної папки"""
@@ -172,146 +610,205 @@ class ImageResizerGUI:
         if folder:
             self.output_folder.set(folder)
     
+    def post(self, kind, *args):
+        """Передати подію в головний потік (безпечно з будь-якого потоку)"""
+        self.events.put((kind,) + args)
+    
     def log(self, message):
-        """Додати повідомлення в лог"""
-        self.status_text.config(state='normal')
-        self.status_text.insert('end', message + '\n')
-        self.status_text.see('end')
-        self.status_text.config(state='disabled')
-        self.root.update()
+        """Додати повідомлення в лог (з'явиться при наступному drain_events)"""
+        self.post('log', message)
     
-    def resize_image(self, image_path, output_path):
-        """Зміна розміру одного зображення"""
-        try:
-            img = Image.open(image_path)
-            
-            # Конвертуємо в RGB
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            target_w = self.target_width.get()
-            target_h = self.target_height.get()
-            target_ratio = target_w / target_h
-            img_ratio = img.width / img.height
-            
-            if self.mode.get() == 'contain':
-                # Режим contain - зберігаємо все зображення
-                if img_ratio > target_ratio:
-                    new_width = target_w
-                    new_height = int(target_w / img_ratio)
-                else:
-                    new_height = target_h
-                    new_width = int(target_h * img_ratio)
-                
-                img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                # Колір фону
-                bg_colors = {
-                    'black': (0, 0, 0),
-                    'white': (255, 255, 255),
-                    'gray': (128, 128, 128)
-                }
-                bg = bg_colors.get(self.bg_color.get(), (0, 0, 0))
-                
-                new_img = Image.new('RGB', (target_w, target_h), bg)
-                paste_x = (target_w - new_width) // 2
-                paste_y = (target_h - new_height) // 2
-                new_img.paste(img_resized, (paste_x, paste_y))
-                
+    def drain_events(self):
+        """
+        Забирає всі накопичені події воркера в головному потоці
+        
+        Рядки логу додаються одним вставлянням, а з оновлень прогресу
+        застосовується лише останнє - один перемальовування на інтервал,
+        а не два на кожен файл.
+        """
+        lines = []
+        progress = None
+        finished = None
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event[0]
+            if kind == 'log':
+                lines.append(event[1])
+            elif kind == 'progress':
+                progress = event[1:]
+            elif kind == 'done':
+                finished = event[1:]
+        
+        if lines:
+            self.status_text.config(state='normal')
+            self.status_text.insert('end', '\n'.join(lines) + '\n')
+            extra = int(self.status_text.index('end-1c').split('.')[0]) - self.MAX_LOG_LINES
+            if extra > 0:
+                self.status_text.delete('1.0', f'{extra + 1}.0')
+            self.status_text.see('end')
+            self.status_text.config(state='disabled')
+        if progress is not None:
+            value, maximum = progress
+            if maximum:
+                self.progress.config(mode='determinate', maximum=maximum, value=value)
             else:
-                # Режим cover - заповнюємо весь кадр
-                if img_ratio > target_ratio:
-                    new_height = target_h
-                    new_width = int(target_h * img_ratio)
-                else:
-                    new_width = target_w
-                    new_height = int(target_w / img_ratio)
-                
-                img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                left = (new_width - target_w) // 2
-                top = (new_height - target_h) // 2
-                new_img = img_resized.crop((left, top, left + target_w, top + target_h))
-            
-            # Зберігаємо
-            new_img.save(output_path, 'JPEG', quality=95, optimize=True)
-            return True
-            
+                # Кількість файлів ще невідома (обхід підпапок) - лише "пульс"
+                self.progress.config(mode='indeterminate')
+                self.progress.step()
+        
+        if finished is not None:
+            self.finish_processing(*finished)
+        elif self.processing:
+            self.root.after(self.POLL_INTERVAL_MS, self.drain_events)
+    
+    def finish_processing(self, level, title, message):
+        """Повертає інтерфейс у початковий стан після завершення воркера"""
+        self.processing = False
+        self.start_btn.config(state='normal', text="🚀 ОБРОБИТИ ЗОБРАЖЕННЯ")
+        self.cancel_btn.config(state='disabled', text="⏹ СКАСУВАТИ")
+        if level == 'error':
+            messagebox.showerror(title, message)
+        elif level == 'warning':
+            messagebox.showwarning(title, message)
+        else:
+            messagebox.showinfo(title, message)
+    
+    def get_bg_color(self):
+        """Колір фону як RGB кортеж"""
+        bg_colors = {
+            'black': (0, 0, 0),
+            'white': (255, 255, 255),
+            'gray': (128, 128, 128)
+        }
+        return bg_colors.get(self.bg_color.get(), (0, 0, 0))
+    
+    def get_presets(self):
+        """Вибрані пресети {назва: (ширина, висота)} або None"""
+        selected = {
+            name: size for name, size in image_resizer.PRESETS.items()
+            if self.preset_vars[name].get()
+        }
+        return selected or None
+    
+    @staticmethod
+    def get_patterns(var):
+        """Glob-шаблони з поля (через кому) або None"""
+        return [p.strip() for p in var.get().split(',') if p.strip()] or None
+    
+    def get_max_bytes(self):
+        """Ліміт розміру файлу в байтах (None - без обмеження)"""
+        value = self.max_kb.get().strip()
+        if value.isdigit() and int(value) > 0:
+            return int(value) * 1024
+        return None
+    
+    def make_resizer(self):
+        """Ресайзер з поточними налаштуваннями"""
+        return image_resizer.ImageResizer(self.target_width.get(), self.target_height.get(),
+                                          reference_quality=self.reference_quality.get(),
+                                          profile=self.profile.get(),
+                                          encoder=self.encoder.get(),
+                                          output_format=self.output_format.get(),
+                                          max_bytes=self.get_max_bytes(),
+                                          anchor=self.anchor.get(),
+                                          timeout=image_resizer.ImageResizer.DEFAULT_TIMEOUT)
+    
+    def process_images(self, input_dir, output_dir, resizer, mode, bg_color, presets, workers,
+                       recursive=False, include=None, exclude=None):
+        """
+        Обробка зображень (виконується у фоновому потоці)
+        
+        Налаштування читаються з Tk-змінних заздалегідь у головному потоці,
+        а все, що треба показати, передається через post(). Подія 'done'
+        надсилається за будь-якого завершення, інакше інтерфейс лишився б
+        у стані "Обробка...".
+        """
+        done = ('error', "Помилка", "Обробку перервано")
+        try:
+            done = self._process_images(input_dir, output_dir, resizer, mode, bg_color,
+                                        presets, workers, recursive, include, exclude)
         except Exception as e:
             self.log(f"❌ Помилка: {e}")
-            return False
+            done = ('error', "Помилка", str(e))
+        finally:
+            self.post('done', *done)
     
-    def process_images(self):
-        """Обробка зображень"""
-        input_dir = self.input_folder.get()
-        output_dir = self.output_folder.get()
+    def _process_images(self, input_dir, output_dir, resizer, mode, bg_color, presets, workers,
+                        recursive, include, exclude):
+        """
+        Обробка тим самим process_folder, що й у командному рядку
+        
+        Returns:
+            (рівень, заголовок, повідомлення) для підсумкового вікна
+        """
+        success, errors = resizer.process_folder(
+            input_dir, output_dir, mode, bg_color, workers, presets=presets,
+            recursive=recursive, include=include, exclude=exclude, resume=True,
+            log=self.log, progress=lambda done, total: self.post('progress', done, total),
+            cancel_event=self.cancel_event)
+        stats = resizer.stats
+        if not stats.get('found'):
+            return 'warning', "Увага", "Не знайдено зображень!"
+        for item in resizer.quarantine:
+            self.log(f"🚧 Карантин ({item['reason']}): {Path(item['path']).name} - {item['detail']}")
+        
+        if stats['cancelled']:
+            return ('info', "Скасовано",
+                    f"Оброблено {success} з {stats['found']} зображень, "
+                    f"пропущено (скасовано): {stats['not_started']}")
+        message = f"Оброблено {success} зображень!"
+        if stats['skipped']:
+            message += f" Без змін: {stats['skipped']}"
+        if errors:
+            message += f" Помилок: {errors}"
+        return 'info', "Готово", message
+    
+    def start_processing(self):
+        """Запуск обробки"""
+        if self.processing:
+            return
         
+        input_dir = self.input_folder.get()
         if not input_dir or not os.path.exists(input_dir):
             messagebox.showerror("Помилка", "Виберіть вхідну папку!")
             return
+        output_dir = self.output_folder.get() or os.path.join(input_dir, 'resized')
         
-        # Створюємо вихідну папку
-        Path(output_dir).mkdir(parents=True, exist_ok=True)
-        
-        # Шукаємо зображення
-        supported_formats = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
-        image_files = [
-            f for f in Path(input_dir).iterdir()
-            if f.is_file() and f.suffix.lower() in supported_formats
-        ]
-        
-        if not image_files:
-            messagebox.showwarning("Увага", "Не знайдено зображень!")
-            return
-        
-        self.log(f"📁 Знайдено {len(image_files)} зображень")
-        self.log(f"🎯 Розмір: {self.target_width.get()}x{self.target_height.get()}")
-        self.log(f"🔧 Режим: {self.mode.get()}")
-        self.log("=" * 50)
-        
-        self.progress['maximum'] = len(image_files)
-        success = 0
-        
-        for i, img_file in enumerate(image_files, 1):
-            output_file = os.path.join(output_dir, f"{img_file.stem}_resized.jpg")
-            
-            self.log(f"[{i}/{len(image_files)}] {img_file.name}...")
-            
-            if self.resize_image(str(img_file), output_file):
-                success += 1
-                self.log("   ✅ Успішно")
-            else:
-                self.log("   ❌ Помилка")
-            
-            self.progress['value'] = i
-            self.root.update()
-        
-        self.log("=" * 50)
-        self.log(f"✅ Оброблено: {success}/{len(image_files)}")
-        self.log(f"📂 Збережено в: {output_dir}")
-        
-        messagebox.showinfo("Готово", f"Оброблено {success} зображень!")
-        
-        self.start_btn.config(state='normal', text="🚀 ОБРОБИТИ ЗОБРАЖЕННЯ")
-        self.processing = False
-    
-    def start_processing(self):
-        """Запуск обробки"""
-        if self.processing:
+        # Знімок налаштувань у головному потоці - воркер не читає Tk-змінні
+        try:
+            resizer = self.make_resizer()
+            workers = int(self.workers.get())
+        except (ValueError, tk.TclError) as e:
+            messagebox.showerror("Помилка", str(e))
             return
+        settings = (input_dir, output_dir, resizer, self.mode.get(), self.get_bg_color(),
+                    self.get_presets(), workers, self.recursive.get(),
+                    self.get_patterns(self.include), self.get_patterns(self.exclude))
         
         self.processing = True
+        self.cancel_event.clear()
         self.start_btn.config(state='disabled', text="⏳ Обробка...")
+        self.cancel_btn.config(state='normal')
         self.status_text.config(state='normal')
         self.status_text.delete('1.0', 'end')
         self.status_text.config(state='disabled')
-        self.progress['value'] = 0
+        self.progress.config(mode='determinate', value=0)
         
         # Запускаємо в окремому потоці
-        thread = threading.Thread(target=self.process_images)
+        thread = threading.Thread(target=self.process_images, args=settings)
         thread.daemon = True
         thread.start()
-
+        self.root.after(self.POLL_INTERVAL_MS, self.drain_events)
+    
+    def cancel_processing(self):
+        """Скасування: файли, що вже обробляються, дописуються, решта пропускається"""
+        if self.processing:
+            self.cancel_event.set()
+            self.cancel_btn.config(state='disabled', text="⏳ Зупинка...")
+            self.log("⏹ Скасування...")
 
 def main():
     root = tk.Tk()
@@ -4,24 +4,2317 @@ Image Batch Resizer
 Зменшує зображення до 1280x720 зі збереженням якості та пропорцій
 """
 
+import argparse
+import fnmatch
+import hashlib
+import heapq
+import io
+import json
+import math
 import os
-from PIL import Image
+import queue
+import re
+import shutil
+import socket
+import sys
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageColor, ImageFilter, ImageStat, features
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy потрібен лише для engine='numpy'
+    np = None
+
+
+# Ресайзер поточного процесу-воркера (ініціалізується один раз на процес)
+_worker_resizer = None
+
+
+def _init_worker(resizer: 'ImageResizer'):
+    """Зберігає копію ресайзера в процесі-воркері пулу"""
+    global _worker_resizer
+    _worker_resizer = resizer
+
+
+def _resize_in_worker(task: tuple) -> Tuple[bool, list]:
+    """Обробляє одне зображення в процесі-воркері пулу (+ заміри, якщо увімкнено)"""
+    ok = _worker_resizer.resize_one(*task)
+    return ok, _worker_resizer.take_profile_records()
+
+
+def _resize_group_in_worker(task: tuple) -> Tuple[List[bool], list]:
+    """Обробляє групу зображень однакової геометрії (engine='numpy') у процесі-воркері"""
+    oks = _worker_resizer.resize_group(task[1])
+    return oks, _worker_resizer.take_profile_records()
+
+
+def _render_in_worker(task: tuple) -> Tuple[tuple, list]:
+    """Обробляє зображення з архіву в процесі-воркері (результат - байти, не файли)"""
+    result = _worker_resizer.render_task(task)
+    return result, _worker_resizer.take_profile_records()
+
+
+def _job_in_worker(task: tuple) -> Tuple[dict, list]:
+    """Виконує задачу потоку JSON-lines (JobStream) у процесі-воркері"""
+    result = _worker_resizer.run_job_task(task)
+    return result, _worker_resizer.take_profile_records()
+
+
+# Популярні розміри для соцмереж
+PRESETS = {
+    'youtube': (1280, 720),
+    'instagram_post': (1080, 1080),
+    'instagram_story': (1080, 1920),
+    'facebook': (1200, 630),
+    'twitter': (1200, 675),
+}
+
+
+# Формати результату: назва -> (формат Pillow, розширення)
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+    'avif': ('AVIF', '.avif'),
+    'png': ('PNG', '.png'),
+}
+
+# Профілі кодувача: назва -> параметри save() для кожного формату
+# high     - як раніше: JPEG 95 + optimize (найвища якість, найбільші файли)
+# balanced - JPEG 85 + optimize: ~2x менші файли, та сама швидкість
+# fast     - JPEG 85 baseline без optimize: найшвидше кодування
+# smallest - JPEG 78 progressive + optimize, 4:2:0: найменші файли
+ENCODER_PROFILES = {
+    'high': {
+        'jpeg': {'quality': 95, 'optimize': True},
+        'webp': {'quality': 95, 'method': 4},
+        'avif': {'quality': 90, 'speed': 6},
+        'png': {'compress_level': 6},
+    },
+    'balanced': {
+        'jpeg': {'quality': 85, 'optimize': True},
+        'webp': {'quality': 80, 'method': 4},
+        'avif': {'quality': 65, 'speed': 6},
+        'png': {'compress_level': 6},
+    },
+    'fast': {
+        'jpeg': {'quality': 85, 'optimize': False},
+        'webp': {'quality': 80, 'method': 0},
+        'avif': {'quality': 65, 'speed': 10},
+        'png': {'compress_level': 1},
+    },
+    'smallest': {
+        'jpeg': {'quality': 78, 'optimize': True, 'progressive': True, 'subsampling': 2},
+        'webp': {'quality': 75, 'method': 6},
+        'avif': {'quality': 55, 'speed': 4},
+        'png': {'optimize': True},
+    },
+}
+
+
+def encoder_available(output_format: str) -> bool:
+    """
+    Чи може Pillow записувати формат
+    
+    AVIF потребує Pillow, зібраного з libavif, або пакета pillow-avif-plugin.
+    """
+    if output_format != 'avif':
+        return True
+    if features.check('avif'):
+        return True
+    try:
+        import pillow_avif  # noqa: F401 - реєструє AVIF у Pillow
+        return True
+    except ImportError:
+        return False
+
+
+# Якорі обрізання для режиму cover: назва -> фокусна точка (частки ширини і висоти)
+ANCHORS = {
+    'center': (0.5, 0.5),
+    'top': (0.5, 0.0),
+    'bottom': (0.5, 1.0),
+    'left': (0.0, 0.5),
+    'right': (1.0, 0.5),
+}
+
+# Рушії ресайзу: 'numpy' - пакетний LANCZOS для груп однакової геометрії
+ENGINES = ('pillow', 'numpy')
+
+
+# Підтримувані формати
+SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+
+# Ліміт пікселів на зображення. Глобальний ліміт Pillow (Image.MAX_IMAGE_PIXELS)
+# рушій не змінює: файли, більші за його подвійне значення (~179 MP за
+# замовчуванням), Pillow відхиляє сам, тож діє менший із двох лімітів
+MAX_PIXELS = 250_000_000
+
+
+def check_pixels(width: int, height: int, max_pixels: Optional[int] = MAX_PIXELS):
+    """
+    Не допускає декодування завеликих зображень (до виділення пам'яті)
+    
+    Raises:
+        Image.DecompressionBombError: width * height більше за max_pixels
+    """
+    if max_pixels and width * height > max_pixels:
+        raise Image.DecompressionBombError(
+            f"{width}x{height} = {width * height / 1e6:.0f} MP "
+            f"перевищує ліміт {max_pixels / 1e6:.0f} MP"
+        )
+
+
+def open_image(source, max_pixels: Optional[int] = MAX_PIXELS) -> Image.Image:
+    """
+    Image.open з перевіркою ліміту пікселів рушія за розміром із заголовка
+    
+    Відкриває файл зі стандартним лімітом Pillow і нічого глобального не
+    змінює, тому безпечний для потоків (прев'ю GUI, сервер).
+    
+    Args:
+        source: Шлях або файловий об'єкт
+        max_pixels: Ліміт пікселів (None - лише ліміт Pillow)
+    
+    Raises:
+        Image.DecompressionBombError: Зображення більше за max_pixels
+            або за подвійний ліміт Pillow
+    """
+    img = Image.open(source)
+    try:
+        check_pixels(img.width, img.height, max_pixels)
+    except Image.DecompressionBombError:
+        img.close()
+        raise
+    return img
+
+
+def system_memory() -> Optional[int]:
+    """Обсяг фізичної пам'яті в байтах (None, якщо визначити не вдалося)"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):  # Windows
+        return None
+
+
+def _glob_match(rel_path: str, patterns: Iterable[str]) -> bool:
+    """Чи відповідає відносний шлях (через '/') або ім'я файлу хоч одному шаблону"""
+    name = rel_path.rsplit('/', 1)[-1]
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def iter_image_files(folder: str, recursive: bool = False,
+                     include: Optional[List[str]] = None,
+                     exclude: Optional[List[str]] = None,
+                     skip: Optional[List[str]] = None) -> Iterator[Path]:
+    """
+    Лениво перебирає зображення в папці (через os.scandir, без повного списку)
+    
+    Рекурсивний обхід іде в глибину з явним стеком: у пам'яті лише шляхи
+    ще не відкритих папок, а перші файли віддаються до завершення обходу.
+    
+    Args:
+        folder: Папка з вхідними зображеннями
+        recursive: Обходити також підпапки
+        include: Glob-шаблони файлів, які брати (None - усі підтримувані);
+            шаблон порівнюється з відносним шляхом через '/' та з іменем файлу
+        exclude: Glob-шаблони файлів і папок, які пропускати
+        skip: Папки, в які не заходити (наприклад, вихідна всередині вхідної);
+            папки з маніфестом ResizeManifest пропускаються завжди
+    
+    Yields:
+        Шляхи до файлів підтримуваних форматів
+    """
+    skip_dirs = {os.path.realpath(path) for path in skip or []}
+    stack = [(folder, '')]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            # Папку видалили або немає доступу - обходимо далі
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = prefix + entry.name
+                if exclude and _glob_match(rel_path, exclude):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    # Вихідні папки попередніх запусків (з маніфестом) не обходимо
+                    if (recursive and os.path.realpath(entry.path) not in skip_dirs
+                            and not os.path.exists(os.path.join(entry.path,
+                                                                ResizeManifest.FILENAME))):
+                        stack.append((entry.path, rel_path + '/'))
+                    continue
+                if not entry.is_file():
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in SUPPORTED_FORMATS:
+                    continue
+                if include and not _glob_match(rel_path, include):
+                    continue
+                yield Path(entry.path)
+
+
+# Тимчасові файли атомарного запису: <ім'я>.<pid>-<12 hex>.tmp (див. temp_path)
+_TEMP_NAME = re.compile(r'\.(\d+)-[0-9a-f]{12}\.tmp$')
+
+
+def temp_path(path: str) -> str:
+    """
+    Унікальне ім'я тимчасового файлу поруч із path: <path>.<pid>-<uuid>.tmp
+    
+    Кілька процесів (воркери пулу, вузли кластера, сервер), що одночасно
+    пишуть той самий файл, не перетирають тимчасові файли одне одного.
+    """
+    return f"{path}.{os.getpid()}-{uuid.uuid4().hex[:12]}.tmp"
+
+
+def sweep_temp_files(folder: str) -> int:
+    """
+    Видаляє тимчасові файли (temp_path), що лишилися від перерваного запуску
+    
+    Обходить folder з підпапками; файли поточного процесу не чіпає. Викликати
+    лише тоді, коли попередній запуск у цій папці вже не працює (--resume).
+    
+    Returns:
+        Кількість видалених файлів
+    """
+    removed = 0
+    for directory, _, names in os.walk(folder):
+        for name in names:
+            match = _TEMP_NAME.search(name)
+            if match is None or int(match.group(1)) == os.getpid():
+                continue
+            try:
+                os.remove(os.path.join(directory, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def atomic_write(path: str, data: bytes):
+    """
+    Записує файл атомарно: у тимчасовий файл поруч, потім os.replace на місце
+    
+    Обірваний запис (OOM, Ctrl+C, перезавантаження) не залишає напівзаписаного
+    результату. Заміна створює новий файл, тож жорсткі посилання на попередній
+    (Deduplicator) не змінюються. Ім'я тимчасового файлу унікальне (temp_path),
+    тож одночасні записи того самого результату не заважають одне одному.
+    """
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Архіви: розширення tar -> режим стиснення для потокового запису
+TAR_COMPRESSION = {
+    '.tar': '', '.tar.gz': 'gz', '.tgz': 'gz', '.tar.bz2': 'bz2', '.tbz2': 'bz2',
+    '.tar.xz': 'xz', '.txz': 'xz',
+}
+
+
+def archive_kind(path: str) -> Optional[str]:
+    """Тип архіву за ім'ям файлу: 'zip', 'tar' або None (не архів)"""
+    name = str(path).lower()
+    if name.endswith('.zip'):
+        return 'zip'
+    if name.endswith(tuple(TAR_COMPRESSION)):
+        return 'tar'
+    return None
+
+
+def _archive_member_wanted(name: str, include: Optional[List[str]],
+                           exclude: Optional[List[str]]) -> bool:
+    """Чи обробляти член архіву (фільтри - як у iter_image_files)"""
+    parts = name.split('/')
+    if '..' in parts or os.path.splitext(name)[1].lower() not in SUPPORTED_FORMATS:
+        return False
+    if exclude and any(_glob_match('/'.join(parts[:i]), exclude)
+                       for i in range(1, len(parts) + 1)):
+        return False
+    return not include or _glob_match(name, include)
+
+
+def iter_archive_images(path: str, include: Optional[List[str]] = None,
+                        exclude: Optional[List[str]] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    Лениво читає зображення з zip або tar архіву (без розпакування на диск)
+    
+    Zip читається з довільним доступом через центральний каталог, tar -
+    потоково ('r|*', у т.ч. .tar.gz/.bz2/.xz): кожен член читається
+    один раз по порядку, перемотування архіву не потрібне.
+    
+    Args:
+        path: Шлях до архіву
+        include: Glob-шаблони файлів, які брати (None - усі підтримувані)
+        exclude: Glob-шаблони файлів і папок, які пропускати
+    
+    Yields:
+        (шлях члена через '/', вміст файлу)
+    """
+    if archive_kind(path) == 'zip':
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name = info.filename.lstrip('/')
+                if info.is_dir() or not _archive_member_wanted(name, include, exclude):
+                    continue
+                yield name, archive.read(info)
+        return
+    
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            name = member.name.lstrip('/')
+            if not member.isfile() or not _archive_member_wanted(name, include, exclude):
+                continue
+            yield name, archive.extractfile(member).read()
+
+
+class ArchiveWriter:
+    """
+    Записує результати прямо в zip/tar архів (або в папку, якщо це не архів)
+    
+    Архів пишеться потоково у тимчасовий файл (temp_path) і перейменовується на місце
+    лише після успішного close(), тому обірваний запуск не псує попередній
+    результат. Zip - без стиснення (ZIP_STORED): JPEG/WebP/AVIF уже стиснені.
+    """
+    
+    def __init__(self, output: str):
+        self.output = output
+        self.kind = archive_kind(output)
+        self.count = 0
+        self.bytes = 0
+        self._archive = None
+        if self.kind is None:
+            os.makedirs(output, exist_ok=True)
+            return
+        directory = os.path.dirname(os.path.abspath(output))
+        os.makedirs(directory, exist_ok=True)
+        self._tmp = temp_path(output)
+        if self.kind == 'zip':
+            self._archive = zipfile.ZipFile(self._tmp, 'w', zipfile.ZIP_STORED)
+        else:
+            compression = next(mode for suffix, mode in TAR_COMPRESSION.items()
+                               if output.lower().endswith(suffix))
+            self._archive = tarfile.open(self._tmp, 'w|' + compression)
+    
+    def add(self, name: str, data: bytes):
+        """Додає файл з іменем name (шлях через '/') і вмістом data"""
+        if self.kind == 'zip':
+            self._archive.writestr(name, data)
+        elif self.kind == 'tar':
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._archive.addfile(info, io.BytesIO(data))
+        else:
+            path = os.path.join(self.output, *name.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+        self.count += 1
+        self.bytes += len(data)
+    
+    def close(self, commit: bool = True):
+        """Завершує архів; commit=False - видаляє незавершений архів"""
+        if self._archive is None:
+            return
+        self._archive.close()
+        self._archive = None
+        if commit:
+            os.replace(self._tmp, self.output)
+        else:
+            os.remove(self._tmp)
+    
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+    
+    def __exit__(self, exc_type, *exc):
+        self.close(commit=exc_type is None)
+
+
+class StageQueue:
+    """
+    Обмежена черга між стадіями конвеєра process_folder з лічильниками backpressure
+    
+    put_wait - скільки часу стадія-виробник чекала на місце в черзі (наступна
+    стадія не встигає), get_wait - скільки часу стадія-споживач чекала на дані
+    (попередня стадія не встигає), max_depth - найбільша заповненість.
+    Після stop.set() ні put(), ні get() більше не блокуються, тож потоки
+    стадій завершуються, навіть якщо сусідня стадія вже зупинилась.
+    """
+    
+    # Кінець даних: стадія-виробник завершилась
+    DONE = object()
+    # Як часто заблоковані put() і get() перевіряють stop, секунди
+    POLL = 0.1
+    
+    def __init__(self, name: str, maxsize: int, stop: threading.Event):
+        self.name = name
+        self.maxsize = maxsize
+        self.stop = stop
+        self.queue = queue.Queue(maxsize)
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+        self.max_depth = 0
+        self.finished = False
+        self.error = None
+        self.thread = None
+    
+    def feed(self, items: Iterable) -> 'StageQueue':
+        """
+        Запускає стадію-виробника: окремий потік переносить items у чергу
+        
+        Помилка стадії запам'ятовується і піднімається у споживача, коли той
+        дочитає чергу до кінця.
+        """
+        def run():
+            try:
+                for item in items:
+                    if not self.put(item):
+                        return
+            except BaseException as e:
+                self.error = e
+            finally:
+                self.finished = True
+                self.put(self.DONE)
+        
+        self.thread = threading.Thread(target=run, name=f"stage-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+    
+    def put(self, item) -> bool:
+        """Кладе елемент, чекаючи на місце; False - конвеєр зупинено"""
+        started = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=self.POLL)
+            except queue.Full:
+                continue
+            self.put_wait += time.perf_counter() - started
+            if item is not self.DONE:
+                self.max_depth = max(self.max_depth, self.queue.qsize())
+            return True
+        return False
+    
+    def get(self, block: bool = True):
+        """
+        Наступний елемент або DONE (також після зупинки конвеєра)
+        
+        Raises:
+            queue.Empty: block=False, а черга порожня
+            Exception: Помилка стадії-виробника (замість DONE)
+        """
+        started = time.perf_counter()
+        while True:
+            try:
+                item = self.queue.get(block, self.POLL if block else None)
+                break
+            except queue.Empty:
+                if not block:
+                    raise
+                if self.stop.is_set():
+                    item = self.DONE
+                    break
+        self.get_wait += time.perf_counter() - started
+        if item is self.DONE and self.error is not None:
+            raise self.error
+        return item
+    
+    def __iter__(self) -> Iterator:
+        """Елементи до кінця даних"""
+        while True:
+            item = self.get()
+            if item is self.DONE:
+                return
+            yield item
+    
+    def report(self) -> dict:
+        """Глибина і простої черги для self.stats['stages']"""
+        return {'max_depth': self.max_depth, 'maxsize': self.maxsize,
+                'put_wait_s': round(self.put_wait, 3), 'get_wait_s': round(self.get_wait, 3)}
+
+
+class StageTimer:
+    """
+    Заміри стадій обробки одного файлу: wall і CPU час, пікселі, байти
+    
+    Використання: with timer('resize'): ...
+    """
+    
+    enabled = True
+    
+    def __init__(self, source: str):
+        self.record = {
+            'source': source, 'ok': False, 'stages': {},
+            'input_pixels': 0, 'output_pixels': 0, 'input_bytes': 0, 'output_bytes': 0,
+            'encodes': 0,
+        }
+        self._stage = None
+    
+    def __call__(self, stage: str) -> 'StageTimer':
+        self._stage = stage
+        return self
+    
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+    
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        totals = self.record['stages'].setdefault(self._stage, [0.0, 0.0])
+        totals[0] += wall
+        totals[1] += cpu
+        return False
+    
+    def count(self, **values):
+        """Додає лічильники (input_pixels, output_pixels, input_bytes, output_bytes)"""
+        for key, value in values.items():
+            self.record[key] += value
+
+
+class _NullTimer:
+    """Таймер-заглушка: заміри вимкнено, витрати - один виклик на стадію"""
+    
+    enabled = False
+    
+    def __call__(self, stage: str) -> '_NullTimer':
+        return self
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def count(self, **values):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+# Межі кошиків гістограм часу, мс
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+def build_profile_report(records: List[dict], slowest: int = 10) -> dict:
+    """
+    Збирає заміри окремих файлів у звіт
+    
+    Args:
+        records: Записи StageTimer.record
+        slowest: Скільки найповільніших файлів включити
+    
+    Returns:
+        Словник: підсумки по стадіях, гістограми, найповільніші файли
+    """
+    def histogram(values_ms):
+        counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for value in values_ms:
+            index = 0
+            while index < len(HISTOGRAM_BUCKETS_MS) and value > HISTOGRAM_BUCKETS_MS[index]:
+                index += 1
+            counts[index] += 1
+        labels = [f"<={b}ms" for b in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return dict(zip(labels, counts))
+    
+    def file_wall(record):
+        return sum(wall for wall, _ in record['stages'].values())
+    
+    stage_names = []
+    for record in records:
+        for name in record['stages']:
+            if name not in stage_names:
+                stage_names.append(name)
+    
+    total_wall = sum(file_wall(r) for r in records) or 1e-9
+    stages = {}
+    for name in stage_names:
+        walls = [r['stages'][name][0] for r in records if name in r['stages']]
+        cpus = [r['stages'][name][1] for r in records if name in r['stages']]
+        stages[name] = {
+            'wall_s': round(sum(walls), 4),
+            'cpu_s': round(sum(cpus), 4),
+            'share': round(sum(walls) / total_wall, 4),
+            'histogram': histogram([w * 1000 for w in walls]),
+        }
+    
+    ordered = sorted(records, key=file_wall, reverse=True)
+    return {
+        'files': len(records),
+        'errors': sum(1 for r in records if not r['ok']),
+        'wall_s': round(total_wall, 4),
+        'input_pixels': sum(r['input_pixels'] for r in records),
+        'output_pixels': sum(r['output_pixels'] for r in records),
+        'input_bytes': sum(r['input_bytes'] for r in records),
+        'output_bytes': sum(r['output_bytes'] for r in records),
+        'encodes': sum(r.get('encodes', 0) for r in records),
+        'stages': stages,
+        'file_histogram': histogram([file_wall(r) * 1000 for r in records]),
+        'slowest': [
+            {
+                'source': r['source'],
+                'wall_ms': round(file_wall(r) * 1000, 2),
+                'input_pixels': r['input_pixels'],
+                'stages_ms': {k: round(v[0] * 1000, 2) for k, v in r['stages'].items()},
+            }
+            for r in ordered[:slowest]
+        ],
+    }
+
+
+def print_profile_report(report: dict, log: Callable[[str], None] = print):
+    """Коротко виводить частки часу по стадіях (log - куди писати рядки)"""
+    log("⏱️  Стадії (wall / CPU, частка):")
+    for name, stage in report['stages'].items():
+        log(f"   {name:<8} {stage['wall_s']:8.2f} с / {stage['cpu_s']:8.2f} с  "
+            f"{stage['share'] * 100:5.1f}%")
+    if report['encodes'] > report['files']:
+        log(f"🎯 Кодувань на файл (підбір під розмір): "
+            f"{report['encodes'] / max(1, report['files']):.1f}")
+    if report['slowest']:
+        slowest = report['slowest'][0]
+        log(f"🐢 Найповільніший: {os.path.basename(slowest['source'])} "
+            f"({slowest['wall_ms']:.0f} мс)")
+
+
+def print_preflight(summary: dict, log: Callable[[str], None] = print):
+    """Виводить оцінку вартості пакета з огляду заголовків (ImageResizer.preflight)"""
+    formats = ', '.join(f"{name} {count}" for name, count in sorted(summary['formats'].items()))
+    log(f"🔍 Огляд: {summary['files']} файлів, {summary['pixels'] / 1e6:.0f} MP ({formats})")
+    if summary['rotated']:
+        log(f"   EXIF-поворот: {summary['rotated']}")
+    if summary['unreadable']:
+        log(f"   Не вдалося прочитати заголовок: {summary['unreadable']}")
+    log(f"   Оцінка часу: ~{summary['expected_seconds']:.1f} с "
+        f"(CPU ~{summary['cpu_seconds']:.1f} с, процесів {summary['workers']}), "
+        f"результат ~{summary['output_bytes'] / 1e6:.1f} MB")
+    if summary['largest']:
+        log(f"   Найдорожчий: {os.path.basename(summary['largest'])}")
+
+
+class ResizeManifest:
+    """
+    Маніфест інкрементальної обробки у вихідній папці
+    
+    Для кожного вхідного файлу зберігає його відбиток (розмір, mtime і
+    опційно SHA-256 вмісту), параметри ресайзу і шляхи до результатів.
+    Незмінені файли пропускаються за один пошук у словнику.
+    """
+    
+    FILENAME = '.resize-manifest.json'
+    VERSION = 2
+    
+    def __init__(self, output_folder: str, content_hash: bool = False):
+        """
+        Args:
+            output_folder: Вихідна папка (там лежить файл маніфесту)
+            content_hash: Також порівнювати SHA-256 вмісту, якщо змінився mtime
+        """
+        self.path = os.path.join(output_folder, self.FILENAME)
+        self.content_hash = content_hash
+        self.entries: Dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.load()
+    
+    def load(self):
+        """Читає маніфест (пошкоджений або старий маніфест ігнорується)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            self.entries = data.get('entries', {})
+    
+    def save(self):
+        """Атомарно записує маніфест (через тимчасовий файл)"""
+        tmp_path = temp_path(self.path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'entries': self.entries}, f,
+                      ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+    
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """SHA-256 вмісту файлу"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def fingerprint(self, source: str) -> dict:
+        """Відбиток вхідного файлу (розмір і mtime)"""
+        st = os.stat(source)
+        return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    
+    @staticmethod
+    def _outputs(output) -> List[str]:
+        """Нормалізує шлях або список шляхів результату"""
+        if isinstance(output, str):
+            output = [output]
+        return [os.path.abspath(path) for path in output]
+    
+    def check(self, source: str, params: dict, output) -> Tuple[bool, dict]:
+        """
+        Перевіряє чи результат для файлу актуальний
+        
+        Args:
+            source: Шлях до вхідного файлу
+            params: Параметри ресайзу (ImageResizer.cache_params)
+            output: Очікуваний шлях результату (або список шляхів)
+        
+        Returns:
+            (True якщо можна пропустити, відбиток для record)
+        """
+        fingerprint = self.fingerprint(source)
+        entry = self.entries.get(os.path.abspath(source))
+        outputs = self._outputs(output)
+        fresh = (
+            entry is not None
+            and entry['params'] == params
+            and entry['outputs'] == outputs
+            and all(os.path.exists(path) for path in outputs)
+        )
+        if fresh and (entry['size'], entry['mtime_ns']) != (fingerprint['size'],
+                                                           fingerprint['mtime_ns']):
+            # mtime змінився - без хешу вважаємо файл зміненим
+            fresh = False
+            if self.content_hash and entry.get('sha256') and entry['size'] == fingerprint['size']:
+                fingerprint['sha256'] = self.file_hash(source)
+                if fingerprint['sha256'] == entry['sha256']:
+                    fresh = True
+                    entry.update(fingerprint)
+        
+        if fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return fresh, fingerprint
+    
+    def record(self, source: str, fingerprint: dict, params: dict, output) -> dict:
+        """Запам'ятовує результат успішної обробки (повертає запис)"""
+        if self.content_hash and 'sha256' not in fingerprint:
+            fingerprint['sha256'] = self.file_hash(source)
+        entry = dict(fingerprint, params=params, outputs=self._outputs(output))
+        self.entries[os.path.abspath(source)] = entry
+        return entry
+    
+    def forget(self, source: str):
+        """Видаляє запис (наприклад, після помилки обробки)"""
+        self.entries.pop(os.path.abspath(source), None)
+    
+    def prune(self) -> int:
+        """
+        Видаляє результати, вхідні файли яких більше не існують
+        
+        Returns:
+            Кількість видалених результатів
+        """
+        live_outputs = {
+            output for source, entry in self.entries.items() if os.path.exists(source)
+            for output in entry['outputs']
+        }
+        removed = 0
+        for source in [s for s in self.entries if not os.path.exists(s)]:
+            for output in self.entries.pop(source)['outputs']:
+                if output not in live_outputs and os.path.exists(output):
+                    os.remove(output)
+                    removed += 1
+        return removed
+
+
+class ResizeJournal:
+    """
+    Журнал завершених файлів для відновлення перерваного запуску
+    
+    Файл JSON-рядків у вихідній папці: перший рядок - версія і параметри
+    ресайзу, далі по рядку на кожен успішно оброблений файл (запис маніфесту).
+    Рядок дописується одразу після обробки файлу, тому після вбивства
+    процесу журнал містить усе завершене, а обірваний останній рядок
+    ігнорується. Раз на SYNC_INTERVAL секунд на диск скидаються (os.fsync)
+    результати, записані з минулого разу, їхні папки (після перейменування)
+    і сам журнал - лише власні файли, без глобального os.sync, - щоб журнал
+    пережив і перезавантаження. Після успішного завершення журнал видаляється.
+    """
+    
+    FILENAME = '.resize-journal.jsonl'
+    VERSION = 1
+    SYNC_INTERVAL = 1.0
+    
+    def __init__(self, output_folder: str, params: dict, resume: bool = False):
+        """
+        Args:
+            output_folder: Вихідна папка (там лежить журнал)
+            params: Параметри ресайзу (ImageResizer.cache_params)
+            resume: Продовжити попередній журнал (якщо параметри ті самі),
+                False - почати новий
+        """
+        self.path = os.path.join(output_folder, self.FILENAME)
+        self.params = params
+        self.entries: Dict[str, dict] = {}
+        if resume:
+            self.load()
+        self.resumed = len(self.entries)
+        
+        if self.resumed:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._write({'version': self.VERSION, 'params': params})
+            # Новий файл - новий запис у папці
+            self.fsync_path(output_folder, directory=True)
+        self._unsynced: List[str] = []  # результати, записані з минулого sync
+        self._synced = time.monotonic()
+    
+    @classmethod
+    def exists(cls, output_folder: str) -> bool:
+        """Чи лишився журнал перерваного запуску"""
+        return os.path.exists(os.path.join(output_folder, cls.FILENAME))
+    
+    def load(self):
+        """Читає журнал (інші параметри або версія - журнал ігнорується)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != self.VERSION or header.get('params') != self.params:
+                    print("⚠️  Журнал від запуску з іншими параметрами - починаємо заново")
+                    return
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Рядок, обірваний під час падіння
+                        continue
+                    self.entries[entry.pop('source')] = entry
+        except (OSError, ValueError):
+            return
+    
+    def is_done(self, source: str) -> bool:
+        """Чи оброблено файл у перерваному запуску"""
+        return os.path.abspath(source) in self.entries
+    
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+    
+    def record(self, source: str, entry: dict):
+        """Дописує успішно оброблений файл (entry - запис маніфесту)"""
+        self._write(dict(entry, source=os.path.abspath(source)))
+        self._unsynced.extend(entry.get('outputs', ()))
+        if time.monotonic() - self._synced >= self.SYNC_INTERVAL:
+            self.sync()
+    
+    @staticmethod
+    def fsync_path(path: str, directory: bool = False):
+        """os.fsync файлу або папки за шляхом (папки на Windows пропускаються)"""
+        flags = os.O_RDONLY | (getattr(os, 'O_DIRECTORY', 0) if directory else 0)
+        try:
+            fd = os.open(path, flags)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    
+    def sync(self):
+        """Скидає на диск нові результати, їхні папки і журнал"""
+        self._synced = time.monotonic()
+        outputs, self._unsynced = self._unsynced, []
+        for path in outputs:
+            self.fsync_path(path)
+        # Результати з'являються через os.replace - запис у папці теж треба зберегти
+        for directory in sorted({os.path.dirname(path) or '.' for path in outputs}):
+            self.fsync_path(directory, directory=True)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def close(self):
+        """Закриває журнал (він лишається для --resume)"""
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+    
+    def finish(self):
+        """Закриває і видаляє журнал після успішного завершення"""
+        self._file.close()
+        os.remove(self.path)
+
+
+class Deduplicator:
+    """
+    Знаходить побайтово однакові вхідні файли, щоб обробляти кожен вміст один раз
+    
+    Порівняння поступове: спершу розмір файлу, при збігу розміру - SHA-256
+    перших і останніх PARTIAL_BYTES, і лише при збігу часткового хешу -
+    SHA-256 усього файлу. Параметри ресайзу в межах запуску однакові, тож
+    унікальна пара (вміст, параметри) - це унікальний вміст.
+    
+    Дублікати не потрапляють у пул: після обробки оригіналу їхні результати
+    створюються жорсткими посиланнями на його результати (або копіями, якщо
+    посилання неможливе, наприклад на іншому диску).
+    
+    filter() і resolve() можна викликати з різних потоків (у process_folder
+    filter працює в потоці обходу).
+    """
+    
+    PARTIAL_BYTES = 64 * 1024
+    
+    def __init__(self):
+        self._originals: Dict[int, List[dict]] = {}  # розмір -> оригінали цього розміру
+        self._waiting: Dict[str, list] = {}          # оригінал -> дублікати, що чекають
+        self._results: Dict[str, tuple] = {}         # оригінал -> (успіх, результат)
+        self._ready = deque()                        # дублікати вже оброблених оригіналів
+        self._lock = threading.Lock()
+        self.unique = 0
+        self.duplicates = 0
+        self.full_hashes = 0
+        self.linked = 0
+        self.copied = 0
+    
+    def _partial_hash(self, entry: dict) -> str:
+        """Хеш початку і кінця файлу (рахується один раз на файл)"""
+        if entry['partial'] is None:
+            digest = hashlib.sha256()
+            with open(entry['path'], 'rb') as f:
+                digest.update(f.read(self.PARTIAL_BYTES))
+                if entry['size'] > 2 * self.PARTIAL_BYTES:
+                    f.seek(-self.PARTIAL_BYTES, os.SEEK_END)
+                digest.update(f.read(self.PARTIAL_BYTES))
+            entry['partial'] = digest.hexdigest()
+        return entry['partial']
+    
+    def _full_hash(self, entry: dict) -> str:
+        """SHA-256 усього файлу (лише при збігу часткового хешу)"""
+        if entry['full'] is None:
+            entry['full'] = ResizeManifest.file_hash(entry['path'])
+            self.full_hashes += 1
+        return entry['full']
+    
+    def original(self, path: str) -> Optional[str]:
+        """
+        Шукає раніше побачений файл з тим самим вмістом
+        
+        Returns:
+            Шлях оригіналу або None (тоді path сам стає оригіналом)
+        """
+        try:
+            size = os.path.getsize(path)
+            entry = {'path': path, 'size': size, 'partial': None, 'full': None}
+            for candidate in self._originals.get(size, []):
+                if (self._partial_hash(candidate) == self._partial_hash(entry)
+                        and self._full_hash(candidate) == self._full_hash(entry)):
+                    return candidate['path']
+        except OSError:
+            # Файл не читається - помилку покаже сама обробка
+            return None
+        self._originals.setdefault(size, []).append(entry)
+        return None
+    
+    def filter(self, jobs: Iterable[tuple]) -> Iterator[tuple]:
+        """
+        Лениво пропускає далі лише оригінали, дублікати відкладає до resolve()
+        
+        Args:
+            jobs: Задачі (вхідний файл, результат, відбиток) з iter_jobs
+        """
+        for job in jobs:
+            source = str(job[0])
+            original = self.original(source)
+            if original is None:
+                self.unique += 1
+                yield job
+                continue
+            self.duplicates += 1
+            with self._lock:
+                if original in self._results:
+                    self._ready.append((job, original))
+                else:
+                    self._waiting.setdefault(original, []).append(job)
+    
+    @property
+    def waiting(self) -> int:
+        """Кількість дублікатів, оригінали яких ще не оброблено"""
+        return sum(len(jobs) for jobs in self._waiting.values()) + len(self._ready)
+    
+    @property
+    def ratio(self) -> float:
+        """Коефіцієнт дедуплікації: усі файли / унікальні"""
+        return (self.unique + self.duplicates) / self.unique if self.unique else 1.0
+    
+    def _link(self, source: str, target: str):
+        """Жорстке посилання target -> source (копія, якщо посилання неможливе)"""
+        if os.path.abspath(source) == os.path.abspath(target):
+            return
+        # Як і atomic_write: спершу поруч, потім os.replace на місце
+        tmp_path = temp_path(target)
+        try:
+            os.link(source, tmp_path)
+            self.linked += 1
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+            self.copied += 1
+        os.replace(tmp_path, target)
+    
+    def resolve(self, job: tuple, success: bool) -> List[Tuple[tuple, bool]]:
+        """
+        Запам'ятовує результат оригіналу і створює результати його дублікатів
+        
+        Args:
+            job: Задача оригіналу
+            success: Чи вдалася обробка оригіналу
+        
+        Returns:
+            [(задача-дублікат, успіх)] - для дублікатів цього оригіналу і тих,
+            що знайшлися вже після обробки свого оригіналу
+        """
+        source = str(job[0])
+        with self._lock:
+            self._results[source] = (success, job[1])
+            for duplicate in self._waiting.pop(source, []):
+                self._ready.append((duplicate, source))
+        return self.flush()
+    
+    def flush(self) -> List[Tuple[tuple, bool]]:
+        """Створює результати дублікатів, оригінали яких уже оброблено"""
+        done = []
+        while self._ready:
+            duplicate, original = self._ready.popleft()
+            success, output = self._results[original]
+            if success:
+                try:
+                    for source, target in zip(ImageResizer.output_paths(output),
+                                              ImageResizer.output_paths(duplicate[1])):
+                        self._link(source, target)
+                except OSError as e:
+                    print(f"❌ Помилка при копіюванні {duplicate[0]}: {e}")
+                    success = False
+            done.append((duplicate, success))
+        return done
+
+
+class PoolScheduler:
+    """
+    Планувальник задач пулу процесів з бюджетом пам'яті і таймаутом
+    
+    Перед запуском кожного файлу читається лише заголовок (ImageResizer.probe)
+    і оцінюється пам'ять на декодування. Задача стартує, лише якщо сума оцінок
+    задач у роботі не перевищує бюджет (одна задача запускається завжди, щоб
+    завеликий файл не блокував чергу). Задач у роботі не більше, ніж процесів,
+    тому час старту відомий і таймаут рахується точно.
+    
+    Файли понад max_pixels, ті, що не вклалися в таймаут, і ті, що "поклали"
+    процес, потрапляють у карантин (resizer.quarantine). Зависла задача
+    знімається разом з пулом, решта задач перезапускається в новому. Якщо
+    процес упав, невідомо, яка задача винна: усі задачі, що тоді працювали,
+    перезапускаються по одній, і в карантин іде лише та, що впаде сама.
+    
+    З keep_alive=True пул не зупиняється після run(): наступний виклик
+    одразу отримує "теплі" процеси (FolderWatcher). Зупиняє його close().
+    
+    Джерело задач може бути нескінченним (JobStream): замість задачі воно
+    віддає IDLE, коли нової задачі поки немає, і run() тоді не чекає на неї,
+    а видає готові результати, опитуючи джерело знову раз на IDLE_POLL секунд.
+    """
+    
+    # Маркер джерела задач: "нової задачі поки немає"
+    IDLE = object()
+    IDLE_POLL = 0.05
+    
+    def __init__(self, resizer: 'ImageResizer', workers: int, keep_alive: bool = False):
+        self.resizer = resizer
+        self.workers = workers
+        self.keep_alive = keep_alive
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.budget = resizer.memory_budget()
+        self.timeout = resizer.timeout
+        self.in_use = 0
+        self.peak_in_use = 0
+    
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # Плагіни Pillow завантажуються до fork: інакше процес-воркер може
+        # успадкувати замок імпорту, захоплений потоком probe, і зависнути
+        Image.init()
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(self.resizer,))
+    
+    def close(self):
+        """Зупиняє теплий пул (keep_alive)"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+    
+    @staticmethod
+    def _kill_pool(executor: ProcessPoolExecutor):
+        """Зупиняє пул негайно (завислий процес інакше не завершити)"""
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
+    
+    def run(self, tasks: Iterable[tuple], cancelled, func=_resize_in_worker,
+            cost=None, failed=False) -> Iterator[bool]:
+        """
+        Виконує задачі і повертає результати в порядку їх подання
+        
+        Args:
+            tasks: Кортежі аргументів для resize_one (або для func); IDLE -
+                нової задачі поки немає
+            cancelled: Функція без аргументів - True, якщо обробку скасовано
+            func: Функція воркера (за замовчуванням _resize_in_worker)
+            cost: Оцінка задачі -> (байти, причина карантину), за замовчуванням
+                resizer.task_cost
+            failed: Результат для задач у карантині
+        
+        Yields:
+            Результат func для кожної задачі (failed для карантину)
+        """
+        resizer = self.resizer
+        cost = cost or resizer.task_cost
+        # Скільки задач може бути між "наступною до видачі" і останньою прочитаною
+        window = self.workers * 4
+        tasks = iter(tasks)
+        exhausted = False
+        queued = deque()   # (номер, задача, оцінка пам'яті) - ще не запущені
+        running = {}       # future -> (номер, задача, оцінка пам'яті, час старту)
+        finished = {}      # номер -> результат (чекає на видачу по порядку)
+        suspects = set()   # номери задач, що працювали, коли впав процес
+        count = 0
+        next_index = 0
+        
+        executor, self.executor = self.executor or self._new_pool(), None
+        try:
+            while True:
+                # Читаємо задачі наперед і відсіюємо завеликі файли за заголовком
+                idle = False
+                while (not exhausted and not cancelled()
+                       and len(queued) + len(running) + len(finished) < window):
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    if task is self.IDLE:
+                        idle = True
+                        break
+                    footprint, reason = cost(task)
+                    if reason:
+                        resizer.add_quarantine(task[0], 'pixels', reason)
+                        finished[count] = failed
+                    else:
+                        queued.append((count, task, footprint))
+                    count += 1
+                
+                # Запускаємо, поки є вільні процеси і вистачає бюджету
+                # (підозрювані в падінні процесу - лише поодинці)
+                while (queued and len(running) < self.workers and not cancelled()
+                       and (not running or self.in_use + queued[0][2] <= self.budget)
+                       and not (running and (queued[0][0] in suspects
+                                             or any(v[0] in suspects
+                                                    for v in running.values())))):
+                    index, task, footprint = queued.popleft()
+                    future = executor.submit(func, task)
+                    running[future] = (index, task, footprint, time.monotonic())
+                    self.in_use += footprint
+                    self.peak_in_use = max(self.peak_in_use, self.in_use)
+                
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+                
+                if not running:
+                    if cancelled() or (exhausted and not queued):
+                        return
+                    continue
+                
+                wait_for = None
+                if self.timeout:
+                    oldest = min(started for _, _, _, started in running.values())
+                    wait_for = max(0.0, oldest + self.timeout - time.monotonic())
+                if idle and (wait_for is None or wait_for > self.IDLE_POLL):
+                    # Нова задача може надійти раніше, ніж завершиться поточна
+                    wait_for = self.IDLE_POLL
+                done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+                
+                alone = len(running) == 1
+                broken = False
+                lost = []  # задачі, що треба перезапустити в новому пулі
+                for future in done:
+                    index, task, footprint, _ = running.pop(future)
+                    self.in_use -= footprint
+                    try:
+                        finished[index] = resizer._collect(future)
+                        suspects.discard(index)
+                    except BrokenProcessPool:
+                        # Процес упав (наприклад, його вбив OOM killer)
+                        broken = True
+                        if alone:
+                            resizer.add_quarantine(task[0], 'crash', "процес-воркер упав")
+                            finished[index] = failed
+                        else:
+                            suspects.add(index)
+                            lost.append((index, task, footprint))
+                
+                expired = []
+                if not done and self.timeout:
+                    now = time.monotonic()
+                    expired = [future for future, (_, _, _, started) in running.items()
+                               if now - started >= self.timeout]
+                    for future in expired:
+                        index, task, footprint, _ = running.pop(future)
+                        self.in_use -= footprint
+                        resizer.add_quarantine(task[0], 'timeout',
+                                               f"довше за {self.timeout:g} с")
+                        finished[index] = failed
+                
+                if broken or expired:
+                    # Пул непридатний: задачі, що ще працювали, перезапускаємо в новому
+                    for index, task, footprint, _ in running.values():
+                        if broken:
+                            suspects.add(index)
+                        self.in_use -= footprint
+                        lost.append((index, task, footprint))
+                    running.clear()
+                    queued.extendleft(sorted(lost, reverse=True))
+                    self._kill_pool(executor)
+                    executor = self._new_pool()
+        finally:
+            if self.keep_alive and not running:
+                self.executor = executor
+            else:
+                # Нові задачі не запускаються; ті, що вже працюють, дописуються
+                executor.shutdown(wait=True)
+
+
+class NumpyResampler:
+    """
+    Пакетний LANCZOS на NumPy для груп зображень однакової геометрії
+    
+    Pillow для кожного зображення заново рахує коефіцієнти фільтра. Тут
+    сепарабельні ваги LANCZOS (як у Pillow: support 3, нормалізація суми)
+    рахуються один раз на геометрію і застосовуються до всього стеку
+    (N, H, W, 3) блочними матричними множеннями (BLAS). Матриця ваг
+    стрічкова, тому множиться лише її ненульова смуга, блоками по BLOCK
+    рядків виходу. Як і в Pillow, спершу горизонтальний прохід (лише по
+    рядках, потрібних вертикальному, порціями по ROWS рядків - щоб float32
+    копія входу була невеликою), між проходами - округлення до 0..255.
+    
+    Точність: відносно Image.resize(LANCZOS) без reducing_gap різниця не
+    перевищує TOLERANCE рівнів на канал (Pillow рахує у фіксованій точці).
+    """
+    
+    TOLERANCE = 2
+    BLOCK = 8
+    ROWS = 128
+    
+    def __init__(self):
+        if np is None:
+            raise ImportError("engine='numpy' потребує пакета numpy (pip install numpy)")
+        self._plans = {}
+    
+    @staticmethod
+    def lanczos_weights(in_size: int, out_size: int, start: float = 0.0,
+                        end: Optional[float] = None) -> 'np.ndarray':
+        """
+        Матриця ваг (out_size, in_size) для ділянки [start, end) вхідної осі
+        
+        Межі вікна і аргументи фільтра - як у precompute_coeffs з Pillow.
+        """
+        end = in_size if end is None else end
+        scale = (end - start) / out_size
+        filter_scale = max(scale, 1.0)
+        support = 3.0 * filter_scale
+        weights = np.zeros((out_size, in_size))
+        for i in range(out_size):
+            center = start + (i + 0.5) * scale
+            low = max(int(center - support + 0.5), 0)
+            high = min(int(center + support + 0.5), in_size)
+            x = (np.arange(low, high) - center + 0.5) / filter_scale
+            w = np.where(np.abs(x) < 3.0, np.sinc(x) * np.sinc(x / 3.0), 0.0)
+            total = w.sum()
+            weights[i, low:high] = w / total if total else w
+        return weights
+    
+    def _plan(self, in_size: int, out_size: int, start: float, end: float,
+              channels: int) -> List[tuple]:
+        """
+        Ненульові смуги ваг блоками (кеш на геометрію)
+        
+        channels > 1 - для горизонтального проходу: канали RGB ідуть поруч
+        у рядку, тож блок ваг розширюється kron(блок, I) і транспонується
+        для множення справа.
+        
+        Returns:
+            [(початок виходу, кінець виходу, початок входу, кінець входу, блок float32)]
+        """
+        key = (in_size, out_size, start, end, channels)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+        weights = self.lanczos_weights(in_size, out_size, start, end)
+        plan = []
+        for low in range(0, out_size, self.BLOCK):
+            high = min(low + self.BLOCK, out_size)
+            used = np.flatnonzero(weights[low:high].any(axis=0))
+            first, last = int(used[0]), int(used[-1]) + 1
+            block = weights[low:high, first:last]
+            if channels > 1:
+                block = np.kron(block, np.eye(channels)).T
+            plan.append((low * channels, high * channels, first * channels, last * channels,
+                         np.ascontiguousarray(block, dtype=np.float32)))
+        self._plans[key] = plan
+        return plan
+    
+    def resize(self, stack: 'np.ndarray', size: Tuple[int, int],
+               box: Optional[Tuple[float, float, float, float]] = None) -> 'np.ndarray':
+        """
+        Зменшує стек зображень (або ділянку box кожного) до size
+        
+        Args:
+            stack: uint8 масив (N, висота, ширина, канали)
+            size: (ширина, висота) результату
+            box: (left, top, right, bottom) - як у Image.resize
+        
+        Returns:
+            uint8 масив (N, висота, ширина, канали)
+        """
+        count, height, width, channels = stack.shape
+        out_width, out_height = size
+        left, top, right, bottom = box or (0, 0, width, height)
+        horizontal = self._plan(width, out_width, left, right, channels)
+        vertical = self._plan(height, out_height, top, bottom, 1)
+        
+        # Горизонтальний прохід лише по рядках, які потрібні вертикальному
+        first = min(band[2] for band in vertical)
+        last = max(band[3] for band in vertical)
+        rows = stack[:, first:last].reshape(count * (last - first), width * channels)
+        middle = np.empty((rows.shape[0], out_width * channels), dtype=np.float32)
+        for row in range(0, rows.shape[0], self.ROWS):
+            chunk = rows[row:row + self.ROWS].astype(np.float32)
+            out = middle[row:row + self.ROWS]
+            for low, high, start, end, block in horizontal:
+                np.matmul(chunk[:, start:end], block, out=out[:, low:high])
+        np.clip(np.rint(middle, out=middle), 0, 255, out=middle)
+        
+        middle = middle.reshape(count, last - first, out_width * channels)
+        result = np.empty((count, out_height, out_width * channels), dtype=np.float32)
+        for low, high, start, end, block in vertical:
+            np.matmul(block, middle[:, start - first:end - first], out=result[:, low:high])
+        np.clip(np.rint(result, out=result), 0, 255, out=result)
+        return result.astype(np.uint8).reshape(count, out_height, out_width, channels)
+    
+    @staticmethod
+    def stack(images: List[Image.Image]) -> 'np.ndarray':
+        """Копіює RGB зображення однакового розміру в один uint8 масив (N, h, w, 3)"""
+        width, height = images[0].size
+        stack = np.empty((len(images), height, width, 3), dtype=np.uint8)
+        for n, img in enumerate(images):
+            stack[n] = img
+        return stack
+    
+    @staticmethod
+    def letterbox(stack: 'np.ndarray', target: Tuple[int, int], bg_color=(0, 0, 0)) -> 'np.ndarray':
+        """Contain: центрує стек на полотні target кольору bg_color (як _compose)"""
+        count, height, width, channels = stack.shape
+        target_width, target_height = target
+        if (width, height) == (target_width, target_height):
+            return stack
+        top = (target_height - height) // 2
+        left = (target_width - width) // 2
+        canvas = np.empty((count, target_height, target_width, channels), dtype=np.uint8)
+        # Фон - лише на поля, середину одразу заповнює стек
+        canvas[:, :top] = bg_color
+        canvas[:, top + height:] = bg_color
+        canvas[:, top:top + height, :left] = bg_color
+        canvas[:, top:top + height, left + width:] = bg_color
+        canvas[:, top:top + height, left:left + width] = stack
+        return canvas
+
 
 class ImageResizer:
-    def __init__(self, target_width=1280, target_height=720):
+    # Попереднє зменшення (draft/reduce) зупиняється на ~2x від цільового розміру,
+    # фінальні кроки завжди робить LANCZOS
+    REDUCING_GAP = 2.0
+    
+    # Файл звіту профілювання у вихідній папці
+    PROFILE_REPORT = 'resize-profile.json'
+    
+    # Нижня межа якості при підборі під розмір файлу
+    MIN_QUALITY = 10
+    
+    # Файл зі списком файлів у карантині (у вихідній папці)
+    QUARANTINE_REPORT = 'resize-quarantine.json'
+    
+    # Таймаут на зображення для консолі та GUI (секунди)
+    DEFAULT_TIMEOUT = 300
+    
+    # Орієнтовна вартість обробки, нс на піксель (виміряно на одному ядрі):
+    # декодування - на піксель файлу, ресайз - на декодований піксель
+    # (після draft), кодування - на піксель результату
+    DECODE_NS_PER_PIXEL = {'JPEG': 8, 'PNG': 30, 'WEBP': 60, 'TIFF': 3}
+    DEFAULT_DECODE_NS_PER_PIXEL = 20
+    RESIZE_NS_PER_PIXEL = 15
+    ENCODE_NS_PER_PIXEL = 10
+    # Орієнтовний розмір результату, байт на піксель (при якості 95)
+    OUTPUT_BYTES_PER_PIXEL = {'jpeg': 0.4, 'webp': 0.3, 'avif': 0.2, 'png': 1.5}
+    
+    # Конвеєр process_folder: місткість черг scan і probe, а також вікно, в
+    # якому огляд заголовків ставить найдорожчі файли першими
+    PIPELINE_WINDOW = 64
+    # Місткість черг між потоками decode → resize → encode → write (у черзі
+    # після decode лежать повні декодовані зображення, тому вона мала)
+    STAGE_QUEUE_SIZE = 2
+    
+    # engine='numpy': до скількох зображень однакової геометрії в одному стеку
+    GROUP_SIZE = 8
+    # і скільки пам'яті (оцінка estimate_footprint) може зайняти один стек
+    GROUP_BYTES = 256 * 1024 * 1024
+    
+    def __init__(self, target_width=1280, target_height=720, reference_quality=False,
+                 quality=None, profile=False, encoder='high', output_format='jpeg',
+                 subsampling=None, max_bytes=None, anchor='center',
+                 memory_budget_mb=None, timeout=None, max_pixels=MAX_PIXELS,
+                 engine='pillow'):
+        """
+        Ініціалізація ресайзера
+        
+        Args:
+            target_width: Ширина вихідного зображення
+            target_height: Висота вихідного зображення
+            reference_quality: True - без швидкого декодування (біт-у-біт як LANCZOS
+                з повного розміру), False - JPEG draft + reduce() перед LANCZOS
+            quality: Якість (1-100), None - з профілю кодувача
+            profile: Збирати заміри стадій по кожному файлу (звіт resize-profile.json)
+            encoder: Профіль кодувача: 'high', 'balanced', 'fast' або 'smallest'
+            output_format: Формат результату: 'jpeg', 'webp', 'avif' або 'png'
+            subsampling: Субдискретизація кольору JPEG (0 - 4:4:4, 1 - 4:2:2,
+                2 - 4:2:0), None - з профілю
+            max_bytes: Максимальний розмір файлу результату. Якість підбирається
+                двійковим пошуком в пам'яті (quality стає верхньою межею)
+            anchor: Що залишити при обрізанні в режимі cover: назва з ANCHORS
+                ('center', 'top', 'bottom', 'left', 'right') або фокусна точка
+                (x, y) в частках розміру зображення, 0.0-1.0
+            memory_budget_mb: Бюджет пам'яті на одночасне декодування в пулі, MB
+                (None - половина фізичної пам'яті)
+            timeout: Максимальний час на одне зображення в пулі, секунди
+                (None - без обмеження; з таймаутом пул використовується завжди)
+            max_pixels: Файли з більшою кількістю пікселів не декодуються
+                (захист від "декомпресійних бомб")
+            engine: 'pillow' - кожне зображення окремо через Image.resize,
+                'numpy' - послідовні файли однакової геометрії ресайзяться
+                стеком (NumpyResampler, потрібен numpy)
+        
+        Raises:
+            ValueError: Невідомий профіль/формат/якір/рушій або формат недоступний
+            ImportError: engine='numpy' без встановленого numpy
+        """
+        if encoder not in ENCODER_PROFILES:
+            raise ValueError(f"Невідомий профіль кодувача: {encoder}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Невідомий формат: {output_format}")
+        if not encoder_available(output_format):
+            raise ValueError(f"Формат {output_format} недоступний "
+                             f"(pip install pillow-avif-plugin)")
+        if isinstance(anchor, str):
+            if anchor not in ANCHORS:
+                raise ValueError(f"Невідомий якір: {anchor}")
+            focus = ANCHORS[anchor]
+        else:
+            focus = tuple(float(v) for v in anchor)
+            if len(focus) != 2 or not all(0.0 <= v <= 1.0 for v in focus):
+                raise ValueError(f"Фокусна точка має бути (x, y) в межах 0.0-1.0: {anchor}")
+        if engine not in ENGINES:
+            raise ValueError(f"Невідомий рушій: {engine}")
+        
+        self.target_width = target_width
+        self.target_height = target_height
+        self.target_ratio = target_width / target_height
+        self.reference_quality = reference_quality
+        self.encoder = encoder
+        self.output_format = output_format
+        self.save_options = dict(ENCODER_PROFILES[encoder][output_format])
+        if quality is not None and output_format != 'png':
+            self.save_options['quality'] = quality
+        if subsampling is not None and output_format == 'jpeg':
+            self.save_options['subsampling'] = subsampling
+        self.quality = self.save_options.get('quality')
+        # Явні quality і subsampling - для копій з іншим форматом (for_format)
+        self._format_options = {'quality': quality, 'subsampling': subsampling}
+        self._variants = {}
+        self.extension = OUTPUT_FORMATS[output_format][1]
+        self.max_bytes = max_bytes
+        self.anchor = anchor
+        self.focus = focus
+        self.memory_budget_mb = memory_budget_mb
+        self.timeout = timeout
+        self.max_pixels = max_pixels
+        self.engine = engine
+        self.resampler = NumpyResampler() if engine == 'numpy' else None
+        # Файли, відкладені планувальником: [{'path', 'reason', 'detail'}]
+        self.quarantine = []
+        # Скільки вхідних файлів переглянув останній iter_jobs
+        self.scanned = 0
+        # Заголовки з огляду (preflight): шлях -> probe(); process_folder
+        # прибирає запис, щойно файл оброблено
+        self.headers = {}
+        # Підсумок останнього огляду для print_preflight
+        self.preflight_summary = {}
+        # Якість, що підійшла для схожих зображень: ключ -> quality
+        self._quality_cache = {}
+        self.profile = profile
+        self.profile_records = []
+        self.stats = {}
+    
+    def for_format(self, output_format: str) -> 'ImageResizer':
+        """
+        Такий самий ресайзер, але з іншим форматом результату
+        
+        Профіль кодувача той самий, параметри save() - для нового формату.
+        Копії кешуються: задачі JobStream можуть мати різні формати.
+        
+        Raises:
+            ValueError: Невідомий або недоступний формат
+        """
+        if output_format == self.output_format:
+            return self
+        variant = self._variants.get(output_format)
+        if variant is None:
+            variant = ImageResizer(self.target_width, self.target_height,
+                                   self.reference_quality, self._format_options['quality'],
+                                   self.profile, self.encoder, output_format,
+                                   self._format_options['subsampling'], self.max_bytes,
+                                   self.anchor, self.memory_budget_mb, self.timeout,
+                                   self.max_pixels, self.engine)
+            self._variants[output_format] = variant
+        return variant
+    
+    def new_timer(self, source: str):
+        """Таймер стадій для файлу (заглушка, якщо профілювання вимкнено)"""
+        return StageTimer(source) if self.profile else NULL_TIMER
+    
+    def take_profile_records(self) -> List[dict]:
+        """Повертає і очищає накопичені заміри"""
+        records, self.profile_records = self.profile_records, []
+        return records
+    
+    def save_profile_report(self, output_folder: str, slowest: int = 10,
+                            log: Callable[[str], None] = print) -> Optional[dict]:
+        """
+        Записує звіт профілювання у вихідну папку і виводить підсумок (через log)
+        
+        Returns:
+            Звіт або None, якщо профілювання вимкнено
+        """
+        if not self.profile:
+            return None
+        report = build_profile_report(self.take_profile_records(), slowest)
+        with open(os.path.join(output_folder, self.PROFILE_REPORT), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print_profile_report(report, log)
+        return report
+    
+    def save_quarantine_report(self, output_folder: str) -> List[dict]:
+        """
+        Записує список файлів у карантині у вихідну папку
+        
+        Якщо карантин порожній, звіт попереднього запуску видаляється.
+        
+        Returns:
+            Список файлів у карантині
+        """
+        path = os.path.join(output_folder, self.QUARANTINE_REPORT)
+        if not self.quarantine:
+            if os.path.exists(path):
+                os.remove(path)
+            return []
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.quarantine, f, ensure_ascii=False, indent=2)
+        return self.quarantine
+    
+    def cache_params(self, mode: str, bg_color=(0, 0, 0),
+                     presets: Optional[Dict[str, Tuple[int, int]]] = None) -> dict:
+        """
+        Параметри, від яких залежить результат (ключ маніфесту)
+        
+        Args:
+            mode: 'contain' або 'cover'
+            bg_color: Колір фону для режиму contain
+            presets: Набір розмірів {назва: (ширина, висота)} замість одного розміру
+        """
+        params = {
+            'width': self.target_width,
+            'height': self.target_height,
+            'presets': sorted([name, list(size)] for name, size in presets.items())
+            if presets else None,
+            'mode': mode,
+            'bg_color': list(bg_color) if mode == 'contain' else None,
+            'quality': self.quality,
+            'encoder': self.encoder,
+            'format': self.output_format,
+            'save_options': self.save_options,
+            'max_bytes': self.max_bytes,
+            'anchor': list(self.focus),
+            'reference_quality': self.reference_quality,
+        }
+        if self.engine != 'pillow':
+            # Інший ресемплер - інші пікселі (в межах NumpyResampler.TOLERANCE)
+            params['engine'] = self.engine
+        return params
+    
+    def _scaled_size(self, width: int, height: int, cover: bool,
+                     target: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+        """
+        Обчислює розмір зменшеного зображення зі збереженням пропорцій
+        
+        Args:
+            width: Ширина вхідного зображення
+            height: Висота вхідного зображення
+            cover: True - заповнити кадр (cover), False - вмістити в кадр (contain)
+            target: Цільовий розмір (за замовчуванням - розмір ресайзера)
+        
+        Returns:
+            (нова ширина, нова висота)
+        """
+        target_width, target_height = target or (self.target_width, self.target_height)
+        img_ratio = width / height
+        
+        if (img_ratio > target_width / target_height) != cover:
+            # contain: зображення ширше; cover: зображення вище - масштабуємо по ширині
+            return target_width, int(target_width / img_ratio)
+        # contain: зображення вище; cover: зображення ширше - масштабуємо по висоті
+        return int(target_height * img_ratio), target_height
+    
+    def _open_image(self, image_path: str, cover: bool,
+                    targets: Optional[List[Tuple[int, int]]] = None
+                    ) -> Tuple[Image.Image, List[Tuple[int, int]]]:
+        """
+        Відкриває зображення і підготовлює швидке декодування
+        
+        Розмір береться із заголовка, тому для JPEG можна увімкнути draft-режим
+        (масштабування 1/2, 1/4, 1/8 прямо під час декодування DCT) до ~2x
+        від потрібного розміру. Решту зменшення робить resize() з reducing_gap.
+        
+        Args:
+            image_path: Шлях до вхідного зображення
+            cover: Режим cover (впливає на потрібний розмір)
+            targets: Цільові розміри (за замовчуванням - розмір ресайзера)
+        
+        Returns:
+            (відкрите зображення, розміри після зменшення для кожної цілі)
+        """
+        img = open_image(image_path, self.max_pixels)
+        new_sizes = [
+            self._scaled_size(img.width, img.height, cover, target)
+            for target in targets or [None]
+        ]
+        
+        if not self.reference_quality:
+            # Декодуємо під найбільшу ціль
+            img.draft(None, (int(max(w for w, _ in new_sizes) * self.REDUCING_GAP),
+                             int(max(h for _, h in new_sizes) * self.REDUCING_GAP)))
+        
+        return img, new_sizes
+    
+    def _check_pixels(self, width: int, height: int):
+        """Не допускає декодування завеликих зображень (до виділення пам'яті)"""
+        check_pixels(width, height, self.max_pixels)
+    
+    @staticmethod
+    def probe(image_path: str) -> dict:
+        """
+        Читає лише заголовок зображення (пікселі не декодуються)
+        
+        Returns:
+            {'width', 'height', 'mode', 'format', 'orientation'} - orientation
+            з EXIF (1 - без повороту, 5-8 - ширина і висота поміняні)
+        
+        Raises:
+            Exception: Файл не вдалося відкрити як зображення
+        """
+        with open_image(image_path, None) as img:
+            return {'width': img.width, 'height': img.height,
+                    'mode': img.mode, 'format': img.format,
+                    'orientation': img.getexif().get(0x0112, 1)}
+    
+    def _decoded_size(self, info: dict, targets: List[Tuple[int, int]],
+                      mode: str = 'contain') -> Tuple[int, int]:
+        """Розмір після декодування: JPEG у швидкому режимі зменшується draft-ом"""
+        width, height = info['width'], info['height']
+        if info['format'] == 'JPEG' and not self.reference_quality:
+            new_sizes = [self._scaled_size(width, height, mode == 'cover', t) for t in targets]
+            need_width = max(w for w, _ in new_sizes) * self.REDUCING_GAP
+            need_height = max(h for _, h in new_sizes) * self.REDUCING_GAP
+            scale = 1
+            while (scale < 8 and width / (scale * 2) >= need_width
+                   and height / (scale * 2) >= need_height):
+                scale *= 2
+            width, height = width // scale, height // scale
+        return width, height
+    
+    def estimate_cost(self, info: dict, targets: List[Tuple[int, int]],
+                      mode: str = 'contain') -> dict:
         """
-        Ініціалізація ресайзера
+        Орієнтовна вартість обробки одного файлу за заголовком
         
         Args:
-            target_width: Ширина вихідного зображення
-            target_height: Висота вихідного зображення
+            info: Заголовок (результат probe)
+            targets: Цільові розміри
+            mode: 'contain' або 'cover'
+        
+        Returns:
+            {'pixels', 'seconds', 'output_bytes'}
         """
-        self.target_width = target_width
-        self.target_height = target_height
-        self.target_ratio = target_width / target_height
+        pixels = info['width'] * info['height']
+        width, height = self._decoded_size(info, targets, mode)
+        output_pixels = sum(w * h for w, h in targets)
+        decode_ns = self.DECODE_NS_PER_PIXEL.get(info['format'],
+                                                 self.DEFAULT_DECODE_NS_PER_PIXEL)
+        seconds = (pixels * decode_ns + width * height * self.RESIZE_NS_PER_PIXEL
+                   + output_pixels * self.ENCODE_NS_PER_PIXEL) / 1e9
+        
+        bytes_per_pixel = self.OUTPUT_BYTES_PER_PIXEL[self.output_format]
+        if self.quality:
+            bytes_per_pixel *= (self.quality / 95) ** 2
+        output_bytes = [w * h * bytes_per_pixel for w, h in targets]
+        if self.max_bytes:
+            output_bytes = [min(size, self.max_bytes) for size in output_bytes]
+        return {'pixels': pixels, 'seconds': seconds, 'output_bytes': int(sum(output_bytes))}
+    
+    def preflight(self, jobs: Iterable[tuple], mode: str = 'contain', workers: int = 1,
+                  window: int = 1) -> Iterator[tuple]:
+        """
+        Огляд на ходу: читає лише заголовки і планує порядок обробки
+        
+        Заголовки запам'ятовуються в self.headers, тому планувальник пулу не
+        читає їх удруге. Для пулу процесів задачі в ковзному вікні з window
+        файлів ідуть від найдорожчої до найдешевшої (LPT - longest processing
+        time first): великий файл не стартує останнім серед сусідів і не
+        розтягує кінець обробки. Повного списку файлів немає, тож і пам'ять, і
+        затримка до першого запуску обмежені вікном. Підсумок для
+        print_preflight накопичується в self.preflight_summary.
+        
+        Args:
+            jobs: Задачі (вхідний файл, результат, відбиток) з iter_jobs
+            mode: 'contain' або 'cover'
+            workers: Кількість процесів (1 - порядок не змінюється)
+            window: Скільки задач тримати для впорядкування
+        
+        Yields:
+            Ті самі задачі в порядку обробки
+        """
+        summary = self.preflight_summary = {
+            'files': 0, 'pixels': 0, 'cpu_seconds': 0.0, 'expected_seconds': 0.0,
+            'output_bytes': 0, 'largest': None, 'formats': {}, 'rotated': 0,
+            'unreadable': 0, 'workers': workers,
+        }
+        loads = [0.0] * max(1, workers)
+        largest = -1.0
+        pending = []  # купа (-секунди, номер, задача)
+        
+        def release(seconds, job):
+            # Очікуваний час: жадібний розподіл на найменш завантажений процес
+            heapq.heapreplace(loads, loads[0] + seconds)
+            summary['expected_seconds'] = max(loads)
+            return job
+        
+        for index, job in enumerate(jobs):
+            image_path = str(job[0])
+            summary['files'] += 1
+            try:
+                info = self.probe(image_path)
+            except Exception:
+                # Нечитабельний файл - помилку покаже сама обробка
+                summary['unreadable'] += 1
+                cost = {'pixels': 0, 'seconds': 0.0, 'output_bytes': 0}
+            else:
+                self.headers[image_path] = info
+                formats = summary['formats']
+                formats[info['format']] = formats.get(info['format'], 0) + 1
+                if info['orientation'] in (5, 6, 7, 8):
+                    summary['rotated'] += 1
+                cost = self.estimate_cost(info, self._task_targets(job), mode)
+            summary['pixels'] += cost['pixels']
+            summary['cpu_seconds'] += cost['seconds']
+            summary['output_bytes'] += cost['output_bytes']
+            if cost['seconds'] > largest:
+                largest = cost['seconds']
+                summary['largest'] = image_path
+            
+            if workers <= 1:
+                yield release(cost['seconds'], job)
+                continue
+            heapq.heappush(pending, (-cost['seconds'], index, job))
+            if len(pending) >= window:
+                seconds, _, job = heapq.heappop(pending)
+                yield release(-seconds, job)
+        while pending:
+            seconds, _, job = heapq.heappop(pending)
+            yield release(-seconds, job)
+    
+    def _task_targets(self, task: tuple) -> List[Tuple[int, int]]:
+        """Цільові розміри задачі resize_one"""
+        if isinstance(task[1], str):
+            return [(self.target_width, self.target_height)]
+        return [size for size, _ in task[1]]
+    
+    def estimate_footprint(self, info: dict, targets: List[Tuple[int, int]],
+                           mode: str = 'contain') -> int:
+        """
+        Оцінка пікової пам'яті на обробку одного файлу, байти
+        
+        Враховує draft-зменшення JPEG, копію при конвертації в RGB,
+        проміжне зображення reduce() і результати для всіх цілей.
+        
+        Args:
+            info: Заголовок (результат probe)
+            targets: Цільові розміри
+            mode: 'contain' або 'cover'
+        """
+        width, height = self._decoded_size(info, targets, mode)
+        pixels = width * height
+        # Pillow зберігає багатоканальні зображення по 4 байти на піксель
+        bytes_per_pixel = 1 if info['mode'] in ('1', 'L', 'P') else 4
+        footprint = pixels * bytes_per_pixel
+        if info['mode'] != 'RGB':
+            footprint += pixels * 4
+        if not self.reference_quality:
+            footprint += pixels * 4 // int(self.REDUCING_GAP ** 2)
+        footprint += sum(w * h * 4 * 2 for w, h in targets)
+        return footprint
+    
+    def task_cost(self, task: tuple) -> Tuple[int, Optional[str]]:
+        """
+        Оцінка пам'яті для задачі resize_one за заголовком файлу
+        
+        Returns:
+            (оцінка в байтах, причина для карантину або None)
+        """
+        image_path = str(task[0])
+        try:
+            info = self.headers.get(image_path) or self.probe(image_path)
+            self._check_pixels(info['width'], info['height'])
+        except Image.DecompressionBombError as e:
+            return 0, str(e)
+        except Exception:
+            # Нечитабельний файл - помилку покаже сама обробка
+            return 0, None
+        return self.estimate_footprint(info, self._task_targets(task), task[2]), None
+    
+    def data_cost(self, task: tuple) -> Tuple[int, Optional[str]]:
+        """Оцінка пам'яті для задачі render_task (з байтів у пам'яті, а не з файлу)"""
+        try:
+            info = self.probe(io.BytesIO(task[1]))
+            self._check_pixels(info['width'], info['height'])
+        except Image.DecompressionBombError as e:
+            return 0, str(e)
+        except Exception:
+            return 0, None
+        return self.estimate_footprint(info, task[2], task[3]) + len(task[1]), None
+    
+    def add_quarantine(self, image_path: str, reason: str, detail: str):
+        """Додає файл до карантину і повідомляє про це"""
+        self.quarantine.append({'path': str(image_path), 'reason': reason, 'detail': detail})
+        print(f"🚧 Карантин ({reason}): {image_path} - {detail}")
+    
+    def memory_budget(self) -> float:
+        """Бюджет пам'яті пулу в байтах (inf, якщо його неможливо визначити)"""
+        if self.memory_budget_mb:
+            return self.memory_budget_mb * 1024 * 1024
+        total = system_memory()
+        return total // 2 if total else float('inf')
+    
+    def _to_rgb(self, img: Image.Image, mode: str, bg_color=(0, 0, 0)) -> Image.Image:
+        """Конвертує зображення в RGB (contain: прозорість заливається кольором фону)"""
+        if mode == 'contain' and img.mode in ('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', img.size, bg_color)
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+            return background
+        if img.mode != 'RGB':
+            return img.convert('RGB')
+        return img
+    
+    def _resize(self, img: Image.Image, new_size: Tuple[int, int],
+                box: Optional[Tuple[float, float, float, float]] = None) -> Image.Image:
+        """Зменшує зображення (або його ділянку box) LANCZOS, зі швидким reduce() якщо дозволено"""
+        if self.reference_quality:
+            return img.resize(new_size, Image.Resampling.LANCZOS, box=box)
+        return img.resize(new_size, Image.Resampling.LANCZOS, box=box,
+                          reducing_gap=self.REDUCING_GAP)
+    
+    def _crop_offset(self, size: float, window: float, focus: float) -> float:
+        """Початок вікна обрізання: центр на фокусній точці, але в межах зображення"""
+        return min(max(focus * size - window / 2, 0), size - window)
+    
+    def _cover_box(self, size: Tuple[int, int],
+                   target: Optional[Tuple[int, int]] = None
+                   ) -> Tuple[float, float, float, float]:
+        """
+        Ділянка вхідного зображення, яка після масштабування заповнить кадр
+        
+        Координати дробові: ділянка має рівно пропорції цілі, тому resize(box=...)
+        дає готовий кадр без ресемплінгу пікселів, які потім відкинув би crop().
+        
+        Args:
+            size: Розмір вхідного зображення
+            target: Цільовий розмір (за замовчуванням - розмір ресайзера)
+        
+        Returns:
+            (left, top, right, bottom) у координатах вхідного зображення
+        """
+        width, height = size
+        target_width, target_height = target or (self.target_width, self.target_height)
+        scale = max(target_width / width, target_height / height)
+        crop_width = min(width, target_width / scale)
+        crop_height = min(height, target_height / scale)
+        left = self._crop_offset(width, crop_width, self.focus[0])
+        top = self._crop_offset(height, crop_height, self.focus[1])
+        return left, top, left + crop_width, top + crop_height
+    
+    def _compose(self, img_resized: Image.Image, mode: str, bg_color=(0, 0, 0),
+                 target: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        Доводить зменшене зображення до цільового розміру
+        
+        contain - центрує на полотні кольору bg_color, cover - обрізає краї навколо
+        фокусної точки (anchor)
+        """
+        target_width, target_height = target or (self.target_width, self.target_height)
+        new_width, new_height = img_resized.size
+        
+        if mode == 'contain':
+            # Створюємо нове зображення з цільовим розміром і центруємо
+            new_img = Image.new('RGB', (target_width, target_height), bg_color)
+            paste_x = (target_width - new_width) // 2
+            paste_y = (target_height - new_height) // 2
+            new_img.paste(img_resized, (paste_x, paste_y))
+            return new_img
+        
+        # Обрізаємо до потрібного розміру (навколо фокусної точки)
+        left = int(self._crop_offset(new_width, target_width, self.focus[0]))
+        top = int(self._crop_offset(new_height, target_height, self.focus[1]))
+        return img_resized.crop((left, top, left + target_width, top + target_height))
+    
+    def decode(self, image_path: str, mode: str = 'contain', bg_color=(0, 0, 0),
+               targets: Optional[List[Tuple[int, int]]] = None, timer=NULL_TIMER
+               ) -> Tuple[Image.Image, List[Tuple[int, int]]]:
+        """
+        Стадія декодування: відкриває файл і приводить зображення до RGB
+        
+        Args:
+            image_path: Шлях до вхідного зображення
+            mode: 'contain' або 'cover'
+            bg_color: Колір фону для режиму contain
+            targets: Цільові розміри (за замовчуванням - розмір ресайзера)
+            timer: Таймер стадій (StageTimer) для профілювання
+        
+        Returns:
+            (RGB зображення, розміри після зменшення для кожної цілі)
+        """
+        with timer('open'):
+            img, new_sizes = self._open_image(image_path, mode == 'cover', targets)
+        if timer.enabled:
+            timer.count(input_pixels=img.width * img.height,
+                        input_bytes=(os.path.getsize(image_path)
+                                     if isinstance(image_path, (str, Path))
+                                     else len(image_path.getbuffer())))
+        with timer('decode'):
+            img.load()
+        with timer('convert'):
+            img = self._to_rgb(img, mode, bg_color)
+        return img, new_sizes
+    
+    def render(self, img: Image.Image, new_sizes: List[Tuple[int, int]],
+               targets: Optional[List[Tuple[int, int]]] = None, mode: str = 'contain',
+               bg_color=(0, 0, 0), timer=NULL_TIMER) -> List[Image.Image]:
+        """
+        Стадія ресайзу: отримує з декодованого зображення всі цільові розміри
+        
+        Цілі обробляються від найбільшої до найменшої. У швидкому режимі кожна
+        наступна ціль зменшується з найменшого вже готового проміжного
+        зображення, яке ще щонайменше в REDUCING_GAP разів більше за неї.
+        Cover в обох режимах масштабує лише ділянку, що потрапить у кадр
+        (_cover_box), тому кожна ціль береться з повного декодованого зображення.
+        LANCZOS з box - точний ресемплінг ділянки повного зображення, тож
+        еталонний режим лишається еталонним, а відкинуті краї не ресемплюються.
+        
+        Args:
+            img: RGB зображення (результат decode)
+            new_sizes: Розміри після зменшення (результат decode)
+            targets: Цільові розміри (за замовчуванням - розмір ресайзера)
+            mode: 'contain' або 'cover'
+            bg_color: Колір фону для режиму contain
+            timer: Таймер стадій (StageTimer) для профілювання
+        
+        Returns:
+            Готові зображення в порядку targets
+        """
+        targets = targets or [None]
+        order = sorted(range(len(targets)), key=lambda i: new_sizes[i][0] * new_sizes[i][1],
+                       reverse=True)
+        results = [None] * len(targets)
+        intermediates = []
+        for i in order:
+            if mode == 'cover':
+                target = targets[i] or (self.target_width, self.target_height)
+                with timer('resize'):
+                    results[i] = self._resize(img, target, self._cover_box(img.size, target))
+                if timer.enabled:
+                    timer.count(output_pixels=results[i].width * results[i].height)
+                continue
+            
+            new_width, new_height = new_sizes[i]
+            
+            source = img
+            if not self.reference_quality:
+                for candidate in intermediates:
+                    if (candidate.width >= new_width * self.REDUCING_GAP
+                            and candidate.height >= new_height * self.REDUCING_GAP):
+                        source = candidate
+            
+            with timer('resize'):
+                img_resized = self._resize(source, (new_width, new_height))
+            intermediates.append(img_resized)
+            with timer('compose'):
+                results[i] = self._compose(img_resized, mode, bg_color, targets[i])
+            if timer.enabled:
+                timer.count(output_pixels=results[i].width * results[i].height)
+        return results
+    
+    def _encode_with(self, img: Image.Image, options: dict) -> bytes:
+        """Кодує зображення в пам'ять з указаними параметрами save()"""
+        buffer = io.BytesIO()
+        img.save(buffer, OUTPUT_FORMATS[self.output_format][0], **options)
+        return buffer.getvalue()
+    
+    def _similarity_key(self, img: Image.Image) -> tuple:
+        """
+        Ключ "схожості" зображень для кешу якості
+        
+        Розмір результату при однаковій якості залежить в основному від
+        розміру кадру і кількості дрібних деталей. Деталі оцінюються за
+        середньою яскравістю контурів на мініатюрі ~64 px.
+        """
+        thumb = img.reduce(max(1, min(img.size) // 64)).convert('L')
+        detail = ImageStat.Stat(thumb.filter(ImageFilter.FIND_EDGES)).mean[0]
+        return img.size, int(detail // 4)
+    
+    def _encode_to_size(self, img: Image.Image, timer=NULL_TIMER) -> bytes:
+        """
+        Підбирає найвищу якість, за якої результат вміщується в max_bytes
+        
+        Усі спроби кодуються в пам'ять. Пошук починається з якості, що
+        підійшла для схожого зображення раніше: зазвичай достатньо перевірити
+        її та сусідню (1-2 кодування), інакше - двійковий пошук.
+        
+        Raises:
+            ValueError: Результат не вміщується навіть з мінімальною якістю
+        """
+        options = dict(self.save_options)
+        
+        def attempt(quality):
+            options['quality'] = quality
+            timer.count(encodes=1)
+            return self._encode_with(img, options)
+        
+        if 'quality' not in options:
+            # PNG - без втрат, якість не регулюється
+            timer.count(encodes=1)
+            data = self._encode_with(img, options)
+            if len(data) > self.max_bytes:
+                raise ValueError(f"{len(data)} байт > {self.max_bytes} (PNG без втрат)")
+            return data
+        
+        low, high = self.MIN_QUALITY, options['quality']
+        key = self._similarity_key(img)
+        guess = min(high, max(low, self._quality_cache.get(key, high)))
+        best = None
+        
+        data = attempt(guess)
+        if len(data) <= self.max_bytes:
+            best = (guess, data)
+            if guess < high:
+                # Перевіряємо, чи не вміститься вища якість
+                data = attempt(guess + 1)
+                if len(data) <= self.max_bytes:
+                    best = (guess + 1, data)
+                    low = guess + 2
+                else:
+                    high = guess
+            low = max(low, best[0] + 1)
+        elif guess > low:
+            data = attempt(guess - 1)
+            if len(data) <= self.max_bytes:
+                best = (guess - 1, data)
+                high = low - 1
+            else:
+                high = guess - 2
+        else:
+            high = low - 1
+        
+        while low <= high:
+            mid = (low + high) // 2
+            data = attempt(mid)
+            if len(data) <= self.max_bytes:
+                best = (mid, data)
+                low = mid + 1
+            else:
+                high = mid - 1
+        
+        if best is None:
+            raise ValueError(f"не вміщується в {self.max_bytes} байт "
+                             f"навіть з якістю {self.MIN_QUALITY}")
+        self._quality_cache[key] = best[0]
+        return best[1]
+    
+    def encode(self, img: Image.Image, timer=NULL_TIMER) -> bytes:
+        """Стадія кодування: формат і параметри з профілю кодувача, в пам'ять"""
+        with timer('encode'):
+            if self.max_bytes:
+                return self._encode_to_size(img, timer)
+            return self._encode_with(img, self.save_options)
+    
+    @staticmethod
+    def write(output_path: str, data: bytes, timer=NULL_TIMER):
+        """Стадія запису: зберігає закодований результат у файл"""
+        with timer('write'):
+            atomic_write(output_path, data)
+        if timer.enabled:
+            timer.count(output_bytes=len(data))
+    
+    def resize_file(self, image_path: str, targets: List[Tuple[Tuple[int, int], str]],
+                    mode: str = 'contain', bg_color=(0, 0, 0)):
+        """
+        Декодує зображення один раз і зберігає його в кількох розмірах
+        
+        Args:
+            image_path: Шлях до вхідного зображення
+            targets: Список ((ширина, висота), шлях для збереження)
+            mode: 'contain' або 'cover'
+            bg_color: Колір фону для режиму contain
+        
+        Raises:
+            Exception: Будь-яка помилка відкриття, обробки чи збереження
+        """
+        timer = self.new_timer(image_path)
+        try:
+            sizes = [size for size, _ in targets]
+            img, new_sizes = self.decode(image_path, mode, bg_color, sizes, timer)
+            rendered = self.render(img, new_sizes, sizes, mode, bg_color, timer)
+            for (_, output_path), new_img in zip(targets, rendered):
+                self.write(output_path, self.encode(new_img, timer), timer)
+            if timer.enabled:
+                timer.record['ok'] = True
+        finally:
+            if timer.enabled:
+                self.profile_records.append(timer.record)
+    
+    def render_data(self, name: str, data: Optional[bytes], sizes: List[Tuple[int, int]],
+                    mode: str = 'contain', bg_color=(0, 0, 0)) -> List[bytes]:
+        """
+        Як resize_file, але результати - байти в пам'яті (архіви, HTTP-сервіс)
+        
+        Args:
+            name: Ім'я файлу (для профілювання; шлях, якщо data не задано)
+            data: Вміст вхідного зображення (None - читати файл name)
+            sizes: Цільові розміри
+            mode: 'contain' або 'cover'
+            bg_color: Колір фону для режиму contain
+        
+        Returns:
+            Закодовані результати в порядку sizes
+        """
+        timer = self.new_timer(name)
+        try:
+            source = name if data is None else io.BytesIO(data)
+            img, new_sizes = self.decode(source, mode, bg_color, sizes, timer)
+            rendered = self.render(img, new_sizes, sizes, mode, bg_color, timer)
+            outputs = [self.encode(new_img, timer) for new_img in rendered]
+            if timer.enabled:
+                timer.count(output_bytes=sum(len(output) for output in outputs))
+                timer.record['ok'] = True
+            return outputs
+        finally:
+            if timer.enabled:
+                self.profile_records.append(timer.record)
+    
+    def render_task(self, task: tuple) -> Optional[List[bytes]]:
+        """
+        Обробляє задачу (ім'я, байти, розміри, режим, фон) з архіву
+        
+        Returns:
+            Закодовані результати або None, якщо помилка
+        """
+        try:
+            return self.render_data(*task)
+        except Exception as e:
+            print(f"❌ Помилка при обробці {task[0]}: {e}")
+            return None
+    
+    def run_job(self, image_path: str, output_path: str, size: Tuple[int, int],
+                mode: str = 'contain', bg_color=(0, 0, 0)) -> dict:
+        """
+        Обробляє одну задачу JobStream: заміри стадій збираються завжди
         
+        Помилка не виводиться, а повертається в результаті (stdout потоку
+        зайнятий JSON-рядками результатів).
+        
+        Returns:
+            {'ok', 'width', 'height', 'bytes', 'time_ms', 'stages_ms'}
+            або {'ok': False, 'error', 'time_ms', 'stages_ms'}
+        """
+        timer = StageTimer(image_path)
+        started = time.perf_counter()
+        try:
+            img, new_sizes = self.decode(image_path, mode, bg_color, [size], timer)
+            new_img, = self.render(img, new_sizes, [size], mode, bg_color, timer)
+            directory = os.path.dirname(output_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.write(output_path, self.encode(new_img, timer), timer)
+            timer.record['ok'] = True
+            result = {'ok': True, 'width': new_img.width, 'height': new_img.height,
+                      'bytes': timer.record['output_bytes']}
+        except Exception as e:
+            result = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        result['time_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        result['stages_ms'] = {stage: round(wall * 1000, 1)
+                               for stage, (wall, _) in timer.record['stages'].items()}
+        if self.profile:
+            self.profile_records.append(timer.record)
+        return result
+    
+    def run_job_task(self, task: tuple) -> dict:
+        """Задача JobStream: (вхідний файл, результат, розмір, режим, фон, формат)"""
+        resizer = self.for_format(task[5])
+        result = resizer.run_job(*task[:5])
+        if resizer is not self:
+            self.profile_records.extend(resizer.take_profile_records())
+        return result
+    
+    def job_cost(self, task: tuple) -> Tuple[int, Optional[str]]:
+        """Оцінка пам'яті для задачі run_job_task (як task_cost)"""
+        return self.task_cost((task[0], [(task[2], task[1])], task[3]))
+    
     def resize_image_contain(self, image_path: str, output_path: str, 
                             bg_color=(0, 0, 0)) -> bool:
         """
@@ -33,179 +2326,2058 @@ class ImageResizer:
             output_path: Шлях для збереження
             bg_color: Колір фону (чорний за замовчуванням)
         
+        Returns:
+            True якщо успішно, False якщо помилка
+        """
+        return self.resize_image_multi(
+            image_path, [((self.target_width, self.target_height), output_path)],
+            'contain', bg_color
+        )
+    
+    def resize_image_cover(self, image_path: str, output_path: str) -> bool:
+        """
+        Зменшує зображення заповнюючи весь кадр (може обрізати краї)
+        
+        Args:
+            image_path: Шлях до вхідного зображення
+            output_path: Шлях для збереження
+        
+        Returns:
+            True якщо успішно, False якщо помилка
+        """
+        return self.resize_image_multi(
+            image_path, [((self.target_width, self.target_height), output_path)], 'cover'
+        )
+    
+    def resize_image_multi(self, image_path: str,
+                           targets: List[Tuple[Tuple[int, int], str]],
+                           mode: str = 'contain', bg_color=(0, 0, 0)) -> bool:
+        """
+        Зберігає зображення в кількох розмірах за одне декодування
+        
+        Args:
+            image_path: Шлях до вхідного зображення
+            targets: Список ((ширина, висота), шлях для збереження)
+            mode: 'contain' або 'cover'
+            bg_color: Колір фону для режиму contain
+        
         Returns:
             True якщо успішно, False якщо помилка
         """
         try:
-            # Відкриваємо зображення
-            img = Image.open(image_path)
-            
-            # Конвертуємо в RGB якщо потрібно
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, bg_color)
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Обчислюємо пропорції
-            img_ratio = img.width / img.height
-            
-            # Визначаємо новий розмір зі збереженням пропорцій
-            if img_ratio > self.target_ratio:
-                # Зображення ширше ніж потрібно
-                new_width = self.target_width
-                new_height = int(self.target_width / img_ratio)
-            else:
-                # Зображення вище ніж потрібно
-                new_height = self.target_height
-                new_width = int(self.target_height * img_ratio)
-            
-            # Зменшуємо зображення з високою якістю
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Створюємо нове зображення з цільовим розміром
-            new_img = Image.new('RGB', (self.target_width, self.target_height), bg_color)
-            
-            # Центруємо зменшене зображення
-            paste_x = (self.target_width - new_width) // 2
-            paste_y = (self.target_height - new_height) // 2
-            new_img.paste(img_resized, (paste_x, paste_y))
-            
-            # Зберігаємо з високою якістю
-            new_img.save(output_path, 'JPEG', quality=95, optimize=True)
-            
+            self.resize_file(image_path, targets, mode, bg_color)
             return True
             
         except Exception as e:
             print(f"❌ Помилка при обробці {image_path}: {e}")
             return False
     
-    def resize_image_cover(self, image_path: str, output_path: str) -> bool:
+    def resize_one(self, image_path: str, output_path, mode: str = 'contain',
+                   bg_color=(0, 0, 0)) -> bool:
         """
-        Зменшує зображення заповнюючи весь кадр (може обрізати краї)
+        Обробляє одне зображення у вибраному режимі
         
         Args:
             image_path: Шлях до вхідного зображення
-            output_path: Шлях для збереження
+            output_path: Шлях для збереження або список ((ширина, висота), шлях)
+                для кількох розмірів
+            mode: 'contain' або 'cover'
+            bg_color: Колір фону для режиму contain
         
         Returns:
             True якщо успішно, False якщо помилка
         """
-        try:
-            img = Image.open(image_path)
-            
-            # Конвертуємо в RGB
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Обчислюємо пропорції
-            img_ratio = img.width / img.height
-            
-            # Масштабуємо щоб заповнити весь кадр
-            if img_ratio > self.target_ratio:
-                # Зображення ширше - масштабуємо по висоті
-                new_height = self.target_height
-                new_width = int(self.target_height * img_ratio)
-            else:
-                # Зображення вище - масштабуємо по ширині
-                new_width = self.target_width
-                new_height = int(self.target_width / img_ratio)
-            
-            # Зменшуємо
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Обрізаємо до потрібного розміру (центруємо)
-            left = (new_width - self.target_width) // 2
-            top = (new_height - self.target_height) // 2
-            right = left + self.target_width
-            bottom = top + self.target_height
-            
-            img_cropped = img_resized.crop((left, top, right, bottom))
-            
-            # Зберігаємо
-            img_cropped.save(output_path, 'JPEG', quality=95, optimize=True)
-            
-            return True
-            
-        except Exception as e:
-            print(f"❌ Помилка при обробці {image_path}: {e}")
-            return False
+        if not isinstance(output_path, str):
+            return self.resize_image_multi(image_path, output_path, mode, bg_color)
+        if mode == 'contain':
+            return self.resize_image_contain(image_path, output_path, bg_color)
+        return self.resize_image_cover(image_path, output_path)
+    
+    def _group_key(self, task: tuple) -> Optional[tuple]:
+        """
+        Ключ групи для engine='numpy': задачі з однаковим ключем ресайзяться стеком
+        
+        Returns:
+            (ширина, висота, режим, формат, цілі, mode, фон) або None, якщо
+            заголовок не читається (такий файл обробляється окремо)
+        """
+        image_path = str(task[0])
+        try:
+            info = self.headers.get(image_path) or self.probe(image_path)
+        except Exception:
+            return None
+        return (info['width'], info['height'], info['mode'], info['format'],
+                tuple(self._task_targets(task)), task[2], tuple(task[3]))
+    
+    def _iter_groups(self, tasks: Iterable[tuple]) -> Iterator[Tuple[str, List[tuple]]]:
+        """
+        Об'єднує сусідні задачі з однаковим ключем у групи (label, [задачі])
+        
+        Групуються лише послідовні задачі, тому порядок результатів не
+        змінюється, а tasks може бути лінивим ітератором. Група обмежена
+        GROUP_SIZE файлами і GROUP_BYTES оціночної пам'яті.
+        """
+        def label(group):
+            first = str(group[0][0])
+            return first if len(group) == 1 else f"{first} (+{len(group) - 1})"
+        
+        group, group_key, group_bytes = [], None, 0
+        for task in tasks:
+            key = self._group_key(task)
+            footprint = self.task_cost(task)[0] if key is not None else 0
+            if group and (key is None or key != group_key or len(group) >= self.GROUP_SIZE
+                          or group_bytes + footprint > self.GROUP_BYTES):
+                yield label(group), group
+                group, group_bytes = [], 0
+            group.append(task)
+            group_key = key
+            group_bytes += footprint
+        if group:
+            yield label(group), group
+    
+    def group_cost(self, task: tuple) -> Tuple[int, Optional[str]]:
+        """Оцінка пам'яті для групи (label, [задачі]): сума по файлах"""
+        total = 0
+        for member in task[1]:
+            footprint, reason = self.task_cost(member)
+            if reason:
+                return 0, reason
+            total += footprint
+        return total, None
+    
+    def resize_group(self, group: List[tuple]) -> List[bool]:
+        """
+        Обробляє групу задач resize_one однакової геометрії одним стеком NumPy
+        
+        Файли декодуються як завжди (з JPEG draft), а ресайз усіх цілей і поля
+        contain робить NumpyResampler для всього стеку одразу. Файли, розмір
+        яких після декодування відрізняється від першого, обробляються окремо
+        через Pillow. Помилка в одному файлі не зупиняє решту групи.
+        
+        Args:
+            group: Задачі (шлях, шлях результату або список ((w, h), шлях), mode, фон)
+        
+        Returns:
+            Результат для кожної задачі (True - успішно)
+        """
+        if len(group) == 1:
+            return [self.resize_one(*group[0])]
+        mode, bg_color = group[0][2], group[0][3]
+        targets = self._task_targets(group[0])
+        results = [False] * len(group)
+        timers = [self.new_timer(str(task[0])) for task in group]
+        
+        try:
+            images, members, new_sizes = [], [], None
+            for i, task in enumerate(group):
+                try:
+                    img, sizes = self.decode(str(task[0]), mode, bg_color, targets, timers[i])
+                except Exception as e:
+                    print(f"❌ Помилка при обробці {task[0]}: {e}")
+                    continue
+                if images and img.size != images[0].size:
+                    results[i] = self.resize_one(*task)
+                    continue
+                images.append(img)
+                members.append(i)
+                new_sizes = sizes
+            if not images:
+                return results
+            
+            # Спільні стадії групи записуються в таймер першого файлу
+            try:
+                rendered = self._render_stack(images, new_sizes, targets, mode, bg_color,
+                                              timers[members[0]])
+            except Exception as e:
+                print(f"❌ Помилка при обробці {group[members[0]][0]} (+{len(members) - 1}): {e}")
+                return results
+            del images
+            
+            for n, i in enumerate(members):
+                timer = timers[i]
+                try:
+                    for frames, output_path in zip(rendered, self.output_paths(group[i][1])):
+                        if timer.enabled:
+                            timer.count(output_pixels=frames.shape[1] * frames.shape[2])
+                        self.write(output_path, self.encode(Image.fromarray(frames[n]), timer),
+                                   timer)
+                    results[i] = True
+                    if timer.enabled:
+                        timer.record['ok'] = True
+                except Exception as e:
+                    print(f"❌ Помилка при обробці {group[i][0]}: {e}")
+            return results
+        finally:
+            for timer in timers:
+                if timer.enabled:
+                    self.profile_records.append(timer.record)
+    
+    def _resize_stack(self, source, size: Tuple[int, int],
+                      box: Optional[Tuple[float, float, float, float]] = None,
+                      timer=NULL_TIMER) -> 'np.ndarray':
+        """
+        _resize для групи кадрів: LANCZOS NumpyResampler на всьому стеку
+        
+        У швидкому режимі спершу той самий reduce(), що робить
+        Image.resize(reducing_gap=REDUCING_GAP): множник і розширена ділянка
+        (safe box) рахуються так само, а саме зменшення - Image.reduce для
+        кожного кадру (це копійчана операція, і пікселі виходять ті самі).
+        
+        Args:
+            source: Список RGB зображень однакового розміру або uint8 стек (N, h, w, 3)
+            size: (ширина, висота) результату
+            box: Ділянка кадру (left, top, right, bottom), None - весь кадр
+        """
+        if isinstance(source, list):
+            width, height = source[0].size
+        else:
+            width, height = source.shape[2], source.shape[1]
+        box = box or (0, 0, width, height)
+        if not self.reference_quality:
+            factor_x = int((box[2] - box[0]) / size[0] / self.REDUCING_GAP) or 1
+            factor_y = int((box[3] - box[1]) / size[1] / self.REDUCING_GAP) or 1
+            if factor_x > 1 or factor_y > 1:
+                # Як Image._get_safe_box: + носій LANCZOS (3 - 0.5) в пікселях джерела
+                support_x = 2.5 * (box[2] - box[0]) / size[0]
+                support_y = 2.5 * (box[3] - box[1]) / size[1]
+                reduce_box = (max(0, int(box[0] - support_x)), max(0, int(box[1] - support_y)),
+                              min(width, math.ceil(box[2] + support_x)),
+                              min(height, math.ceil(box[3] + support_y)))
+                frames = source if isinstance(source, list) else map(Image.fromarray, source)
+                with timer('reduce'):
+                    source = [frame.reduce((factor_x, factor_y), reduce_box) for frame in frames]
+                box = ((box[0] - reduce_box[0]) / factor_x, (box[1] - reduce_box[1]) / factor_y,
+                       (box[2] - reduce_box[0]) / factor_x, (box[3] - reduce_box[1]) / factor_y)
+        if isinstance(source, list):
+            with timer('stack'):
+                source = self.resampler.stack(source)
+        with timer('resize'):
+            return self.resampler.resize(source, size, box)
+    
+    def _render_stack(self, images: List[Image.Image], new_sizes: List[Tuple[int, int]],
+                      targets: List[Tuple[int, int]], mode: str, bg_color,
+                      timer=NULL_TIMER) -> List['np.ndarray']:
+        """
+        Стадія ресайзу resize_group: всі цілі для групи однакових за розміром зображень
+        
+        Геометрія та сама, що в render: cover масштабує ділянку _cover_box,
+        contain - зменшення до new_sizes (у швидкому режимі з найменшого
+        готового проміжного стеку, щонайменше в REDUCING_GAP разів більшого)
+        і поля.
+        
+        Returns:
+            uint8 масиви (N, висота, ширина, 3) в порядку targets
+        """
+        size = images[0].size
+        order = sorted(range(len(targets)), key=lambda i: new_sizes[i][0] * new_sizes[i][1],
+                       reverse=True)
+        rendered = [None] * len(targets)
+        intermediates = []
+        for i in order:
+            target = targets[i]
+            new_width, new_height = new_sizes[i]
+            if mode == 'cover':
+                rendered[i] = self._resize_stack(images, target, self._cover_box(size, target),
+                                                 timer)
+                continue
+            
+            source = images
+            if not self.reference_quality:
+                for candidate in intermediates:
+                    if (candidate.shape[2] >= new_width * self.REDUCING_GAP
+                            and candidate.shape[1] >= new_height * self.REDUCING_GAP):
+                        source = candidate
+            frames = self._resize_stack(source, (new_width, new_height), timer=timer)
+            intermediates.append(frames)
+            with timer('compose'):
+                rendered[i] = self.resampler.letterbox(frames, target, bg_color)
+        return rendered
+    
+    def iter_results(self, tasks: Iterable[tuple], workers: int = 1,
+                     cancel_event: Optional[threading.Event] = None) -> Iterator[bool]:
+        """
+        Виконує задачі і повертає результати в порядку їх подання
+        
+        При workers > 1 (або заданому timeout) задачі виконуються в пулі
+        процесів через PoolScheduler: з бюджетом пам'яті, таймаутом і
+        карантином. Кількість задач "у польоті" обмежена, тому tasks може бути
+        будь-яким ітератором. Після cancel_event.set() нові задачі не
+        запускаються, а зображення, що вже обробляються, дописуються до кінця.
+        
+        Args:
+            tasks: Кортежі аргументів для resize_one
+            workers: Кількість процесів (1 - обробка в поточному процесі)
+            cancel_event: Подія для зупинки обробки (None - без скасування)
+        
+        З engine='numpy' сусідні задачі однакової геометрії об'єднуються в
+        групи (resize_group); таймаут і карантин тоді діють на групу.
+        
+        Yields:
+            Результат resize_one для кожної задачі (False для карантину)
+        """
+        if self.resampler is None:
+            yield from self._run_tasks(tasks, workers, cancel_event, _resize_in_worker,
+                                       self.task_cost, lambda task: self.resize_one(*task),
+                                       False)
+            return
+        
+        yield from self.run_grouped(tasks, lambda groups: self._run_tasks(
+            groups, workers, cancel_event, _resize_group_in_worker, self.group_cost,
+            lambda task: self.resize_group(task[1]), None))
+    
+    def run_grouped(self, tasks: Iterable[tuple], run_groups) -> Iterator[bool]:
+        """
+        Виконує задачі resize_one групами (engine='numpy') і розгортає результати
+        
+        Args:
+            tasks: Кортежі аргументів для resize_one
+            run_groups: Функція: ітератор груп (label, [задачі]) -> результати
+                _resize_group_in_worker по порядку (None - група не оброблена)
+        
+        Yields:
+            Результат для кожної задачі
+        """
+        groups = deque()
+        
+        def iter_groups():
+            for group in self._iter_groups(tasks):
+                groups.append(group)
+                yield group
+        
+        for oks in run_groups(iter_groups()):
+            size = len(groups.popleft()[1])
+            yield from oks if oks is not None else [False] * size
+    
+    def iter_rendered(self, tasks: Iterable[tuple], workers: int = 1,
+                      cancel_event: Optional[threading.Event] = None
+                      ) -> Iterator[Optional[List[bytes]]]:
+        """
+        Як iter_results, але для задач render_task: результати - байти
+        
+        Yields:
+            Закодовані результати для кожної задачі (None - помилка або карантин)
+        """
+        yield from self._run_tasks(tasks, workers, cancel_event, _render_in_worker,
+                                   self.data_cost, self.render_task, None)
+    
+    def _run_tasks(self, tasks: Iterable[tuple], workers: int,
+                   cancel_event: Optional[threading.Event], func, cost, run_one, failed):
+        """Спільна частина iter_results та iter_rendered (пул або поточний процес)"""
+        def cancelled():
+            return cancel_event is not None and cancel_event.is_set()
+        
+        if workers > 1 or self.timeout:
+            yield from PoolScheduler(self, max(1, workers)).run(tasks, cancelled, func,
+                                                                cost, failed)
+            return
+        
+        for task in tasks:
+            if cancelled():
+                return
+            _, reason = cost(task)
+            if reason:
+                self.add_quarantine(task[0], 'pixels', reason)
+                yield failed
+                continue
+            yield run_one(task)
+    
+    def iter_staged(self, tasks: Iterable[tuple], stop: threading.Event,
+                    cancel_event: Optional[threading.Event] = None,
+                    queues: Optional[List[StageQueue]] = None) -> Iterator[bool]:
+        """
+        Виконує задачі resize_one в поточному процесі конвеєром decode → resize → encode → write
+        
+        Стадії decode, resize і encode - окремі потоки, з'єднані обмеженими
+        чергами StageQueue (по STAGE_QUEUE_SIZE елементів), запис - у
+        поточному потоці. Pillow відпускає GIL під час декодування, LANCZOS і
+        кодування, тож читання з диска, обчислення і запис наступних файлів
+        перекриваються, а в пам'яті одночасно лише кілька зображень.
+        Результати - у порядку задач. Після cancel_event.set() нові файли не
+        декодуються, а вже декодовані дописуються до кінця.
+        
+        Args:
+            tasks: Кортежі аргументів для resize_one (читаються в потоці decode)
+            stop: Подія зупинки конвеєра (встановлюється при виході)
+            cancel_event: Подія для зупинки обробки (None - без скасування)
+            queues: Список, до якого додаються черги стадій (для звіту)
+        
+        Yields:
+            Результат для кожної задачі (False - помилка або карантин)
+        """
+        def decode(tasks):
+            for task in tasks:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                image_path, output_path, mode, bg_color = task
+                if isinstance(output_path, str):
+                    output_path = [((self.target_width, self.target_height), output_path)]
+                item = {'task': task, 'targets': output_path, 'data': None,
+                        'error': None, 'quarantined': False,
+                        'timer': self.new_timer(str(image_path))}
+                _, reason = self.task_cost(task)
+                if reason:
+                    self.add_quarantine(image_path, 'pixels', reason)
+                    item['quarantined'] = True
+                else:
+                    try:
+                        item['data'] = self.decode(image_path, mode, bg_color,
+                                                   [size for size, _ in output_path],
+                                                   item['timer'])
+                    except Exception as e:
+                        item['error'] = e
+                yield item
+        
+        def resize(item):
+            img, new_sizes = item['data']
+            _, _, mode, bg_color = item['task']
+            return self.render(img, new_sizes, [size for size, _ in item['targets']],
+                               mode, bg_color, item['timer'])
+        
+        def encode(item):
+            return [self.encode(img, item['timer']) for img in item['data']]
+        
+        def stage(items, func):
+            for item in items:
+                if item['data'] is not None:
+                    try:
+                        item['data'] = func(item)
+                    except Exception as e:
+                        item['error'] = e
+                        item['data'] = None
+                yield item
+        
+        decoded = StageQueue('decode', self.STAGE_QUEUE_SIZE, stop).feed(decode(tasks))
+        resized = StageQueue('resize', self.STAGE_QUEUE_SIZE, stop).feed(stage(decoded, resize))
+        encoded = StageQueue('encode', self.STAGE_QUEUE_SIZE, stop).feed(stage(resized, encode))
+        if queues is not None:
+            queues.extend((decoded, resized, encoded))
+        
+        try:
+            for item in encoded:
+                timer = item['timer']
+                if item['data'] is not None:
+                    try:
+                        for (_, output_path), data in zip(item['targets'], item['data']):
+                            self.write(output_path, data, timer)
+                    except OSError as e:
+                        item['error'] = e
+                ok = item['error'] is None and not item['quarantined']
+                if item['error'] is not None:
+                    print(f"❌ Помилка при обробці {item['task'][0]}: {item['error']}")
+                if timer.enabled:
+                    timer.record['ok'] = ok
+                    self.profile_records.append(timer.record)
+                yield ok
+        finally:
+            stop.set()
+    
+    def _collect(self, future):
+        """Результат задачі з пулу (заміри переносяться в поточний процес)"""
+        ok, records = future.result()
+        self.profile_records.extend(records)
+        return ok
+    
+    def output_name(self, stem: str) -> str:
+        """Ім'я файлу результату для вхідного файлу з іменем stem"""
+        return f"{stem}_resized{self.extension}"
+    
+    def archive_name(self, member: str, preset: Optional[str] = None) -> str:
+        """Ім'я результату для члена архіву: та сама підпапка (після папки пресету)"""
+        directory, _, filename = member.rpartition('/')
+        name = self.output_name(os.path.splitext(filename)[0])
+        return '/'.join(part for part in (preset, directory, name) if part)
+    
+    @staticmethod
+    def output_paths(output) -> List[str]:
+        """Шляхи результатів задачі (один шлях або список ((w, h), шлях))"""
+        if isinstance(output, str):
+            return [output]
+        return [path for _, path in output]
+    
+    def output_targets(self, image_file: Path, input_folder: str, output_folder: str,
+                       presets: Optional[Dict[str, Tuple[int, int]]] = None,
+                       mirror: bool = False):
+        """
+        Шлях результату для вхідного файлу (або список ((w, h), шлях) для пресетів)
+        
+        Args:
+            image_file: Вхідний файл
+            input_folder: Коренева вхідна папка
+            output_folder: Коренева вихідна папка
+            presets: Кілька розмірів {назва: (ширина, висота)} - у підпапки пресетів
+            mirror: Повторити структуру підпапок вхідної папки (підпапки
+                результату створюються тут же)
+        """
+        rel_dir = ''
+        if mirror:
+            rel_dir = os.path.relpath(str(image_file.parent), input_folder)
+            if rel_dir == os.curdir:
+                rel_dir = ''
+        name = self.output_name(image_file.stem)
+        if not presets:
+            directory = os.path.join(output_folder, rel_dir)
+            if rel_dir:
+                os.makedirs(directory, exist_ok=True)
+            return os.path.join(directory, name)
+        outputs = []
+        for preset, size in presets.items():
+            directory = os.path.join(output_folder, preset, rel_dir)
+            if rel_dir:
+                os.makedirs(directory, exist_ok=True)
+            outputs.append((size, os.path.join(directory, name)))
+        return outputs
+    
+    def iter_jobs(self, image_files: Iterable[Path], input_folder: str, output_folder: str,
+                  params: dict, manifest: Optional[ResizeManifest] = None,
+                  presets: Optional[Dict[str, Tuple[int, int]]] = None,
+                  mirror: bool = False, journal: Optional['ResizeJournal'] = None
+                  ) -> Iterator[Tuple[Path, object, Optional[dict]]]:
+        """
+        Лениво перетворює вхідні файли на задачі, пропускаючи актуальні за маніфестом
+        
+        Файли, завершені за журналом перерваного запуску, пропускаються
+        одразу - без stat і читання вхідного файлу.
+        Кількість переглянутих файлів - у self.scanned.
+        
+        Yields:
+            (вхідний файл, шлях або список ((w, h), шлях), відбиток для manifest.record)
+        """
+        self.scanned = 0
+        for image_file in image_files:
+            self.scanned += 1
+            if journal is not None and journal.is_done(str(image_file)):
+                continue
+            output_file = self.output_targets(image_file, input_folder, output_folder,
+                                              presets, mirror)
+            fingerprint = None
+            if manifest is not None:
+                try:
+                    fresh, fingerprint = manifest.check(str(image_file), params,
+                                                        self.output_paths(output_file))
+                except OSError:
+                    # Файл зник між скануванням і перевіркою
+                    continue
+                if fresh:
+                    continue
+            yield image_file, output_file, fingerprint
     
     def process_folder(self, input_folder: str, output_folder: str = None, 
-                      mode: str = 'contain', bg_color=(0, 0, 0)) -> Tuple[int, int]:
+                      mode: str = 'contain', bg_color=(0, 0, 0),
+                      workers: Optional[int] = 1, incremental: bool = True,
+                      content_hash: bool = False,
+                      presets: Optional[Dict[str, Tuple[int, int]]] = None,
+                      recursive: bool = False, include: Optional[List[str]] = None,
+                      exclude: Optional[List[str]] = None,
+                      dedupe: bool = True, resume: bool = False,
+                      node: Optional[Tuple[int, int]] = None,
+                      batch: str = 'batch', log: Callable[[str], None] = print,
+                      progress: Optional[Callable[[int, int], None]] = None,
+                      cancel_event: Optional[threading.Event] = None) -> Tuple[int, int]:
         """
         Обробляє всі зображення в папці
         
+        Обробка - потоковий конвеєр, стадії якого з'єднані обмеженими чергами
+        StageQueue: scan (обхід, маніфест, журнал, дедуплікація) → probe
+        (заголовки, оцінка вартості, порядок - preflight) → виконання. З пулом
+        процесів декодування, ресайз і кодування йдуть у процесах
+        PoolScheduler, в одному процесі - окремими потоками (iter_staged).
+        Перший файл стартує, щойно його знайдено й оглянуто, а пам'ять не
+        залежить від кількості файлів. Глибина черг і час, який стадії чекали
+        одна на одну, - у self.stats['stages'].
+        
         Args:
             input_folder: Папка з вхідними зображеннями
             output_folder: Папка для збереження (створюється автоматично)
             mode: 'contain' (з полями) або 'cover' (без полів)
             bg_color: Колір фону для режиму contain
+            workers: Кількість процесів (None - усі ядра CPU)
+            incremental: Пропускати файли, що не змінилися з минулого запуску
+            content_hash: Порівнювати також SHA-256 вмісту (для incremental)
+            presets: Кілька розмірів {назва: (ширина, висота)} - кожне зображення
+                декодується один раз, результати йдуть у підпапки з назвами пресетів
+            recursive: Обробляти також підпапки, повторюючи їх структуру у вихідній
+                папці
+            include: Glob-шаблони файлів, які обробляти (наприклад, ['*.jpg'])
+            exclude: Glob-шаблони файлів і папок, які пропускати (наприклад, ['raw/*'])
+            dedupe: Обробляти однаковий вміст один раз, результати дублікатів -
+                жорсткі посилання або копії (Deduplicator)
+            resume: Продовжити перерваний запуск за журналом ResizeJournal
+                (завершені файли не перечитуються); False - почати заново
+            node: (номер вузла з 0, кількість вузлів) - розподілена обробка
+                кількома хостами над спільною папкою (ClusterNode); resume тоді
+                не потрібен - шарди завжди продовжуються з журналу
+            batch: Назва батчу для розподіленої обробки
+            log: Куди писати рядки звіту (GUI передає свій лог)
+            progress: Викликається після кожного результату з (оброблено, усього
+                задач); усього - 0, поки обхід ще не завершився
+            cancel_event: Після set() нові файли не запускаються, ті, що вже
+                обробляються, дописуються (застарілі результати тоді не видаляються)
         
         Returns:
-            (кількість успішних, кількість помилок)
+            (кількість записаних результатів, кількість помилок); файли, пропущені
+            без обробки (без змін за маніфестом, готові за журналом, зниклі), -
+            у self.stats['skipped'], не запущені після скасування - у
+            self.stats['not_started']
         """
+        if node is not None:
+            return ClusterNode(self, input_folder, output_folder, node, batch, mode, bg_color,
+                               presets, workers, incremental, content_hash, recursive,
+                               include, exclude, dedupe).run()
+        
+        self.stats = {}
         # Створюємо output папку
         if output_folder is None:
             output_folder = os.path.join(input_folder, 'resized')
         
         Path(output_folder).mkdir(parents=True, exist_ok=True)
         
-        # Підтримувані формати
-        supported_formats = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+        # Шукаємо зображення (вихідну папку всередині вхідної не обходимо)
+        image_files = iter_image_files(input_folder, recursive, include, exclude,
+                                       skip=[output_folder])
         
-        # Шукаємо зображення
-        input_path = Path(input_folder)
-        image_files = [
-            f for f in input_path.iterdir() 
-            if f.is_file() and f.suffix.lower() in supported_formats
-        ]
+        # Відкидаємо файли, результат для яких уже актуальний
+        manifest = ResizeManifest(output_folder, content_hash) if incremental else None
+        params = self.cache_params(mode, bg_color, presets)
+        for name in presets or {}:
+            Path(output_folder, name).mkdir(exist_ok=True)
         
-        if not image_files:
-            print("❌ Не знайдено зображень для обробки!")
-            return 0, 0
+        # Журнал завершених файлів: після падіння запуск продовжується з resume=True
+        journal = ResizeJournal(output_folder, params, resume)
+        # Тимчасові файли, обірвані падінням, ніхто вже не перейменує
+        swept = sweep_temp_files(output_folder) if resume else 0
+        if manifest is not None:
+            manifest.entries.update((source, entry) for source, entry in journal.entries.items()
+                                    if 'params' in entry)
+        jobs = self.iter_jobs(image_files, input_folder, output_folder, params,
+                              manifest, presets, mirror=recursive, journal=journal)
+        # Скільки файлів пройшло маніфест і журнал (після скасування - не всі запущені)
+        queued = 0
         
-        print(f"📁 Знайдено {len(image_files)} зображень")
-        print(f"🎯 Цільовий розмір: {self.target_width}x{self.target_height}")
-        print(f"🔧 Режим: {mode}")
-        print(f"💾 Зберігаємо в: {output_folder}")
-        print("-" * 50)
+        def count_queued(jobs):
+            nonlocal queued
+            for job in jobs:
+                queued += 1
+                yield job
+        
+        jobs = count_queued(jobs)
+        # Однаковий вміст обробляється один раз (дублікати чекають на оригінал)
+        dedupe = Deduplicator() if dedupe else None
+        if dedupe is not None:
+            jobs = dedupe.filter(jobs)
+        
+        if workers is None:
+            workers = os.cpu_count() or 1
+        pooled = workers > 1 or bool(self.timeout)
+        
+        log(f"📁 Папка: {input_folder}" + (" (з підпапками)" if recursive else ''))
+        if include:
+            log(f"   Лише: {', '.join(include)}")
+        if exclude:
+            log(f"   Крім: {', '.join(exclude)}")
+        if presets:
+            sizes = ', '.join(f"{name} {w}x{h}" for name, (w, h) in presets.items())
+            log(f"🎯 Розміри: {sizes}")
+        else:
+            log(f"🎯 Цільовий розмір: {self.target_width}x{self.target_height}")
+        log(f"🔧 Режим: {mode}" + (f" (якір: {self.anchor})" if mode == 'cover' else ''))
+        log(f"🗜️  Формат: {self.output_format} ({self.encoder})")
+        if self.engine != 'pillow':
+            log(f"🧮 Рушій: {self.engine} (групи до {self.GROUP_SIZE} файлів)")
+        if self.max_bytes:
+            log(f"🎯 Ліміт розміру файлу: {self.max_bytes // 1024} KB")
+        log(f"⚡ Процесів: {workers}")
+        if pooled:
+            budget = self.memory_budget()
+            if budget != float('inf'):
+                log(f"🧠 Бюджет пам'яті: {budget / 1024 ** 2:.0f} MB")
+            if self.timeout:
+                log(f"⏲️  Таймаут на файл: {self.timeout:g} с")
+        log(f"💾 Зберігаємо в: {output_folder}")
+        if journal.resumed:
+            log(f"⏯️  Продовжуємо перерваний запуск: {journal.resumed} файлів уже готові")
+        if swept:
+            log(f"🧹 Видалено тимчасових файлів перерваного запуску: {swept}")
+        log("-" * 50)
         
         success_count = 0
         error_count = 0
+        processed = 0
+        self.profile_records = []
+        self.quarantine = []
+        self.headers = {}
+        started = time.perf_counter()
         
-        # Обробляємо кожне зображення
-        for i, image_file in enumerate(image_files, 1):
-            output_file = os.path.join(output_folder, f"{image_file.stem}_resized.jpg")
-            
-            print(f"[{i}/{len(image_files)}] Обробка: {image_file.name}...", end=' ')
-            
-            if mode == 'contain':
-                success = self.resize_image_contain(str(image_file), output_file, bg_color)
-            else:
-                success = self.resize_image_cover(str(image_file), output_file)
+        # Конвеєр: scan і probe - потоки, з'єднані обмеженими чергами; обхід
+        # і огляд заголовків ідуть паралельно з обробкою, а не перед нею
+        stop = threading.Event()
+        scanned = StageQueue('scan', self.PIPELINE_WINDOW, stop).feed(jobs)
+        probed = StageQueue('probe', self.PIPELINE_WINDOW, stop).feed(
+            self.preflight(scanned, mode, workers if pooled else 1, self.PIPELINE_WINDOW))
+        queues = [scanned, probed]
+        
+        # Задачі віддаються на виконання лениво; метадані чекають у черзі на свій результат
+        in_flight = deque()
+        # Пул не повинен чекати на нову задачу, поки готові результати ще не забрано
+        idle = pooled and self.resampler is None
+        
+        def iter_tasks():
+            while True:
+                try:
+                    job = probed.get(block=not (idle and in_flight))
+                except queue.Empty:
+                    yield PoolScheduler.IDLE
+                    continue
+                if job is StageQueue.DONE:
+                    return
+                in_flight.append(job)
+                yield str(job[0]), job[1], mode, bg_color
+        
+        if pooled or self.resampler is not None:
+            results = self.iter_results(iter_tasks(), workers, cancel_event)
+        else:
+            results = self.iter_staged(iter_tasks(), stop, cancel_event, queues)
+        
+        def report(job, success, note=''):
+            nonlocal processed, success_count, error_count
+            image_file, output_file, fingerprint = job
+            processed += 1
+            self.headers.pop(str(image_file), None)
+            name = os.path.relpath(str(image_file), input_folder)
+            # Скільки всього задач, відомо, коли обхід завершився
+            total = queued if scanned.finished else 0
+            counter = f"{processed}/{total}" if total else f"{processed}"
             
             if success:
                 success_count += 1
-                print("✅")
+                entry = {'outputs': self.output_paths(output_file)}
+                if manifest is not None:
+                    entry = manifest.record(str(image_file), fingerprint, params,
+                                            self.output_paths(output_file))
+                journal.record(str(image_file), entry)
+                log(f"[{counter}] Обробка: {name}{note}... ✅")
             else:
                 error_count += 1
-                print("❌")
+                if manifest is not None:
+                    manifest.forget(str(image_file))
+                log(f"[{counter}] Обробка: {name}{note}... ❌")
+            if progress is not None:
+                progress(processed, total)
+        
+        # Обробляємо кожне зображення (результати приходять у порядку задач)
+        try:
+            for success in results:
+                job = in_flight.popleft()
+                report(job, success)
+                if dedupe is not None:
+                    for duplicate, ok in dedupe.resolve(job, success):
+                        report(duplicate, ok, " (дублікат)")
+            if dedupe is not None:
+                for duplicate, ok in dedupe.flush():
+                    report(duplicate, ok, " (дублікат)")
+        except BaseException:
+            # Ctrl+C або помилка: журнал лишається для resume
+            journal.close()
+            raise
+        finally:
+            # Після скасування чи помилки стадії не чекають на місце в чергах
+            stop.set()
+            for stage in queues:
+                if stage.thread is not None:
+                    stage.thread.join()
+        elapsed = time.perf_counter() - started
+        
+        found = self.scanned
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        not_started = queued - processed
+        skipped = found - queued
+        # Після скасування не всі файли переглянуто - застарілі результати не чіпаємо
+        pruned = manifest.prune() if manifest is not None and not cancelled else 0
+        if manifest is not None:
+            manifest.save()
+        journal.finish()
+        
+        self.stats = {
+            'found': found,
+            'processed': processed,
+            'skipped': skipped,
+            'not_started': not_started,
+            'cancelled': cancelled,
+            'cache_hits': manifest.hits if manifest is not None else 0,
+            'cache_misses': manifest.misses if manifest is not None else processed,
+            'pruned': pruned,
+            'quarantined': len(self.quarantine),
+            'duplicates': dedupe.duplicates if dedupe is not None else 0,
+            'dedupe_ratio': dedupe.ratio if dedupe is not None else 1.0,
+            'resumed': journal.resumed,
+            'elapsed': elapsed,
+            'stages': {stage.name: stage.report() for stage in queues},
+        }
+        
+        log("-" * 50)
+        if not found:
+            log("❌ Не знайдено зображень для обробки!")
+            return 0, 0
+        self.save_profile_report(output_folder, log=log)
+        quarantined = self.save_quarantine_report(output_folder)
+        if self.preflight_summary.get('files'):
+            print_preflight(self.preflight_summary, log)
+        log("🚦 Черги конвеєра (макс. глибина; виробник чекав на місце / споживач на дані, с):")
+        for stage in queues:
+            log(f"   {stage.name:<7} {stage.max_depth:3}/{stage.maxsize:<3} "
+                f"{stage.put_wait:8.2f} / {stage.get_wait:8.2f}")
+        if cancelled:
+            log(f"⏹ Скасовано: переглянуто {found} зображень")
+        else:
+            log(f"📁 Знайдено {found} зображень")
+        log(f"✅ Успішно оброблено: {success_count} за {elapsed:.1f} с")
+        if skipped:
+            log(f"⏭️  Пропущено (результат уже актуальний): {skipped}")
+        if not_started:
+            log(f"⏭️  Пропущено (скасовано): {not_started}")
+        if manifest is not None:
+            log(f"♻️  Кеш: {manifest.hits} без змін, {manifest.misses} оброблено заново")
+            if pruned:
+                log(f"🗑️  Видалено застарілих результатів: {pruned}")
+        if dedupe is not None and dedupe.duplicates:
+            log(f"🔗 Дублікати: {dedupe.duplicates} (посилань {dedupe.linked}, "
+                f"копій {dedupe.copied}), коефіцієнт дедуплікації {dedupe.ratio:.2f}x")
+        if error_count > 0:
+            log(f"❌ Помилок: {error_count}")
+        if quarantined:
+            log(f"🚧 У карантині: {len(quarantined)} (див. {self.QUARANTINE_REPORT})")
+        log(f"📂 Результат збережено в: {output_folder}")
+        
+        return success_count, error_count
+
+    def process_archive(self, input_archive: str, output: Optional[str] = None,
+                        mode: str = 'contain', bg_color=(0, 0, 0),
+                        workers: Optional[int] = 1,
+                        presets: Optional[Dict[str, Tuple[int, int]]] = None,
+                        include: Optional[List[str]] = None,
+                        exclude: Optional[List[str]] = None) -> Tuple[int, int]:
+        """
+        Обробляє зображення з zip/tar архіву і пише результати в архів
+        
+        Члени архіву читає поточний процес (zip - з довільним доступом, tar -
+        потоково) і передає воркерам байтами; результати повертаються в порядку
+        членів і одразу дописуються у вихідний архів. Тимчасових файлів немає,
+        тож пікове використання диска - приблизно розмір вихідного архіву.
+        Структура папок архіву зберігається (з пресетами - під папками пресетів).
+        
+        Args:
+            input_archive: Вхідний архів (.zip, .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz)
+            output: Вихідний архів (тип - за розширенням) або папка
+                (за замовчуванням <назва>_resized.zip поруч із вхідним)
+            mode: 'contain' (з полями) або 'cover' (без полів)
+            bg_color: Колір фону для режиму contain
+            workers: Кількість процесів (None - усі ядра CPU)
+            presets: Кілька розмірів {назва: (ширина, висота)}
+            include: Glob-шаблони членів, які обробляти (наприклад, ['*.jpg'])
+            exclude: Glob-шаблони членів і папок, які пропускати
+        
+        Returns:
+            (кількість успішних, кількість помилок)
+        """
+        if output is None:
+            base = os.path.basename(input_archive)
+            for suffix in ('.zip',) + tuple(TAR_COMPRESSION):
+                if base.lower().endswith(suffix):
+                    base = base[:-len(suffix)]
+                    break
+            output = os.path.join(os.path.dirname(input_archive), f"{base}_resized.zip")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        
+        targets = list(presets.items()) if presets else [
+            (None, (self.target_width, self.target_height))
+        ]
+        sizes = [size for _, size in targets]
+        
+        print(f"📦 Архів: {input_archive}")
+        if presets:
+            print("🎯 Розміри: " + ', '.join(f"{name} {w}x{h}"
+                                            for name, (w, h) in presets.items()))
+        else:
+            print(f"🎯 Цільовий розмір: {self.target_width}x{self.target_height}")
+        print(f"🔧 Режим: {mode}" + (f" (якір: {self.anchor})" if mode == 'cover' else ''))
+        print(f"🗜️  Формат: {self.output_format} ({self.encoder})")
+        print(f"⚡ Процесів: {workers}")
+        print(f"💾 Зберігаємо в: {output}")
+        print("-" * 50)
+        
+        success_count = 0
+        error_count = 0
+        self.profile_records = []
+        self.quarantine = []
+        
+        # Імена членів чекають у черзі на свій результат (той самий порядок)
+        in_flight = deque()
+        
+        def iter_tasks():
+            for name, data in iter_archive_images(input_archive, include, exclude):
+                in_flight.append(name)
+                yield name, data, sizes, mode, bg_color
+        
+        with ArchiveWriter(output) as writer:
+            for outputs in self.iter_rendered(iter_tasks(), workers):
+                name = in_flight.popleft()
+                processed = success_count + error_count + 1
+                if outputs is None:
+                    error_count += 1
+                    print(f"[{processed}] Обробка: {name}... ❌")
+                    continue
+                for (preset, _), data in zip(targets, outputs):
+                    writer.add(self.archive_name(name, preset), data)
+                success_count += 1
+                print(f"[{processed}] Обробка: {name}... ✅")
         
         print("-" * 50)
+        if not success_count + error_count:
+            print("❌ Не знайдено зображень для обробки!")
+            return 0, 0
+        # Звіти - поруч із вихідним архівом
+        report_folder = output if writer.kind is None else (os.path.dirname(output) or '.')
+        self.save_profile_report(report_folder)
+        quarantined = self.save_quarantine_report(report_folder)
         print(f"✅ Успішно оброблено: {success_count}")
         if error_count > 0:
             print(f"❌ Помилок: {error_count}")
-        print(f"📂 Результат збережено в: {output_folder}")
+        if quarantined:
+            print(f"🚧 У карантині: {len(quarantined)} (див. {self.QUARANTINE_REPORT})")
+        print(f"📦 Записано {writer.count} файлів ({writer.bytes / 1024 ** 2:.1f} MB): {output}")
         
         return success_count, error_count
 
 
+class FolderWatcher:
+    """
+    Режим спостереження: обробляє нові й змінені зображення у вхідній папці
+    
+    Опитування не обходить усе дерево на кожному кроці. Для кожної папки
+    зберігається її mtime, і папка перечитується (os.scandir) лише тоді, коли
+    mtime змінився (додавання, видалення чи перейменування файлу). За один
+    крок stat робиться не для всіх папок, а для наступних DIRS_PER_POLL по
+    колу, тож зміна у великому дереві помічається щонайбільше за
+    (папок / DIRS_PER_POLL) кроків. Нові папки і папки, змінені щойно
+    (RACY_SECONDS), перечитуються поза чергою. Файли перечитаної папки
+    порівнюються з індексом за (розміром, mtime). Зміни вмісту файлу "на
+    місці" mtime папки не змінюють - їх підхоплює повний огляд раз на
+    FULL_SCAN_INTERVAL секунд.
+    
+    Новий або змінений файл обробляється, лише коли його розмір і mtime не
+    змінювалися settle секунд (файл ще копіюється). Пакети йдуть у теплий
+    пул процесів (PoolScheduler з keep_alive), що живе між пакетами.
+    Стан (глибина черги, швидкість) - у status() і файлі STATUS_FILE.
+    
+    Спостереження працює тижнями, тому нічого не накопичується без меж:
+    карантин містить щонайбільше QUARANTINE_SIZE останніх файлів (файл, що
+    згодом обробився успішно, з нього прибирається), а заміри профілювання
+    записуються у звіт і скидаються після кожного пакета.
+    """
+    
+    FULL_SCAN_INTERVAL = 600
+    # Скільки папок перевіряти stat за один крок опитування
+    DIRS_PER_POLL = 256
+    QUARANTINE_SIZE = 1000
+    # Папку, змінену менш ніж RACY_SECONDS тому, перечитуємо і на наступному
+    # кроці: файл, доданий у той самий "тік" годинника ФС, не змінить її mtime
+    RACY_SECONDS = 2.0
+    # Вікно для розрахунку швидкості обробки, секунди
+    THROUGHPUT_WINDOW = 60
+    STATUS_FILE = 'resize-watch-status.json'
+    
+    def __init__(self, resizer: 'ImageResizer', input_folder: str,
+                 output_folder: Optional[str] = None, mode: str = 'contain',
+                 bg_color=(0, 0, 0), presets: Optional[Dict[str, Tuple[int, int]]] = None,
+                 workers: Optional[int] = 1, recursive: bool = True,
+                 include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                 settle: float = 2.0, poll_interval: float = 1.0,
+                 batch_size: Optional[int] = None):
+        """
+        Args:
+            resizer: Налаштований ImageResizer
+            input_folder: Папка, за якою спостерігати
+            output_folder: Папка для збереження (за замовчуванням input/resized)
+            mode: 'contain' або 'cover'
+            bg_color: Колір фону для режиму contain
+            presets: Кілька розмірів {назва: (ширина, висота)}
+            workers: Кількість процесів теплого пулу (None - усі ядра CPU)
+            recursive: Стежити також за підпапками (структура повторюється)
+            include: Glob-шаблони файлів, які обробляти
+            exclude: Glob-шаблони файлів і папок, які пропускати
+            settle: Скільки секунд файл має не змінюватися перед обробкою
+            poll_interval: Пауза між опитуваннями, секунди
+            batch_size: Файлів за один пакет (між пакетами папка опитується знову),
+                за замовчуванням workers * 8
+        """
+        self.resizer = resizer
+        self.input_folder = input_folder
+        self.output_folder = output_folder or os.path.join(input_folder, 'resized')
+        self.mode = mode
+        self.bg_color = bg_color
+        self.presets = presets
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.settle = settle
+        self.poll_interval = poll_interval
+        workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size or workers * 8
+        
+        Path(self.output_folder).mkdir(parents=True, exist_ok=True)
+        for name in presets or {}:
+            Path(self.output_folder, name).mkdir(exist_ok=True)
+        self._output_real = os.path.realpath(self.output_folder)
+        
+        self.scheduler = PoolScheduler(resizer, workers, keep_alive=True)
+        self.manifest = ResizeManifest(self.output_folder)
+        self.params = resizer.cache_params(mode, bg_color, presets)
+        
+        self._dirs: Dict[str, Optional[int]] = {input_folder: None}  # папка -> mtime_ns
+        self._rotation = deque([input_folder])       # черга папок для stat по колу
+        self._dirty = {input_folder}                 # папки, які перечитати поза чергою
+        self._children: Dict[str, set] = {}          # папка -> підпапки
+        self._files: Dict[str, Dict[str, tuple]] = {}  # папка -> {ім'я: (розмір, mtime_ns)}
+        self._pending: Dict[str, list] = {}          # шлях -> [(розмір, mtime_ns), час зміни]
+        self.ready = deque()                         # файли, що "устоялися", для пулу
+        self._completed = deque()                    # час завершення (для швидкості)
+        self._last_full_scan = time.monotonic()
+        self._started = time.monotonic()
+        self.dir_scans = 0
+        self.dir_stats = 0
+        self.processed = 0
+        self.errors = 0
+        self.stop_event = threading.Event()
+    
+    def _rel_prefix(self, directory: str) -> str:
+        """Відносний шлях папки через '/' (для шаблонів include/exclude)"""
+        rel = os.path.relpath(directory, self.input_folder)
+        return '' if rel == os.curdir else rel.replace(os.sep, '/') + '/'
+    
+    def _forget_dir(self, directory: str):
+        """Прибирає з індексу видалену папку з усіма підпапками"""
+        self._dirs.pop(directory, None)
+        self._dirty.discard(directory)
+        self._files.pop(directory, None)
+        for child in self._children.pop(directory, ()):
+            self._forget_dir(child)
+    
+    def _scan_dir(self, directory: str):
+        """Перечитує одну папку: нові підпапки - в індекс, нові/змінені файли - в очікування"""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            self._forget_dir(directory)
+            return
+        self.dir_scans += 1
+        racy = time.time() - mtime / 1e9 < self.RACY_SECONDS
+        self._dirs[directory] = None if racy else mtime
+        if racy:
+            self._dirty.add(directory)
+        
+        prefix = self._rel_prefix(directory)
+        known = self._files.setdefault(directory, {})
+        children = set()
+        names = set()
+        now = time.monotonic()
+        for entry in entries:
+            rel_path = prefix + entry.name
+            if self.exclude and _glob_match(rel_path, self.exclude):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if (self.recursive and os.path.realpath(entry.path) != self._output_real
+                        and not os.path.exists(os.path.join(entry.path,
+                                                            ResizeManifest.FILENAME))):
+                    children.add(entry.path)
+                    if entry.path not in self._dirs:
+                        self._dirs[entry.path] = None
+                        self._rotation.append(entry.path)
+                continue
+            if (not entry.is_file()
+                    or os.path.splitext(entry.name)[1].lower() not in SUPPORTED_FORMATS
+                    or (self.include and not _glob_match(rel_path, self.include))):
+                continue
+            names.add(entry.name)
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            signature = (st.st_size, st.st_mtime_ns)
+            if known.get(entry.name) != signature and entry.path not in self._pending:
+                self._pending[entry.path] = [signature, now]
+        
+        for name in set(known) - names:
+            del known[name]
+        for child in self._children.get(directory, set()) - children:
+            self._forget_dir(child)
+        self._children[directory] = children
+    
+    def poll(self) -> int:
+        """
+        Один крок опитування: перечитує змінені папки і переводить файли,
+        що не змінювалися settle секунд, у чергу ready
+        
+        Returns:
+            Кількість файлів, що стали в чергу
+        """
+        now = time.monotonic()
+        if now - self._last_full_scan >= self.FULL_SCAN_INTERVAL:
+            # Повний огляд: ловить зміни вмісту файлів без зміни mtime папки
+            self._last_full_scan = now
+            self._dirty.update(self._dirs)
+            for known in self._files.values():
+                known.clear()
+        
+        # Поза чергою - нові й щойно змінені папки; решта - stat наступних
+        # DIRS_PER_POLL папок по колу. Перечитуються ті, чий mtime змінився,
+        # і нові підпапки, знайдені під час перечитування
+        stack = list(self._dirty)
+        self._dirty.clear()
+        for _ in range(min(self.DIRS_PER_POLL, len(self._rotation))):
+            directory = self._rotation[0]
+            self._rotation.rotate(-1)
+            if directory not in self._dirs:
+                # Папку видалено з індексу - прибираємо й з черги
+                self._rotation.pop()
+                continue
+            self.dir_stats += 1
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                current = None
+            if current != self._dirs[directory]:
+                stack.append(directory)
+        scanned = set()
+        while stack:
+            directory = stack.pop()
+            if directory in scanned or directory not in self._dirs:
+                continue
+            scanned.add(directory)
+            before = self._children.get(directory, set())
+            self._scan_dir(directory)
+            stack.extend(self._children.get(directory, set()) - before)
+        
+        # Файли, що ще копіюються, чекають, поки розмір і mtime "устояться"
+        queued = 0
+        for path, (signature, changed_at) in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            if current != signature:
+                self._pending[path] = [current, now]
+            elif now - changed_at >= self.settle:
+                del self._pending[path]
+                directory, name = os.path.split(path)
+                self._files.setdefault(directory, {})[name] = signature
+                self.ready.append(path)
+                queued += 1
+        return queued
+    
+    def process_ready(self) -> int:
+        """
+        Обробляє до batch_size файлів з черги ready у теплому пулі
+        
+        Returns:
+            Кількість оброблених файлів
+        """
+        batch = [self.ready.popleft() for _ in range(min(len(self.ready), self.batch_size))]
+        if not batch:
+            return 0
+        resizer = self.resizer
+        jobs = resizer.iter_jobs((Path(path) for path in batch), self.input_folder,
+                                 self.output_folder, self.params, self.manifest,
+                                 self.presets, mirror=self.recursive)
+        
+        in_flight = deque()
+        
+        def iter_tasks():
+            for job in jobs:
+                in_flight.append(job)
+                yield str(job[0]), job[1], self.mode, self.bg_color
+        
+        if resizer.resampler is None:
+            results = self.scheduler.run(iter_tasks(), self.stop_event.is_set)
+        else:
+            results = resizer.run_grouped(iter_tasks(), lambda groups: self.scheduler.run(
+                groups, self.stop_event.is_set, _resize_group_in_worker,
+                resizer.group_cost, None))
+        
+        done = 0
+        recovered = set()
+        for ok in results:
+            image_file, output_file, fingerprint = in_flight.popleft()
+            name = os.path.relpath(str(image_file), self.input_folder)
+            done += 1
+            self._completed.append(time.monotonic())
+            if ok:
+                self.processed += 1
+                self.manifest.record(str(image_file), fingerprint, self.params,
+                                     resizer.output_paths(output_file))
+                recovered.add(str(image_file))
+                print(f"✅ {name}")
+            else:
+                self.errors += 1
+                self.manifest.forget(str(image_file))
+                print(f"❌ {name}")
+        self.manifest.save()
+        self._trim_quarantine(recovered)
+        resizer.save_quarantine_report(self.output_folder)
+        if resizer.profile:
+            resizer.save_profile_report(self.output_folder)
+        return done
+    
+    def _trim_quarantine(self, recovered: set):
+        """
+        Обмежує карантин: по одному (останньому) запису на файл, без файлів,
+        що вже обробилися успішно, і не більше QUARANTINE_SIZE найновіших
+        
+        Args:
+            recovered: Шляхи файлів, успішно оброблених у цьому пакеті
+        """
+        latest = {}
+        for entry in self.resizer.quarantine:
+            latest.pop(entry['path'], None)
+            if entry['path'] not in recovered:
+                latest[entry['path']] = entry
+        entries = list(latest.values())
+        self.resizer.quarantine = entries[-self.QUARANTINE_SIZE:]
+    
+    def status(self) -> dict:
+        """
+        Поточний стан спостереження
+        
+        Returns:
+            {'queue_depth' (очікують + готові), 'settling', 'ready', 'processed',
+            'errors', 'throughput' (файлів/с за останні THROUGHPUT_WINDOW с),
+            'directories', 'files_indexed', 'dir_scans', 'dir_stats' (stat папок
+            усього), 'quarantined', 'uptime_s'}
+        """
+        now = time.monotonic()
+        while self._completed and now - self._completed[0] > self.THROUGHPUT_WINDOW:
+            self._completed.popleft()
+        window = min(self.THROUGHPUT_WINDOW, max(now - self._started, 1e-9))
+        return {
+            'queue_depth': len(self._pending) + len(self.ready),
+            'settling': len(self._pending),
+            'ready': len(self.ready),
+            'processed': self.processed,
+            'errors': self.errors,
+            'throughput': len(self._completed) / window,
+            'directories': len(self._dirs),
+            'files_indexed': sum(len(files) for files in self._files.values()),
+            'dir_scans': self.dir_scans,
+            'dir_stats': self.dir_stats,
+            'quarantined': len(self.resizer.quarantine),
+            'uptime_s': now - self._started,
+        }
+    
+    def tick(self) -> int:
+        """Опитування + один пакет; стан записується у STATUS_FILE"""
+        queued = self.poll()
+        done = self.process_ready()
+        status = self.status()
+        if queued or done:
+            print(f"📊 Черга: {status['queue_depth']}, оброблено: {status['processed']}, "
+                  f"помилок: {status['errors']}, швидкість: {status['throughput'] * 60:.1f} файлів/хв")
+        atomic_write(os.path.join(self.output_folder, self.STATUS_FILE),
+                     json.dumps(status, indent=2).encode('utf-8'))
+        return done
+    
+    def run(self):
+        """Спостерігає, доки не встановлено stop_event (або Ctrl+C)"""
+        print(f"👀 Спостерігаємо за: {self.input_folder}"
+              + (" (з підпапками)" if self.recursive else ''))
+        print(f"💾 Зберігаємо в: {self.output_folder}")
+        print(f"⚡ Процесів: {self.scheduler.workers}, пауза опитування: {self.poll_interval:g} с, "
+              f"файл має не змінюватися {self.settle:g} с")
+        try:
+            while not self.stop_event.is_set():
+                self.tick()
+                # Якщо черга не порожня - наступний пакет одразу
+                if not self.ready:
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            self.scheduler.close()
+            self.manifest.save()
+
+
+class ClusterNode:
+    """
+    Розподілена обробка: кілька хостів над спільною папкою (NFS і подібні)
+    
+    Вхідні файли детерміновано розкладаються на SHARDS шардів за хешем
+    відносного шляху. Вузол i з n спершу бере "свої" шарди (номер % n == i),
+    потім - будь-які ще не завершені. Шард захоплюється файлом оренди
+    (os.O_EXCL), який вузол продовжує з фонового потоку кожні lease_ttl / 3
+    секунд. Оренду вузла, що впав, інші підхоплюють після її закінчення:
+    прострочений файл перейменовується (os.rename вдається лише одному
+    вузлу) і створюється новий.
+    
+    Стан шарду (маніфест і журнал) лежить у власній папці шарду, тому вузол,
+    що підхопив шард, продовжує з місця падіння, а наступний батч з тими
+    самими параметрами пропускає незмінені файли. Два вузли над одним шардом
+    одночасно працювати не повинні: журнал і маніфест шарду спільні, а
+    результати перезаписували б одне одного. Тому оренда продовжується через
+    compare-and-swap (renew), і вузол, який побачив у ній чужий токен, одразу
+    віддає шард: нові файли не запускаються, а результати, що ще дописуються,
+    не потрапляють у журнал і маніфест - їх заново обробить новий власник.
+    Перетин можливий, лише якщо вузол завис довше за lease_ttl, і триває не
+    довше за одне продовження. Годинники хостів мають бути синхронізовані
+    (NTP), а спільна папка - змонтована за тим самим шляхом.
+    
+    Структура у вихідній папці:
+        .resize-cluster/state/0042/      маніфест і журнал шарду (між батчами)
+        .resize-cluster/<батч>/cluster.json  кількість шардів і параметри
+        .resize-cluster/<батч>/leases/   оренди шардів
+        .resize-cluster/<батч>/done/     підсумки завершених шардів
+        .resize-cluster/<батч>/nodes/    підсумки вузлів
+        resize-cluster-<батч>.json       зведений звіт (merge_reports)
+    """
+    
+    FOLDER = '.resize-cluster'
+    VERSION = 1
+    SHARDS = 256
+    LEASE_TTL = 120.0
+    # Пауза між спробами, коли всі незавершені шарди зайняті іншими вузлами
+    POLL_INTERVAL = 5.0
+    DEFAULT_BATCH = 'batch'
+    
+    def __init__(self, resizer: 'ImageResizer', input_folder: str,
+                 output_folder: Optional[str] = None, node: Tuple[int, int] = (0, 1),
+                 batch: str = DEFAULT_BATCH, mode: str = 'contain', bg_color=(0, 0, 0),
+                 presets: Optional[Dict[str, Tuple[int, int]]] = None,
+                 workers: Optional[int] = 1, incremental: bool = True,
+                 content_hash: bool = False, recursive: bool = True,
+                 include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                 dedupe: bool = True, shards: int = SHARDS, lease_ttl: float = LEASE_TTL,
+                 node_id: Optional[str] = None):
+        """
+        Args:
+            resizer: Налаштований ImageResizer (однаковий на всіх вузлах)
+            input_folder: Спільна папка з вхідними зображеннями
+            output_folder: Спільна папка для збереження (за замовчуванням input/resized)
+            node: (номер вузла з 0, кількість вузлів) - визначає "свої" шарди
+            batch: Назва батчу: вузли з однаковою назвою ділять одну роботу,
+                новий запуск - нова назва
+            mode: 'contain' або 'cover'
+            bg_color: Колір фону для режиму contain
+            presets: Кілька розмірів {назва: (ширина, висота)}
+            workers: Кількість процесів на цьому вузлі (None - усі ядра CPU)
+            incremental: Пропускати файли, що не змінилися з минулого батчу
+            content_hash: Порівнювати також SHA-256 вмісту (для incremental)
+            recursive: Обробляти також підпапки (структура повторюється)
+            include: Glob-шаблони файлів, які обробляти
+            exclude: Glob-шаблони файлів і папок, які пропускати
+            dedupe: Однаковий вміст у межах шарду обробляти один раз
+            shards: Кількість шардів (має збігатися на всіх вузлах батчу)
+            lease_ttl: Скільки секунд оренда шарду дійсна без продовження
+            node_id: Ім'я вузла у звітах (за замовчуванням хост-pid)
+        
+        Raises:
+            ValueError: Некоректний node або батч уже запущено з іншими
+                параметрами чи кількістю шардів
+        """
+        index, count = node
+        if not 0 <= index < count:
+            raise ValueError(f"Некоректний вузол: {index + 1}/{count}")
+        self.resizer = resizer
+        self.input_folder = input_folder
+        self.output_folder = output_folder or os.path.join(input_folder, 'resized')
+        self.index = index
+        self.count = count
+        self.batch = batch
+        self.mode = mode
+        self.bg_color = bg_color
+        self.presets = presets
+        self.workers = workers or os.cpu_count() or 1
+        self.incremental = incremental
+        self.content_hash = content_hash
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.dedupe = dedupe
+        self.shards = shards
+        self.lease_ttl = lease_ttl
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.params = resizer.cache_params(mode, bg_color, presets)
+        
+        root = os.path.join(self.output_folder, self.FOLDER)
+        self.state_folder = os.path.join(root, 'state')
+        self.batch_folder = os.path.join(root, batch)
+        for folder in ('leases', 'done', 'nodes'):
+            Path(self.batch_folder, folder).mkdir(parents=True, exist_ok=True)
+        for name in presets or {}:
+            Path(self.output_folder, name).mkdir(exist_ok=True)
+        self._check_config()
+        
+        self.summary = {
+            'node': self.node_id, 'host': socket.gethostname(), 'pid': os.getpid(),
+            'index': index, 'count': count, 'batch': batch,
+            'started': time.time(), 'finished': None, 'seconds': 0.0,
+            'shards': [], 'taken_over': 0, 'lost': 0,
+            'found': 0, 'processed': 0, 'success': 0, 'errors': 0, 'skipped': 0,
+            'cache_hits': 0, 'duplicates': 0, 'resumed': 0, 'pending': None, 'quarantine': [],
+        }
+    
+    def _check_config(self):
+        """Перший вузол фіксує параметри батчу, решта перевіряє, що вони ті самі"""
+        path = os.path.join(self.batch_folder, 'cluster.json')
+        config = {'version': self.VERSION, 'shards': self.shards, 'params': self.params,
+                  'input': os.path.abspath(self.input_folder)}
+        tmp_path = f"{path}.{self.node_id}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        try:
+            # link не перезаписує існуючий файл - публікація атомарна
+            os.link(tmp_path, path)
+            return
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+        with open(path, 'r', encoding='utf-8') as f:
+            existing = json.load(f)
+        if existing != json.loads(json.dumps(config)):
+            raise ValueError(f"Батч '{self.batch}' уже запущено з іншими параметрами, "
+                             f"вхідною папкою або кількістю шардів - виберіть іншу назву батчу")
+    
+    def shard_of(self, rel_path: str) -> int:
+        """Шард файлу: однаковий на всіх вузлах (не залежить від PYTHONHASHSEED)"""
+        digest = hashlib.md5(rel_path.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') % self.shards
+    
+    def scan(self) -> Dict[int, List[str]]:
+        """
+        Розкладає вхідні файли за шардами
+        
+        Returns:
+            {шард: [відносні шляхи через '/']}
+        """
+        found = iter_image_files(self.input_folder, self.recursive, self.include,
+                                 self.exclude, skip=[self.output_folder])
+        by_shard: Dict[int, List[str]] = {}
+        for path in found:
+            rel_path = Path(os.path.relpath(str(path), self.input_folder)).as_posix()
+            by_shard.setdefault(self.shard_of(rel_path), []).append(rel_path)
+        return by_shard
+    
+    def _lease_path(self, shard: int) -> str:
+        return os.path.join(self.batch_folder, 'leases', f"{shard:04d}.lease")
+    
+    def _done_path(self, shard: int) -> str:
+        return os.path.join(self.batch_folder, 'done', f"{shard:04d}.json")
+    
+    def _read_lease(self, path: str) -> Optional[dict]:
+        """
+        Вміст оренди; None - файлу немає. Недописаний файл (вузол упав між
+        створенням і записом) вважається орендою до mtime + lease_ttl.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            try:
+                return {'token': None, 'expires': os.path.getmtime(path) + self.lease_ttl}
+            except OSError:
+                return None
+    
+    def _lease_record(self, token: str) -> bytes:
+        return json.dumps({'node': self.node_id, 'token': token,
+                           'expires': time.time() + self.lease_ttl}).encode('utf-8')
+    
+    def claim(self, shard: int) -> Optional[str]:
+        """
+        Захоплює шард
+        
+        Returns:
+            Токен оренди або None, якщо шард зайнятий іншим вузлом
+        """
+        path = self._lease_path(shard)
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            lease = self._read_lease(path)
+            if lease is not None and lease['expires'] > time.time():
+                return None
+            # Прострочена оренда: перейменування вдасться лише одному вузлу
+            stale = f"{path}.{token}.stale"
+            try:
+                os.rename(path, stale)
+            except FileNotFoundError:
+                return None
+            taken = self._read_lease(stale)
+            if lease is not None and taken is not None and taken['token'] != lease['token']:
+                # Між читанням і rename оренду вже оновили - повертаємо її
+                try:
+                    os.link(stale, path)
+                except FileExistsError:
+                    pass
+                os.remove(stale)
+                return None
+            os.remove(stale)
+            print(f"♻️  Шард {shard:04d}: оренда {lease and lease.get('node')} "
+                  f"прострочена - підхоплюємо")
+            self.summary['taken_over'] += 1
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                return None
+        try:
+            os.write(fd, self._lease_record(token))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return token
+    
+    def renew(self, shard: int, token: str) -> bool:
+        """
+        Продовжує оренду (compare-and-swap)
+        
+        Новий запис пишеться в унікальний тимчасовий файл і атомарно підміняє
+        оренду (os.replace), після чого оренда перечитується. Чужий токен до
+        або після заміни означає, що шард підхопив інший вузол.
+        
+        Returns:
+            False - оренду втрачено, шард треба віддати
+        """
+        path = self._lease_path(shard)
+        lease = self._read_lease(path)
+        if lease is None or lease['token'] != token:
+            return False
+        tmp_path = temp_path(path)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self._lease_record(token))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        lease = self._read_lease(path)
+        return lease is not None and lease['token'] == token
+    
+    def release(self, shard: int, token: str):
+        """Звільняє оренду, якщо вона ще наша"""
+        path = self._lease_path(shard)
+        lease = self._read_lease(path)
+        if lease is not None and lease['token'] == token:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    def _heartbeat(self, shard: int, token: str, lost: threading.Event,
+                   finished: threading.Event):
+        """Фоновий потік: продовжує оренду, доки шард обробляється"""
+        while not finished.wait(self.lease_ttl / 3):
+            try:
+                if self.renew(shard, token):
+                    continue
+            except OSError as e:
+                print(f"⚠️  Шард {shard:04d}: не вдалося продовжити оренду: {e}")
+                continue
+            print(f"⚠️  Шард {shard:04d}: оренду забрав інший вузол - зупиняємо шард")
+            lost.set()
+            return
+    
+    def process_shard(self, shard: int, files: List[str], token: str) -> Optional[dict]:
+        """
+        Обробляє файли шарду, поки оренда наша
+        
+        Returns:
+            Підсумок шарду або None, якщо оренду втрачено або вузол зупинено
+        """
+        resizer = self.resizer
+        state = os.path.join(self.state_folder, f"{shard:04d}")
+        Path(state).mkdir(parents=True, exist_ok=True)
+        manifest = ResizeManifest(state, self.content_hash) if self.incremental else None
+        # Журнал шарду спільний для всіх батчів: вузол, що підхопив шард,
+        # продовжує з місця, де зупинився попередній
+        journal = ResizeJournal(state, self.params, resume=True)
+        if manifest is not None:
+            manifest.entries.update((source, entry) for source, entry in journal.entries.items()
+                                    if 'params' in entry)
+        jobs = resizer.iter_jobs((Path(self.input_folder, rel) for rel in files),
+                                 self.input_folder, self.output_folder, self.params,
+                                 manifest, self.presets, mirror=self.recursive,
+                                 journal=journal)
+        dedupe = Deduplicator() if self.dedupe else None
+        if dedupe is not None:
+            jobs = dedupe.filter(jobs)
+        
+        stats = {'shard': shard, 'node': self.node_id, 'files': len(files), 'processed': 0,
+                 'success': 0, 'errors': 0, 'resumed': journal.resumed}
+        in_flight = deque()
+        
+        def iter_tasks():
+            for job in jobs:
+                in_flight.append(job)
+                yield str(job[0]), job[1], self.mode, self.bg_color
+        
+        def report(job, success, note=''):
+            image_file, output_file, fingerprint = job
+            name = os.path.relpath(str(image_file), self.input_folder)
+            if lost.is_set():
+                # Шард уже не наш: стан шарду веде новий власник
+                print(f"[{shard:04d}] {name}{note}... ⏭️  (оренду втрачено)")
+                return
+            stats['processed'] += 1
+            if success:
+                stats['success'] += 1
+                entry = {'outputs': resizer.output_paths(output_file)}
+                if manifest is not None:
+                    entry = manifest.record(str(image_file), fingerprint, self.params,
+                                            resizer.output_paths(output_file))
+                journal.record(str(image_file), entry)
+                print(f"[{shard:04d}] {name}{note}... ✅")
+            else:
+                stats['errors'] += 1
+                if manifest is not None:
+                    manifest.forget(str(image_file))
+                print(f"[{shard:04d}] {name}{note}... ❌")
+        
+        # Втрата оренди зупиняє запуск нових файлів (ті, що в роботі, дописуються)
+        lost = threading.Event()
+        finished = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(shard, token, lost, finished),
+                         daemon=True).start()
+        started = time.monotonic()
+        resizer.quarantine = []
+        try:
+            for success in resizer.iter_results(iter_tasks(), self.workers, lost):
+                job = in_flight.popleft()
+                report(job, success)
+                if dedupe is not None:
+                    for duplicate, ok in dedupe.resolve(job, success):
+                        report(duplicate, ok, " (дублікат)")
+            if dedupe is not None and not lost.is_set():
+                for duplicate, ok in dedupe.flush():
+                    report(duplicate, ok, " (дублікат)")
+        except BaseException:
+            journal.close()
+            raise
+        finally:
+            finished.set()
+            self.summary['quarantine'].extend(resizer.quarantine)
+        
+        if lost.is_set():
+            # Інший вузол продовжить з журналу (маніфест тепер зберігає він)
+            journal.close()
+            return None
+        
+        stats['found'] = resizer.scanned
+        stats['cache_hits'] = manifest.hits if manifest is not None else 0
+        stats['duplicates'] = dedupe.duplicates if dedupe is not None else 0
+        stats['skipped'] = resizer.scanned - stats['processed']
+        stats['seconds'] = round(time.monotonic() - started, 3)
+        if manifest is not None:
+            manifest.prune()
+            manifest.save()
+        journal.finish()
+        return stats
+    
+    def _shard_order(self, shards: Iterable[int]) -> List[int]:
+        """Спершу свої шарди, потім чужі - з різного місця для різних вузлів"""
+        start = self.index * self.shards // self.count
+        return sorted(shards, key=lambda shard: (shard % self.count != self.index,
+                                                 (shard - start) % self.shards))
+    
+    def run(self, wait: bool = True) -> Tuple[int, int]:
+        """
+        Обробляє шарди, доки всі не завершені
+        
+        Args:
+            wait: Чекати на шарди, зайняті іншими вузлами (і підхоплювати їх
+                після закінчення оренди); False - завершитися, коли вільних
+                шардів не лишилося
+        
+        Returns:
+            (кількість успішних, кількість помилок) на цьому вузлі
+        """
+        summary = self.summary
+        print(f"🌐 Вузол {self.node_id} ({self.index + 1}/{self.count}), батч '{self.batch}'")
+        print(f"📁 Сканування: {self.input_folder}")
+        by_shard = self.scan()
+        pending = set(by_shard)
+        print(f"🧩 Файлів: {sum(map(len, by_shard.values()))}, шардів: {len(pending)} "
+              f"з {self.shards}")
+        print(f"💾 Зберігаємо в: {self.output_folder}")
+        print("-" * 50)
+        
+        try:
+            while pending:
+                progress = False
+                for shard in self._shard_order(pending):
+                    if os.path.exists(self._done_path(shard)):
+                        pending.discard(shard)
+                        continue
+                    token = self.claim(shard)
+                    if token is None:
+                        continue
+                    try:
+                        if os.path.exists(self._done_path(shard)):
+                            # Шард завершили, поки ми захоплювали оренду
+                            pending.discard(shard)
+                            continue
+                        stats = self.process_shard(shard, by_shard[shard], token)
+                        if stats is None:
+                            summary['lost'] += 1
+                            continue
+                        atomic_write(self._done_path(shard),
+                                     json.dumps(stats, ensure_ascii=False).encode('utf-8'))
+                        pending.discard(shard)
+                        progress = True
+                        summary['shards'].append(shard)
+                        for key in ('found', 'processed', 'success', 'errors', 'skipped',
+                                    'cache_hits', 'duplicates', 'resumed'):
+                            summary[key] += stats[key]
+                    finally:
+                        self.release(shard, token)
+                if pending and not progress:
+                    if not wait:
+                        break
+                    # Решта шардів зайнята іншими вузлами: чекаємо на них або
+                    # на закінчення їхніх оренд
+                    time.sleep(min(self.POLL_INTERVAL, self.lease_ttl / 3))
+        finally:
+            summary['pending'] = len(pending)
+            summary['finished'] = time.time()
+            summary['seconds'] = round(summary['finished'] - summary['started'], 3)
+            atomic_write(os.path.join(self.batch_folder, 'nodes', f"{self.node_id}.json"),
+                         json.dumps(summary, ensure_ascii=False, indent=2).encode('utf-8'))
+        
+        print("-" * 50)
+        print(f"✅ Вузол {self.node_id}: шардів {len(summary['shards'])}, "
+              f"успішно {summary['success']}, помилок {summary['errors']}"
+              + (f", підхоплено {summary['taken_over']}" if summary['taken_over'] else ''))
+        self.resizer.stats = summary
+        if not pending:
+            self.merge_reports(self.output_folder, self.batch)
+        return summary['success'], summary['errors']
+    
+    @classmethod
+    def merge_reports(cls, output_folder: str, batch: str = DEFAULT_BATCH) -> dict:
+        """
+        Зводить підсумки вузлів і шардів батчу в один звіт
+        
+        Звіт записується у вихідну папку (resize-cluster-<батч>.json); його
+        можна зібрати будь-коли, у тому числі поки вузли ще працюють.
+        
+        Returns:
+            Зведений звіт
+        """
+        batch_folder = os.path.join(output_folder, cls.FOLDER, batch)
+        
+        def read_all(folder):
+            items = []
+            for entry in sorted(os.scandir(os.path.join(batch_folder, folder)),
+                                key=lambda e: e.name):
+                if entry.name.endswith('.json'):
+                    try:
+                        with open(entry.path, 'r', encoding='utf-8') as f:
+                            items.append(json.load(f))
+                    except (OSError, ValueError):
+                        continue
+            return items
+        
+        with open(os.path.join(batch_folder, 'cluster.json'), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        shards = read_all('done')
+        nodes = read_all('nodes')
+        totals = {key: sum(shard[key] for shard in shards)
+                  for key in ('found', 'processed', 'success', 'errors', 'skipped',
+                              'cache_hits', 'duplicates', 'resumed')}
+        leased = sum(1 for name in os.listdir(os.path.join(batch_folder, 'leases'))
+                     if name.endswith('.lease'))
+        started = min((node['started'] for node in nodes), default=None)
+        finished = max((node['finished'] for node in nodes), default=None)
+        report = {
+            'batch': batch,
+            'input': config['input'],
+            'shards_total': config['shards'],
+            'shards_done': len(shards),
+            'shards_in_progress': leased,
+            # Вузол, що завершився без незавершених шардів, бачив увесь батч готовим
+            'complete': any(node['pending'] == 0 for node in nodes),
+            **totals,
+            'wall_seconds': round(finished - started, 3) if nodes else 0.0,
+            'images_per_second': round(totals['processed'] / (finished - started), 2)
+            if nodes and finished > started else 0.0,
+            'nodes': [dict({key: node[key] for key in ('node', 'host', 'index', 'count',
+                                                       'seconds', 'processed', 'success',
+                                                       'errors', 'taken_over', 'lost')},
+                           shards=len(node['shards'])) for node in nodes],
+            'quarantine': [item for node in nodes for item in node['quarantine']],
+        }
+        path = os.path.join(output_folder, f"resize-cluster-{batch}.json")
+        atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2).encode('utf-8'))
+        print(f"📊 Батч '{batch}': шардів {len(shards)}, оброблено {totals['processed']}, "
+              f"помилок {totals['errors']}, вузлів {len(nodes)} → {path}")
+        return report
+
+
+class JobStream:
+    """
+    Неінтерактивна обробка потоку задач JSON-lines (stdin або файл)
+    
+    Кожен рядок - задача {"src", "dst", "w", "h", "mode", "bg", "format"}
+    (обов'язкові лише src і dst; необов'язкове "id" повертається в
+    результаті). На кожну задачу у вихідний потік пишеться один JSON-рядок
+    з результатом і замірами. Увесь потік - один запуск PoolScheduler.run
+    з "теплим" пулом, тож один процес може обслуговувати нескінченний потік
+    задач.
+    
+    Рядки читає окремий потік. Нова задача йде в пул одразу, щойно є вільний
+    процес, навіть якщо попередні ще обробляються, а готові результати
+    пишуться, не чекаючи на наступний рядок (PoolScheduler.IDLE). Результати -
+    у порядку задач; некоректні рядки відхиляються одразу.
+    """
+    
+    # Межа сторони результату (як у HTTP-сервісі)
+    MAX_SIDE = 10000
+    # Скільки прочитаних рядків може чекати на обробку
+    READ_AHEAD = 1024
+    # Формат за розширенням dst, якщо "format" не задано
+    FORMAT_BY_EXTENSION = dict({ext: name for name, (_, ext) in OUTPUT_FORMATS.items()},
+                               **{'.jpeg': 'jpeg'})
+    
+    def __init__(self, resizer: 'ImageResizer', source: Iterable[str],
+                 output: Optional[TextIO] = None, workers: Optional[int] = 1):
+        """
+        Args:
+            resizer: Налаштований ImageResizer (профіль кодувача, якір, таймаут;
+                розмір і формат за замовчуванням для задач без w/h/format)
+            source: Рядки задач (файл або список рядків). Не sys.stdin напряму:
+                процеси пулу закривають його при старті - див. main()
+            output: Куди писати результати (за замовчуванням sys.stdout)
+            workers: Кількість процесів теплого пулу (None - усі ядра CPU)
+        """
+        self.resizer = resizer
+        self.source = source
+        self.output = output or sys.stdout
+        self.scheduler = PoolScheduler(resizer, workers or os.cpu_count() or 1)
+        self._lines = queue.Queue(maxsize=self.READ_AHEAD)
+        self.success = 0
+        self.errors = 0
+    
+    def _read(self):
+        """Читає рядки в чергу (у фоновому потоці); None - кінець потоку"""
+        try:
+            for number, line in enumerate(self.source, 1):
+                if line.strip():
+                    self._lines.put((number, line, time.monotonic()))
+        finally:
+            self._lines.put(None)
+    
+    def parse(self, record: dict) -> tuple:
+        """
+        Перевіряє задачу і доповнює її значеннями за замовчуванням
+        
+        Returns:
+            Задача run_job_task: (src, dst, (w, h), режим, фон, формат)
+        
+        Raises:
+            ValueError: Некоректне або відсутнє поле
+        """
+        if not isinstance(record, dict):
+            raise ValueError("задача має бути JSON-об'єктом")
+        src, dst = record.get('src'), record.get('dst')
+        if not isinstance(src, str) or not src or not isinstance(dst, str) or not dst:
+            raise ValueError("потрібні поля src і dst (рядки)")
+        width = record.get('w', self.resizer.target_width)
+        height = record.get('h', self.resizer.target_height)
+        if (type(width) is not int or type(height) is not int
+                or not (1 <= width <= self.MAX_SIDE and 1 <= height <= self.MAX_SIDE)):
+            raise ValueError(f"w і h мають бути цілими від 1 до {self.MAX_SIDE}")
+        mode = record.get('mode', 'contain')
+        if mode not in ('contain', 'cover'):
+            raise ValueError("mode: contain або cover")
+        bg = record.get('bg', 'black')
+        try:
+            if isinstance(bg, str):
+                bg_color = ImageColor.getrgb(bg)[:3]
+            else:
+                bg_color = tuple(bg)
+                if len(bg_color) != 3 or not all(type(v) is int and 0 <= v <= 255
+                                                 for v in bg_color):
+                    raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError("bg: назва чи #rrggbb або [r, g, b]")
+        output_format = (record.get('format')
+                         or self.FORMAT_BY_EXTENSION.get(os.path.splitext(dst)[1].lower())
+                         or self.resizer.output_format)
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"format: {', '.join(OUTPUT_FORMATS)}")
+        if not encoder_available(output_format):
+            raise ValueError(f"формат {output_format} недоступний")
+        return src, dst, (width, height), mode, bg_color, output_format
+    
+    def emit(self, result: dict):
+        """Пише результат задачі одним JSON-рядком"""
+        if result['ok']:
+            self.success += 1
+        else:
+            self.errors += 1
+        self.output.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self.output.flush()
+    
+    def _quarantine_reason(self, src: str) -> str:
+        """Причина карантину задачі (запис забирається, щоб список не ріс)"""
+        quarantine = self.resizer.quarantine
+        for index in range(len(quarantine) - 1, -1, -1):
+            if quarantine[index]['path'] == src:
+                entry = quarantine.pop(index)
+                return f"карантин ({entry['reason']}): {entry['detail']}"
+        return "задачу не виконано"
+    
+    def iter_tasks(self, in_flight: deque) -> Iterator[tuple]:
+        """
+        Задачі з прочитаних рядків до кінця потоку
+        
+        Чекає на новий рядок, лише коли в роботі нічого немає; інакше віддає
+        PoolScheduler.IDLE, щоб планувальник тим часом видав готові результати.
+        
+        Args:
+            in_flight: Черга (заголовок результату, час отримання) для задач,
+                результатів яких ще не видано - сюди додаються нові задачі
+        """
+        while True:
+            if in_flight:
+                try:
+                    item = self._lines.get_nowait()
+                except queue.Empty:
+                    yield PoolScheduler.IDLE
+                    continue
+            else:
+                item = self._lines.get()
+            if item is None:
+                return
+            number, line, received = item
+            head = {'line': number}
+            try:
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"некоректний JSON: {e}")
+                if isinstance(record, dict) and 'id' in record:
+                    head['id'] = record['id']
+                task = self.parse(record)
+            except ValueError as e:
+                self.emit(dict(head, ok=False, error=str(e)))
+                continue
+            head.update(src=task[0], dst=task[1])
+            in_flight.append((head, received))
+            yield task
+    
+    def run(self) -> Tuple[int, int]:
+        """
+        Обробляє потік до кінця
+        
+        Returns:
+            (кількість успішних, кількість помилок)
+        """
+        reader = threading.Thread(target=self._read, name='job-reader', daemon=True)
+        reader.start()
+        in_flight = deque()
+        for result in self.scheduler.run(self.iter_tasks(in_flight), lambda: False,
+                                         _job_in_worker, self.resizer.job_cost, None):
+            head, received = in_flight.popleft()
+            if result is None:
+                result = {'ok': False, 'error': self._quarantine_reason(head['src'])}
+            result = dict(head, **result)
+            result['latency_ms'] = round((time.monotonic() - received) * 1000, 1)
+            self.emit(result)
+        return self.success, self.errors
+
+
 def main():
     """Головна функція"""
+    parser = argparse.ArgumentParser(description="Image Batch Resizer")
+    parser.add_argument('--resume', action='store_true',
+                        help="продовжити перерваний запуск за журналом у вихідній папці")
+    parser.add_argument('--watch', action='store_true',
+                        help="режим спостереження: обробляти нові файли, доки не натиснуто Ctrl+C")
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help="--watch: скільки секунд файл має не змінюватися (за замовчуванням 2)")
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help="--watch: пауза між опитуваннями, секунди (за замовчуванням 1)")
+    parser.add_argument('--engine', choices=ENGINES, default='pillow',
+                        help="рушій ресайзу: numpy - стеком для файлів однакової геометрії "
+                             "(потрібен numpy)")
+    parser.add_argument('--node', metavar='I/N',
+                        help="розподілена обробка: цей хост - вузол I з N (з 1) над спільною "
+                             "папкою; шарди розбираються за lease-файлами")
+    parser.add_argument('--batch', default=ClusterNode.DEFAULT_BATCH,
+                        help="--node: назва батчу (за замовчуванням batch)")
+    parser.add_argument('--cluster-report', action='store_true',
+                        help="лише зібрати зведений звіт батчу з вихідної папки")
+    parser.add_argument('--jobs', metavar='FILE',
+                        help="без запитань: задачі JSON-lines з файлу (- = stdin), "
+                             "результати JSON-lines у stdout; код виходу 1, якщо є помилки")
+    # Налаштування нижче діють в усіх режимах; задане - замість відповідного запитання
+    parser.add_argument('--workers', type=int,
+                        help="кількість процесів (за замовчуванням - усі ядра)")
+    parser.add_argument('--encoder', choices=list(ENCODER_PROFILES),
+                        help="профіль кодувача (за замовчуванням high)")
+    parser.add_argument('--anchor', choices=list(ANCHORS),
+                        help="що залишити при обрізанні в режимі cover (за замовчуванням center)")
+    parser.add_argument('--timeout', type=float, default=ImageResizer.DEFAULT_TIMEOUT,
+                        help=f"таймаут на зображення, секунди (0 - без обмеження, "
+                             f"за замовчуванням {ImageResizer.DEFAULT_TIMEOUT})")
+    parser.add_argument('--reference-quality', action='store_true',
+                        help="точний LANCZOS з повного розміру, без швидкого декодування "
+                             "JPEG (повільніше; результат як до версії зі швидким режимом)")
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers має бути від 1")
+    if args.timeout < 0:
+        parser.error("--timeout не може бути від'ємним")
+    timeout = args.timeout or None
+    node = None
+    if args.node:
+        try:
+            index, count = (int(part) for part in args.node.split('/'))
+        except ValueError:
+            parser.error("--node очікує формат I/N, наприклад 2/4")
+        if not 1 <= index <= count:
+            parser.error("--node: I має бути від 1 до N")
+        node = (index - 1, count)
+    
+    # Потік задач: без банера і запитань, stdout - лише JSON-рядки результатів
+    if args.jobs:
+        results = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+        # Решта виводу (у тому числі процесів пулу) - у stderr
+        sys.stdout.flush()
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        try:
+            # Не сам sys.stdin: процес пулу при старті закриває sys.stdin, і якщо
+            # потік читання саме чекає на рядок, закриття зависає на його блокуванні
+            source = (os.fdopen(os.dup(sys.stdin.fileno()), 'r', encoding='utf-8')
+                      if args.jobs == '-' else open(args.jobs, 'r', encoding='utf-8'))
+        except OSError as e:
+            print(f"❌ Не вдалося відкрити {args.jobs}: {e}")
+            sys.exit(2)
+        resizer = ImageResizer(encoder=args.encoder or 'high', anchor=args.anchor or 'center',
+                               timeout=timeout, engine=args.engine,
+                               reference_quality=args.reference_quality)
+        try:
+            success, errors = JobStream(resizer, source, results, args.workers).run()
+        except KeyboardInterrupt:
+            print("⏹ Потік задач зупинено")
+            sys.exit(130)
+        print(f"🏁 Задач: {success + errors}, успішно: {success}, помилок: {errors}")
+        sys.exit(1 if errors else 0)
+    
     print("=" * 60)
     print("🖼️  IMAGE BATCH RESIZER")
     print("=" * 60)
@@ -213,16 +4385,48 @@ def main():
     
     # Налаштування
     print("⚙️  Налаштування:")
-    print("   Цільовий розмір: 1280 x 720")
+    print("   Цільовий розмір: 1280 x 720 (або пресети для соцмереж)")
     print()
     
     # Запитуємо шлях до папки
-    input_folder = input("📁 Вкажіть шлях до папки з зображеннями: ").strip()
+    input_folder = input("📁 Вкажіть шлях до папки з зображеннями (або zip/tar архіву): ").strip()
     
     if not os.path.exists(input_folder):
         print("❌ Папка не знайдена!")
         return
     
+    if args.cluster_report:
+        try:
+            ClusterNode.merge_reports(os.path.join(input_folder, 'resized'), args.batch)
+        except OSError:
+            print(f"❌ Батч '{args.batch}' не знайдено у {os.path.join(input_folder, 'resized')}")
+        return
+    
+    # Архів: результати пишуться в архів, без розпакування
+    is_archive = os.path.isfile(input_folder) and archive_kind(input_folder) is not None
+    output_archive = None
+    if is_archive:
+        output_archive = input("📦 Вихідний архів або папка (Enter = <назва>_resized.zip): ").strip() or None
+    
+    # Перерваний запуск (журнал у вихідній папці)
+    resume = args.resume
+    if (not is_archive and not resume and not args.watch and node is None
+            and ResizeJournal.exists(os.path.join(input_folder, 'resized'))):
+        resume_choice = input("⏯️  Знайдено перерваний запуск. Продовжити? (Y/n): ").strip().lower()
+        resume = resume_choice not in ('n', 'no', 'н', 'ні')
+    
+    # Підпапки (у режимі спостереження - завжди)
+    recursive = is_archive or args.watch
+    if not recursive:
+        recursive_choice = input("📂 Обробляти також підпапки? (y/N): ").strip().lower()
+        recursive = recursive_choice in ('y', 'yes', 'т', 'так')
+    include = exclude = None
+    if recursive:
+        include_choice = input("   Лише файли (glob через кому, Enter = усі): ").strip()
+        exclude_choice = input("   Пропускати (glob через кому, Enter = нічого): ").strip()
+        include = [p.strip() for p in include_choice.split(',') if p.strip()] or None
+        exclude = [p.strip() for p in exclude_choice.split(',') if p.strip()] or None
+    
     # Вибір режиму
     print()
     print("🔧 Виберіть режим:")
@@ -232,6 +4436,18 @@ def main():
     mode_choice = input("Ваш вибір (1 або 2): ").strip()
     mode = 'contain' if mode_choice != '2' else 'cover'
     
+    # Що залишити при обрізанні (cover)
+    anchor = args.anchor or 'center'
+    if mode == 'cover' and args.anchor is None:
+        print()
+        print("✂️  Що залишити при обрізанні:")
+        anchor_names = list(ANCHORS)
+        for i, name in enumerate(anchor_names, 1):
+            print(f"   {i}. {name}")
+        anchor_choice = input("Ваш вибір (Enter = center): ").strip()
+        if anchor_choice.isdigit() and 1 <= int(anchor_choice) <= len(anchor_names):
+            anchor = anchor_names[int(anchor_choice) - 1]
+    
     # Колір фону для contain режиму
     bg_color = (0, 0, 0)  # Чорний за замовчуванням
     if mode == 'contain':
@@ -247,13 +4463,87 @@ def main():
         elif color_choice == '3':
             bg_color = (128, 128, 128)
     
+    # Розміри
+    print()
+    print("📐 Виберіть розміри (можна кілька через кому):")
+    preset_names = list(PRESETS)
+    for i, name in enumerate(preset_names, 1):
+        width, height = PRESETS[name]
+        print(f"   {i}. {name} - {width}x{height}")
+    size_choice = input("Ваш вибір (Enter = 1280x720): ").strip()
+    selected = [
+        preset_names[int(c) - 1] for c in size_choice.split(',')
+        if c.strip().isdigit() and 1 <= int(c) <= len(preset_names)
+    ]
+    target_size = PRESETS[selected[0]] if len(selected) == 1 else (1280, 720)
+    presets = {name: PRESETS[name] for name in selected} if len(selected) > 1 else None
+    
+    # Формат і профіль кодувача
+    print()
+    print("🗜️  Виберіть формат:")
+    format_names = [name for name in OUTPUT_FORMATS if encoder_available(name)]
+    for i, name in enumerate(format_names, 1):
+        print(f"   {i}. {name.upper()}")
+    format_choice = input("Ваш вибір (Enter = JPEG): ").strip()
+    output_format = 'jpeg'
+    if format_choice.isdigit() and 1 <= int(format_choice) <= len(format_names):
+        output_format = format_names[int(format_choice) - 1]
+    
+    encoder = args.encoder
+    if encoder is None:
+        print()
+        print("💾 Виберіть профіль кодувача:")
+        print("   1. HIGH - найвища якість, найбільші файли (як раніше)")
+        print("   2. BALANCED - ~2x менші файли, якість для вебу (рекомендовано для CDN)")
+        print("   3. FAST - найшвидше кодування")
+        print("   4. SMALLEST - найменші файли (progressive)")
+        encoder_choice = input("Ваш вибір (1-4, Enter = 1): ").strip()
+        encoder = {'2': 'balanced', '3': 'fast', '4': 'smallest'}.get(encoder_choice, 'high')
+    
+    print()
+    max_kb_choice = input("📦 Максимальний розмір файлу, KB (Enter = без обмеження): ").strip()
+    max_bytes = int(max_kb_choice) * 1024 if max_kb_choice.isdigit() and int(max_kb_choice) > 0 else None
+    
+    # Кількість процесів
+    cpu_count = os.cpu_count() or 1
+    workers = args.workers
+    if workers is None:
+        print()
+        workers_choice = input(f"⚡ Кількість процесів (1-{cpu_count}, Enter = {cpu_count}): ").strip()
+        workers = int(workers_choice) if workers_choice.isdigit() and int(workers_choice) > 0 else cpu_count
+    
     print()
     print("🚀 Початок обробки...")
     print()
     
     # Створюємо resizer та обробляємо
-    resizer = ImageResizer(1280, 720)
-    success, errors = resizer.process_folder(input_folder, mode=mode, bg_color=bg_color)
+    resizer = ImageResizer(*target_size, encoder=encoder, output_format=output_format,
+                           max_bytes=max_bytes, anchor=anchor,
+                           timeout=timeout, engine=args.engine,
+                           reference_quality=args.reference_quality)
+    if args.watch:
+        watcher = FolderWatcher(resizer, input_folder, mode=mode, bg_color=bg_color,
+                                presets=presets, workers=workers, include=include,
+                                exclude=exclude, settle=args.settle,
+                                poll_interval=args.interval)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            print()
+            print("⏹ Спостереження зупинено")
+        return
+    
+    if is_archive:
+        success, errors = resizer.process_archive(input_folder, output_archive, mode=mode,
+                                                  bg_color=bg_color, workers=workers,
+                                                  presets=presets, include=include,
+                                                  exclude=exclude)
+    else:
+        success, errors = resizer.process_folder(input_folder, mode=mode, bg_color=bg_color,
+                                                 workers=workers, presets=presets,
+                                                 recursive=recursive, include=include,
+                                                 exclude=exclude, resume=resume,
+                                                 node=node, batch=args.batch)
     
     print()
     print("=" * 60)
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Image Batch Resizer Server
+Локальний HTTP-сервіс ресайзу на вимогу з LRU-кешем результатів
+
+Приклади:
+    python image-resizer-server.py --root ./photos --port 8080
+    curl "http://127.0.0.1:8080/resize?src=a/b.jpg&w=1080&h=1080&mode=cover" -o b.jpg
+    curl "http://127.0.0.1:8080/stats"
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def load_engine():
+    """Завантажує рушій з image-resizer-script.py (ім'я файлу не є модулем Python)"""
+    if 'image_resizer' in sys.modules:
+        return sys.modules['image_resizer']
+    path = Path(__file__).with_name('image-resizer-script.py')
+    spec = importlib.util.spec_from_file_location('image_resizer', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['image_resizer'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+image_resizer = load_engine()
+
+
+# Межі параметрів запиту
+MAX_SIDE = 10000
+BG_COLORS = {'black': (0, 0, 0), 'white': (255, 255, 255), 'gray': (128, 128, 128)}
+
+# Content-Type за форматом результату
+CONTENT_TYPES = {'jpeg': 'image/jpeg', 'webp': 'image/webp', 'avif': 'image/avif',
+                 'png': 'image/png'}
+
+
+class ServiceError(Exception):
+    """Помилка запиту з HTTP-статусом"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ResultCache:
+    """
+    LRU кеш закодованих результатів: у пам'яті і (опційно) на диску
+
+    Обидва рівні обмежені сумарним розміром у байтах; при переповненні
+    витісняються найдавніше використані записи. Запис, витіснений з пам'яті,
+    лишається на диску. Дисковий індекс відновлюється при старті (за mtime),
+    файли пишуться атомарно (image_resizer.atomic_write).
+    """
+
+    def __init__(self, memory_bytes: int, disk_folder: Optional[str] = None,
+                 disk_bytes: int = 0):
+        self.memory_bytes = memory_bytes
+        self.disk_folder = disk_folder
+        self.disk_bytes = disk_bytes if disk_folder else 0
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._disk: 'OrderedDict[str, int]' = OrderedDict()  # ключ -> розмір файлу
+        self.memory_used = 0
+        self.disk_used = 0
+        self._lock = threading.Lock()
+        if self.disk_bytes:
+            os.makedirs(disk_folder, exist_ok=True)
+            self._load_disk_index()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_folder, key + '.bin')
+
+    def _load_disk_index(self):
+        """Відновлює дисковий індекс: від найдавніше використаного файлу"""
+        entries = []
+        with os.scandir(self.disk_folder) as it:
+            for entry in it:
+                if entry.name.endswith('.bin'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, entry.name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self.disk_used += size
+        self._evict_disk()
+
+    def get(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Returns:
+            (дані, 'memory' або 'disk') або (None, None), якщо запису немає
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data, 'memory'
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+        if not on_disk:
+            return None, None
+        try:
+            path = self._disk_path(key)
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # для LRU після перезапуску
+        except OSError:
+            # Файл витіснили між перевіркою і читанням
+            return None, None
+        self._put_memory(key, data)
+        return data, 'disk'
+
+    def put(self, key: str, data: bytes):
+        """Кладе результат в обидва рівні"""
+        self._put_memory(key, data)
+        if not self.disk_bytes or len(data) > self.disk_bytes:
+            return
+        image_resizer.atomic_write(self._disk_path(key), data)
+        with self._lock:
+            self.disk_used += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._evict_disk()
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            self.memory_used += len(data) - (len(old) if old is not None else 0)
+            self._memory[key] = data
+            while self.memory_used > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self.memory_used -= len(evicted)
+
+    def _evict_disk(self):
+        """Витісняє найдавніші файли, доки диск не вміститься в ліміт (під lock)"""
+        while self.disk_used > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self.disk_used -= size
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'memory_entries': len(self._memory), 'memory_bytes': self.memory_used,
+                    'disk_entries': len(self._disk), 'disk_bytes': self.disk_used}
+
+
+class ResizeService:
+    """
+    Ресайз на вимогу: кеш, об'єднання однакових запитів і обмежений пул
+
+    Ключ кешу - SHA-256 від відбитка джерела (шлях, розмір, mtime) і
+    параметрів (розмір, режим, фон, формат і профіль кодувача, якір).
+    Одночасні запити з однаковим ключем чекають на одну й ту саму задачу,
+    тож "натовп" однакових запитів запускає лише один ресайз. Пул процесів
+    прогрівається при старті (ресайзер ініціалізується один раз на процес),
+    а задач у черзі не більше за max_pending - решта отримує 503.
+
+    Як і PoolScheduler, сервіс не лишає завислий процес займати місце в пулі:
+    після таймауту пул зупиняється і створюється заново, а джерело (шлях,
+    розмір, mtime) потрапляє в карантин - повторні запити до нього одразу
+    отримують 422, доки файл не зміниться.
+    """
+
+    # Скільки джерел пам'ятає карантин (найдавніші витісняються)
+    QUARANTINE_SIZE = 1024
+
+    def __init__(self, resizer: 'image_resizer.ImageResizer', root: str, workers: int = 1,
+                 memory_mb: float = 256, disk_folder: Optional[str] = None,
+                 disk_mb: float = 0, max_pending: Optional[int] = None,
+                 timeout: Optional[float] = 60):
+        """
+        Args:
+            resizer: Налаштований ImageResizer (формат, кодувач, якір)
+            root: Папка, з якої дозволено читати джерела (src - відносно неї)
+            workers: Кількість процесів пулу
+            memory_mb: Ліміт кешу в пам'яті, MB
+            disk_folder: Папка дискового кешу (None - лише пам'ять)
+            disk_mb: Ліміт дискового кешу, MB
+            max_pending: Максимум задач у пулі (за замовчуванням workers * 4)
+            timeout: Скільки чекати на ресайз, секунди (None - без обмеження)
+        """
+        self.resizer = resizer
+        self.root = os.path.realpath(root)
+        self.workers = workers
+        self.timeout = timeout
+        self.cache = ResultCache(int(memory_mb * 1024 ** 2), disk_folder,
+                                 int(disk_mb * 1024 ** 2))
+        self._pool_lock = threading.Lock()
+        self.executor = self._new_executor()
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 4)
+        self._in_flight = {}  # ключ -> Future з результатом
+        self.quarantine: 'OrderedDict[str, str]' = OrderedDict()  # відбиток джерела -> причина
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                         'coalesced': 0, 'rejected': 0, 'errors': 0, 'timeouts': 0,
+                         'quarantined': 0, 'pool_restarts': 0}
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        """Новий пул; прогрів - усі процеси стартують і ініціалізуються одразу"""
+        executor = ProcessPoolExecutor(max_workers=self.workers,
+                                       initializer=image_resizer._init_worker,
+                                       initargs=(self.resizer,))
+        for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _restart_pool(self, broken: ProcessPoolExecutor, reason: str = "процес-воркер упав"):
+        """
+        Замінює пул, що зламався або завис; повторні виклики для нього нічого не роблять
+
+        Процеси старого пулу зупиняються негайно. Задачі інших запитів, що
+        працювали в ньому, отримують BrokenProcessPool і повторюються в новому.
+        """
+        with self._pool_lock:
+            if self.executor is not broken:
+                return
+            image_resizer.PoolScheduler._kill_pool(broken)
+            self.executor = self._new_executor()
+        self._count('pool_restarts')
+        print(f"♻️  Пул процесів перезапущено ({reason})", file=sys.stderr)
+
+    def _render(self, task: tuple):
+        """
+        Виконує задачу _render_in_worker у пулі
+
+        Якщо пул зламався (процес-воркер убито, наприклад OOM killer), пул
+        перезапускається і задача повторюється один раз. Якщо задача, що вже
+        виконується, не вклалася в таймаут, пул теж перезапускається (інакше
+        завислий процес тримав би своє місце), а джерело йде в карантин.
+
+        Raises:
+            ServiceError: Перевантаження (503), таймаут (504) або пул не відновився (503)
+        """
+        for _ in range(2):
+            if not self._slots.acquire(blocking=False):
+                self._count('rejected')
+                raise ServiceError(503, "сервіс перевантажений, спробуйте пізніше")
+            executor = self.executor
+            try:
+                job = executor.submit(image_resizer._render_in_worker, task)
+            except BrokenProcessPool:
+                self._slots.release()
+                self._restart_pool(executor)
+                continue
+            except BaseException:
+                self._slots.release()
+                raise
+            # Місце звільняється, коли процес справді закінчить (і після таймауту)
+            job.add_done_callback(lambda _: self._slots.release())
+            try:
+                return job.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                self._count('timeouts')
+                reason = f"ресайз довше за {self.timeout:g} с"
+                # Задача ще чекала в черзі - процеси не завислі, лише зайняті
+                if not job.cancel():
+                    self._quarantine_source(task[0], reason)
+                    self._restart_pool(executor, reason)
+                raise ServiceError(504, reason)
+            except BrokenProcessPool:
+                self._restart_pool(executor)
+        raise ServiceError(503, "пул процесів перезапускається, спробуйте пізніше")
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    @staticmethod
+    def source_key(path: str) -> str:
+        """Відбиток джерела для карантину: шлях, розмір і mtime"""
+        st = os.stat(path)
+        return json.dumps([path, st.st_size, st.st_mtime_ns])
+
+    def _quarantine_source(self, path: str, reason: str):
+        """Додає джерело в карантин (найдавніші записи понад QUARANTINE_SIZE витісняються)"""
+        try:
+            key = self.source_key(path)
+        except OSError:
+            return
+        with self._lock:
+            self.quarantine[key] = reason
+            self.quarantine.move_to_end(key)
+            while len(self.quarantine) > self.QUARANTINE_SIZE:
+                self.quarantine.popitem(last=False)
+            self.counters['quarantined'] += 1
+        print(f"🚧 Карантин: {path} - {reason}", file=sys.stderr)
+
+    def resolve_source(self, src: str) -> str:
+        """Шлях до джерела всередині root (вихід за root заборонено)"""
+        path = os.path.realpath(os.path.join(self.root, src.lstrip('/\\')))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ServiceError(403, "src поза дозволеною папкою")
+        if not os.path.isfile(path):
+            raise ServiceError(404, f"файл не знайдено: {src}")
+        return path
+
+    def cache_key(self, path: str, size: Tuple[int, int], mode: str, bg_color) -> str:
+        """Ключ кешу: відбиток джерела + параметри ресайзу"""
+        st = os.stat(path)
+        params = self.resizer.cache_params(mode, bg_color, {'request': size})
+        raw = json.dumps([path, st.st_size, st.st_mtime_ns, params], sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def resize(self, src: str, width: int, height: int, mode: str = 'contain',
+               bg_color=(0, 0, 0)) -> Tuple[bytes, str]:
+        """
+        Повертає закодований результат (з кешу або після ресайзу)
+
+        Returns:
+            (дані, джерело: 'memory', 'disk', 'miss' або 'coalesced')
+
+        Raises:
+            ServiceError: Неправильний запит, перевантаження, таймаут або помилка обробки
+        """
+        self._count('requests')
+        path = self.resolve_source(src)
+        key = self.cache_key(path, (width, height), mode, bg_color)
+
+        data, where = self.cache.get(key)
+        if data is not None:
+            self._count(f'{where}_hits')
+            return data, where
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not leader:
+            self._count('coalesced')
+            return future.result(), 'coalesced'
+
+        self._count('misses')
+        try:
+            source = self.source_key(path)
+            with self._lock:
+                reason = self.quarantine.get(source)
+            if reason is not None:
+                raise ServiceError(422, f"джерело в карантині: {reason}")
+            outputs, _ = self._render((path, None, [(width, height)], mode, bg_color))
+            if outputs is None:
+                self._count('errors')
+                raise ServiceError(422, "не вдалося обробити зображення")
+            data = outputs[0]
+            self.cache.put(key, data)
+            future.set_result(data)
+            return data, 'miss'
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters, in_flight=len(self._in_flight), workers=self.workers,
+                         quarantine=len(self.quarantine))
+        stats.update(self.cache.stats())
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def parse_request(query: dict) -> Tuple[str, int, int, str, tuple]:
+    """Перевіряє параметри /resize: src, w, h, mode, bg"""
+    def one(name, default=None):
+        values = query.get(name)
+        return values[0] if values else default
+
+    src = one('src')
+    if not src:
+        raise ServiceError(400, "потрібен параметр src")
+    try:
+        width = int(one('w'))
+        height = int(one('h'))
+    except (TypeError, ValueError):
+        raise ServiceError(400, "w і h мають бути цілими числами")
+    if not (1 <= width <= MAX_SIDE and 1 <= height <= MAX_SIDE):
+        raise ServiceError(400, f"w і h мають бути від 1 до {MAX_SIDE}")
+    mode = one('mode', 'contain')
+    if mode not in ('contain', 'cover'):
+        raise ServiceError(400, "mode: contain або cover")
+    bg = one('bg', 'black')
+    if bg not in BG_COLORS:
+        raise ServiceError(400, f"bg: {', '.join(BG_COLORS)}")
+    return src, width, height, mode, BG_COLORS[bg]
+
+
+class ResizeRequestHandler(BaseHTTPRequestHandler):
+    """GET /resize?src=...&w=...&h=...&mode=cover і GET /stats"""
+
+    server_version = 'ImageBatchResizer/1.0'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        service = self.server.service
+        if url.path == '/stats':
+            self._send(200, json.dumps(service.stats()).encode('utf-8'), 'application/json')
+            return
+        if url.path != '/resize':
+            self._send_error(404, "невідомий шлях (є /resize і /stats)")
+            return
+        started = time.perf_counter()
+        try:
+            src, width, height, mode, bg_color = parse_request(parse_qs(url.query))
+            data, where = service.resize(src, width, height, mode, bg_color)
+        except ServiceError as e:
+            self._send_error(e.status, str(e))
+            return
+        except Exception as e:
+            # Клієнт має отримати відповідь, а не обірване з'єднання
+            self.log_error("помилка обробки %s: %r", self.path, e)
+            self._send_error(500, "внутрішня помилка сервісу")
+            return
+        content_type = CONTENT_TYPES[service.resizer.output_format]
+        self._send(200, data, content_type, {
+            'X-Cache': where,
+            'X-Resize-Ms': f"{(time.perf_counter() - started) * 1000:.1f}",
+            'Cache-Control': 'public, max-age=86400',
+        })
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+        self._send(status, body, 'application/json; charset=utf-8')
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(service: ResizeService, host: str = '127.0.0.1', port: int = 8080,
+                quiet: bool = False) -> ThreadingHTTPServer:
+    """
+    Створює HTTP-сервер (port=0 - вільний порт, див. server.server_address)
+
+    Запуск: server.serve_forever() (можна в окремому потоці), зупинка:
+    server.shutdown() і service.close().
+    """
+    server = ThreadingHTTPServer((host, port), ResizeRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP-сервіс Image Batch Resizer")
+    parser.add_argument('--root', required=True, help="Папка з джерелами (src - відносно неї)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Процесів у пулі (за замовчуванням - усі ядра)")
+    parser.add_argument('--max-pending', type=int, help="Максимум задач у пулі (понад це - 503)")
+    parser.add_argument('--memory-mb', type=float, default=256, help="Кеш у пам'яті, MB")
+    parser.add_argument('--cache-dir', help="Папка дискового кешу")
+    parser.add_argument('--disk-mb', type=float, default=2048, help="Дисковий кеш, MB")
+    parser.add_argument('--format', default='jpeg', choices=list(image_resizer.OUTPUT_FORMATS))
+    parser.add_argument('--encoder', default='balanced', choices=list(image_resizer.ENCODER_PROFILES))
+    parser.add_argument('--anchor', default='center', choices=list(image_resizer.ANCHORS))
+    parser.add_argument('--timeout', type=float, default=60, help="Таймаут ресайзу, секунди")
+    parser.add_argument('--quiet', action='store_true', help="Без журналу запитів")
+    args = parser.parse_args()
+
+    resizer = image_resizer.ImageResizer(output_format=args.format, encoder=args.encoder,
+                                         anchor=args.anchor)
+    service = ResizeService(resizer, args.root, args.workers, args.memory_mb,
+                            args.cache_dir, args.disk_mb if args.cache_dir else 0,
+                            args.max_pending, args.timeout)
+    server = make_server(service, args.host, args.port, args.quiet)
+    host, port = server.server_address[:2]
+    print(f"🌐 Сервіс ресайзу: http://{host}:{port}/resize?src=...&w=1080&h=1080&mode=cover")
+    print(f"📁 Джерела: {service.root}")
+    print(f"⚡ Процесів: {args.workers}, кеш: {args.memory_mb:g} MB у пам'яті"
+          + (f", {args.disk_mb:g} MB на диску ({args.cache_dir})" if args.cache_dir else ''))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+        print("⏹ Сервіс зупинено")
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Спільні фікстури тестів
+
+Файли з дефісами в іменах не імпортуються звичайним import, тому рушій і
+сервіс завантажуються за шляхом (як це робить сам image-resizer-server.py).
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_module(name: str, filename: str):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, ROOT / filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+image_resizer = load_module('image_resizer', 'image-resizer-script.py')
+
+
+def make_image(path, size=(640, 480), color=(200, 80, 40), fmt=None):
+    """Зображення з градієнтом (щоб ресайз і кодування не були тривіальними)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    width, height = size
+    img = Image.linear_gradient('L').resize(size)
+    img = Image.merge('RGB', (img, Image.new('L', size, color[1]), img.transpose(Image.FLIP_LEFT_RIGHT)))
+    img.paste(color, (width // 4, height // 4, width // 2, height // 2))
+    img.save(path, fmt)
+    return path
+
+
+@pytest.fixture
+def engine():
+    return image_resizer
+
+
+@pytest.fixture
+def photos(tmp_path):
+    """Папка з кількома JPEG (одна підпапка) і одним битим файлом"""
+    folder = tmp_path / 'photos'
+    for i in range(6):
+        make_image(folder / f'img{i}.jpg', (640 + i * 16, 480), (i * 40, 100, 200 - i * 30))
+    make_image(folder / 'sub' / 'deep.jpg', (800, 600))
+    (folder / 'broken.jpg').write_bytes(b'not an image')
+    return folder
@@ -0,0 +1,42 @@
+import tarfile
+import zipfile
+from io import BytesIO
+
+from PIL import Image
+
+from conftest import image_resizer, make_image
+
+
+def test_zip_round_trip(tmp_path):
+    make_image(tmp_path / 'a.jpg', (640, 480))
+    make_image(tmp_path / 'b.png', (300, 600), fmt='PNG')
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as z:
+        z.write(tmp_path / 'a.jpg', 'a.jpg')
+        z.write(tmp_path / 'b.png', 'dir/b.png')
+        z.writestr('dir/broken.jpg', b'not an image')
+        z.writestr('notes.txt', 'not an image either')
+
+    resizer = image_resizer.ImageResizer(160, 120)
+    assert resizer.process_archive(str(archive)) == (2, 1)
+    with zipfile.ZipFile(tmp_path / 'in_resized.zip') as z:
+        assert sorted(z.namelist()) == ['a_resized.jpg', 'dir/b_resized.jpg']
+        for name in z.namelist():
+            with Image.open(BytesIO(z.read(name))) as img:
+                assert img.size == (160, 120)
+
+
+def test_tar_to_folder_with_presets(tmp_path):
+    make_image(tmp_path / 'a.jpg', (640, 480))
+    make_image(tmp_path / 'b.png', (300, 600), fmt='PNG')
+    archive = tmp_path / 'in.tar.gz'
+    with tarfile.open(archive, 'w:gz') as t:
+        t.add(tmp_path / 'a.jpg', 'a.jpg')
+        t.add(tmp_path / 'b.png', 'dir/b.png')
+
+    resizer = image_resizer.ImageResizer()
+    output = tmp_path / 'out'
+    assert resizer.process_archive(str(archive), str(output), presets={'s': (50, 50)}) == (2, 0)
+    for path in (output / 's' / 'a_resized.jpg', output / 's' / 'dir' / 'b_resized.jpg'):
+        with Image.open(path) as img:
+            assert img.size == (50, 50)
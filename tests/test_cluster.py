@@ -0,0 +1,114 @@
+import json
+import os
+import time
+
+import pytest
+
+from conftest import image_resizer
+
+ClusterNode = image_resizer.ClusterNode
+
+
+def make_node(photos, index, lease_ttl=0.6, **kwargs):
+    return ClusterNode(image_resizer.ImageResizer(160, 120), str(photos), node=(index, 2),
+                       shards=4, lease_ttl=lease_ttl, node_id=f'node{index}', **kwargs)
+
+
+def test_two_nodes_share_batch(photos):
+    first, second = make_node(photos, 0), make_node(photos, 1)
+    first.run(wait=False)
+    second.run()
+    report = ClusterNode.merge_reports(first.output_folder)
+    assert report['complete']
+    assert report['shards_done'] == len(first.scan())
+    assert (report['found'], report['success'], report['errors']) == (8, 7, 1)
+    assert sum(node['shards'] for node in report['nodes']) == report['shards_done']
+
+    # Наступний батч: незмінені файли пропускаються і не рахуються успішними
+    assert make_node(photos, 0, batch='next').run() == (0, 1)
+    report = ClusterNode.merge_reports(first.output_folder, 'next')
+    assert (report['success'], report['errors'], report['skipped']) == (0, 1, 7)
+
+
+def test_expired_lease_is_taken_over(photos):
+    crashed = make_node(photos, 0, lease_ttl=0.3)
+    shard = next(iter(crashed.scan()))
+    # "Вузол упав": оренда захоплена і більше не продовжується
+    assert crashed.claim(shard)
+
+    survivor = make_node(photos, 1)
+    assert survivor.claim(shard) is None
+    time.sleep(0.4)
+    assert survivor.run() == (7, 1)
+    assert survivor.summary['taken_over'] == 1
+    assert shard in survivor.summary['shards']
+    with open(os.path.join(survivor.output_folder, 'resize-cluster-batch.json')) as f:
+        assert json.load(f)['shards_in_progress'] == 0
+
+
+def test_torn_lease_expires_by_mtime(photos):
+    node = make_node(photos, 0)
+    shard = next(iter(node.scan()))
+    path = node._lease_path(shard)
+    open(path, 'w').close()
+    assert node.claim(shard) is None
+    old = time.time() - 10
+    os.utime(path, (old, old))
+    assert node.claim(shard)
+
+
+def test_batch_params_must_match(photos):
+    make_node(photos, 0)
+    with pytest.raises(ValueError):
+        make_node(photos, 1, mode='cover')
+
+
+def test_renew_never_overwrites_foreign_lease(photos):
+    node = make_node(photos, 0)
+    shard = next(iter(node.scan()))
+    token = node.claim(shard)
+    assert node.renew(shard, token)
+    # Інший вузол підхопив оренду
+    foreign = make_node(photos, 1)._lease_record('foreign')
+    with open(node._lease_path(shard), 'wb') as f:
+        f.write(foreign)
+    assert not node.renew(shard, token)
+    with open(node._lease_path(shard), 'rb') as f:
+        assert f.read() == foreign
+
+
+def test_renew_detects_takeover_after_replace(photos, monkeypatch):
+    node = make_node(photos, 0)
+    shard = next(iter(node.scan()))
+    token = node.claim(shard)
+    path = node._lease_path(shard)
+    real_replace = os.replace
+
+    def replace_then_taken_over(src, dst):
+        real_replace(src, dst)
+        if dst == path:
+            with open(path, 'wb') as f:
+                f.write(node._lease_record('foreign'))
+
+    monkeypatch.setattr(image_resizer.os, 'replace', replace_then_taken_over)
+    assert not node.renew(shard, token)
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.tmp')]
+
+
+def test_lost_shard_is_given_up(photos, monkeypatch):
+    node = make_node(photos, 0)
+    monkeypatch.setattr(ClusterNode, 'renew', lambda self, shard, token: False)
+    shard, files = next(iter(node.scan().items()))
+    token = node.claim(shard)
+    # Продовження кожні lease_ttl / 3 = 0.2 с: оренду втрачено до першого результату
+    real_resize = image_resizer.ImageResizer.resize_one
+
+    def slow_resize(self, *args, **kwargs):
+        time.sleep(0.3)
+        return real_resize(self, *args, **kwargs)
+
+    monkeypatch.setattr(image_resizer.ImageResizer, 'resize_one', slow_resize)
+    assert node.process_shard(shard, files, token) is None
+    journal = os.path.join(node.state_folder, f"{shard:04d}", image_resizer.ResizeJournal.FILENAME)
+    with open(journal, encoding='utf-8') as f:
+        assert len(f.readlines()) == 1  # лише заголовок
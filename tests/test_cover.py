@@ -0,0 +1,33 @@
+import pytest
+from PIL import Image
+
+from conftest import image_resizer, make_image
+
+
+@pytest.mark.parametrize('anchor, box', [
+    ('center', (500, 0, 1100, 600)),
+    ('left', (0, 0, 600, 600)),
+    ('right', (1000, 0, 1600, 600)),
+])
+def test_cover_box_follows_anchor(anchor, box):
+    resizer = image_resizer.ImageResizer(300, 300, anchor=anchor)
+    assert resizer._cover_box((1600, 600)) == box
+
+
+@pytest.mark.parametrize('reference_quality', [True, False])
+def test_cover_resamples_only_the_box(tmp_path, reference_quality):
+    # Дробова ділянка: 1000x666.7 зі зсувом 16.7 px зверху
+    source = make_image(tmp_path / 'photo.png', (1000, 700), fmt='PNG')
+    resizer = image_resizer.ImageResizer(300, 200, reference_quality=reference_quality)
+    img, new_sizes = resizer.decode(str(source), 'cover')
+    rendered, = resizer.render(img, new_sizes, mode='cover')
+    assert rendered.size == (300, 200)
+    with Image.open(source) as original:
+        box = resizer._cover_box(original.size)
+        expected = original.convert('RGB').resize((300, 200), Image.LANCZOS, box=box)
+    if reference_quality:
+        # Еталонний режим: точний LANCZOS ділянки, без reduce()
+        assert rendered.tobytes() == expected.tobytes()
+    else:
+        diff = max(abs(a - b) for a, b in zip(rendered.tobytes(), expected.tobytes()))
+        assert diff <= 16
@@ -0,0 +1,127 @@
+import os
+import shutil
+import time
+import types
+
+from PIL import Image
+
+from conftest import image_resizer, make_image
+
+
+def outputs(folder):
+    return sorted(str(path.relative_to(folder)) for path in folder.rglob('*_resized.jpg'))
+
+
+def test_recursive_run_mirrors_tree_lazily(photos):
+    assert isinstance(image_resizer.iter_image_files(str(photos), recursive=True),
+                      types.GeneratorType)
+    resizer = image_resizer.ImageResizer(160, 120)
+    success, errors = resizer.process_folder(str(photos), recursive=True)
+    assert (success, errors) == (7, 1)
+    assert outputs(photos / 'resized') == sorted(
+        [f'img{i}_resized.jpg' for i in range(6)] + [os.path.join('sub', 'deep_resized.jpg')])
+
+
+def test_unchanged_files_are_skipped(photos):
+    resizer = image_resizer.ImageResizer(160, 120)
+    assert resizer.process_folder(str(photos)) == (6, 1)
+    assert resizer.stats['processed'] == 7
+    # Лише битий файл (невдалі результати не запам'ятовуються); пропущені
+    # файли не рахуються як успішно оброблені
+    assert resizer.process_folder(str(photos)) == (0, 1)
+    assert resizer.stats['processed'] == 1
+    assert resizer.stats['cache_hits'] == resizer.stats['skipped'] == 6
+    make_image(photos / 'img0.jpg', (500, 500))
+    assert resizer.process_folder(str(photos)) == (1, 1)
+    assert (resizer.stats['processed'], resizer.stats['skipped']) == (2, 5)
+
+
+def test_duplicates_are_linked(photos):
+    shutil.copyfile(photos / 'img1.jpg', photos / 'copy.jpg')
+    resizer = image_resizer.ImageResizer(160, 120)
+    success, errors = resizer.process_folder(str(photos), incremental=False)
+    assert (success, errors) == (7, 1)
+    assert resizer.stats['duplicates'] == 1
+    resized = photos / 'resized'
+    assert os.path.samefile(resized / 'copy_resized.jpg', resized / 'img1_resized.jpg')
+
+
+def test_presets_from_one_decode(photos):
+    presets = {'small': (100, 100), 'wide': (320, 180)}
+    resizer = image_resizer.ImageResizer()
+    resizer.process_folder(str(photos), presets=presets, incremental=False)
+    for name, size in presets.items():
+        with Image.open(photos / 'resized' / name / 'img0_resized.jpg') as img:
+            assert img.size == size
+
+
+def test_reference_quality_matches_plain_lanczos(tmp_path):
+    source = make_image(tmp_path / 'big.jpg', (2400, 1800))
+    resizer = image_resizer.ImageResizer(300, 225, reference_quality=True)
+    img, new_sizes = resizer.decode(str(source), 'contain', (0, 0, 0), [(300, 225)])
+    rendered, = resizer.render(img, new_sizes, [(300, 225)], 'contain', (0, 0, 0))
+    with Image.open(source) as original:
+        expected = original.convert('RGB').resize((300, 225), Image.LANCZOS)
+    assert rendered.tobytes() == expected.tobytes()
+    # Швидкий режим декодує JPEG зменшеним (draft)
+    fast = image_resizer.ImageResizer(300, 225)
+    img, _ = fast.decode(str(source), 'contain', (0, 0, 0), [(300, 225)])
+    assert img.width < 2400
+
+
+def test_processing_starts_before_scan_finishes(photos, monkeypatch):
+    real_iter = image_resizer.iter_image_files
+    scanned = []
+
+    def slow_scan(*args, **kwargs):
+        for path in real_iter(*args, **kwargs):
+            time.sleep(0.05)
+            scanned.append(path)
+            yield path
+
+    monkeypatch.setattr(image_resizer, 'iter_image_files', slow_scan)
+    first_result = []
+    resizer = image_resizer.ImageResizer(160, 120)
+    resizer.process_folder(str(photos), progress=lambda done, total: first_result.append(
+        len(scanned)))
+    # Без підпапок теж: перший файл готовий, поки обхід ще триває
+    assert first_result[0] < len(scanned) == 7
+
+
+def test_stage_queues_are_bounded_and_reported(photos, monkeypatch):
+    monkeypatch.setattr(image_resizer.ImageResizer, 'PIPELINE_WINDOW', 2)
+    resizer = image_resizer.ImageResizer(160, 120)
+    assert resizer.process_folder(str(photos), recursive=True) == (7, 1)
+    stages = resizer.stats['stages']
+    assert list(stages) == ['scan', 'probe', 'decode', 'resize', 'encode']
+    for stage in stages.values():
+        assert stage['max_depth'] <= stage['maxsize']
+    assert stages['scan']['maxsize'] == 2
+    assert stages['decode']['maxsize'] == image_resizer.ImageResizer.STAGE_QUEUE_SIZE
+    # Тимчасові заголовки огляду прибираються після обробки файлу
+    assert resizer.headers == {}
+
+    resizer = image_resizer.ImageResizer(160, 120)
+    assert resizer.process_folder(str(photos), workers=2, incremental=False) == (6, 1)
+    assert list(resizer.stats['stages']) == ['scan', 'probe']
+
+
+def test_preflight_orders_largest_first_within_window(tmp_path):
+    sizes = {'a': (200, 100), 'b': (1600, 1200), 'c': (800, 600), 'd': (100, 100)}
+    jobs = [(make_image(tmp_path / f'{name}.png', size, fmt='PNG'), str(tmp_path / name), None)
+            for name, size in sizes.items()]
+    resizer = image_resizer.ImageResizer(50, 50)
+    order = [job[0].stem for job in resizer.preflight(iter(jobs), workers=2, window=2)]
+    assert order == ['b', 'c', 'a', 'd']
+    assert resizer.preflight_summary['largest'] == str(tmp_path / 'b.png')
+    # Один процес - порядок обходу
+    order = [job[0].stem for job in resizer.preflight(iter(jobs), workers=1, window=2)]
+    assert order == ['a', 'b', 'c', 'd']
+
+
+def test_pool_loads_plugins_before_fork(monkeypatch):
+    # Потік probe не повинен імпортувати плагін, поки пул робить fork
+    monkeypatch.setattr(Image, '_initialized', 0)
+    scheduler = image_resizer.PoolScheduler(image_resizer.ImageResizer(50, 50), 1)
+    scheduler._new_pool().shutdown()
+    assert Image._initialized == 2
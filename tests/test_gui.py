@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from conftest import load_module, make_image
+
+pytest.importorskip('tkinter')
+gui = load_module('image_resizer_gui', 'image-resizer-gui.py')
+
+
+def make_app():
+    """Вікно без Tk: process_images спілкується з ним лише через log і post"""
+    app = gui.ImageResizerGUI.__new__(gui.ImageResizerGUI)
+    app.cancel_event = threading.Event()
+    app.logs = []
+    app.events = []
+    app.log = app.logs.append
+    app.post = lambda *event: app.events.append(event)
+    return app
+
+
+def run(app, folder, output, recursive=False):
+    resizer = gui.image_resizer.ImageResizer(200, 150)
+    app.process_images(str(folder), str(output), resizer, 'contain', (0, 0, 0), None, 1,
+                       recursive, None, None)
+    return resizer
+
+
+@pytest.mark.parametrize('recursive', [False, True])
+def test_cancel_counts_only_finished_files(tmp_path, recursive):
+    for i in range(20):
+        make_image(tmp_path / 'in' / f'img{i:02}.jpg', (320, 240), (i * 10, 50, 50))
+    app = make_app()
+    log = app.log
+
+    def log_and_cancel(message):
+        log(message)
+        if '✅' in message:
+            app.cancel_event.set()
+
+    app.log = log_and_cancel
+    resizer = run(app, tmp_path / 'in', tmp_path / 'out', recursive)
+
+    # Файли, що вже були в конвеєрі, дописуються; решта не запускається
+    written = len(list((tmp_path / 'out').rglob('*_resized.jpg')))
+    assert written == resizer.stats['processed'] < 20
+    assert resizer.stats['cancelled']
+    assert resizer.stats['not_started'] == resizer.stats['found'] - written
+    assert any(event[:2] == ('progress', 1) for event in app.events)
+    kind, level, title, message = app.events[-1]
+    assert (kind, title) == ('done', "Скасовано")
+    assert message.startswith(f"Оброблено {written} з ")
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    for i in range(3):
+        make_image(tmp_path / 'in' / f'img{i}.jpg', (320, 240))
+    app = make_app()
+    run(app, tmp_path / 'in', tmp_path / 'out')
+    assert app.events[-1] == ('done', 'info', "Готово", "Оброблено 3 зображень!")
+    app = make_app()
+    run(app, tmp_path / 'in', tmp_path / 'out')
+    assert app.events[-1] == ('done', 'info', "Готово", "Оброблено 0 зображень! Без змін: 3")
+
+
+def test_done_is_posted_on_any_exit(tmp_path, monkeypatch):
+    def interrupted(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(gui.image_resizer.ImageResizer, 'process_folder', interrupted)
+    app = make_app()
+    with pytest.raises(KeyboardInterrupt):
+        run(app, tmp_path / 'in', tmp_path / 'out')
+    assert app.events[-1][:2] == ('done', 'error')
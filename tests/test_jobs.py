@@ -0,0 +1,118 @@
+import io
+import json
+import subprocess
+import sys
+import time
+
+from PIL import Image
+
+from conftest import ROOT, image_resizer, make_image
+
+SCRIPT = str(ROOT / 'image-resizer-script.py')
+
+
+def run_stream(lines, workers=1, **options):
+    output = io.StringIO()
+    resizer = image_resizer.ImageResizer(**options)
+    stream = image_resizer.JobStream(resizer, lines, output, workers)
+    counts = stream.run()
+    return counts, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_results_and_errors_per_line(tmp_path):
+    make_image(tmp_path / 'a.jpg', (800, 600))
+    lines = [
+        json.dumps({'id': 'a', 'src': str(tmp_path / 'a.jpg'), 'dst': str(tmp_path / 'o' / 'a.webp'),
+                    'w': 300, 'h': 300, 'mode': 'cover'}),
+        'not json',
+        json.dumps({'id': 'b', 'src': str(tmp_path / 'a.jpg')}),
+        json.dumps({'src': str(tmp_path / 'a.jpg'), 'dst': str(tmp_path / 'x.jpg'), 'w': 0}),
+        json.dumps({'src': str(tmp_path / 'missing.jpg'), 'dst': str(tmp_path / 'm.jpg')}),
+        '',
+        json.dumps({'src': str(tmp_path / 'a.jpg'), 'dst': str(tmp_path / 'p.bin'),
+                    'w': 100, 'h': 50, 'format': 'png', 'bg': [255, 0, 0]}),
+    ]
+    (success, errors), results = run_stream(lines)
+    assert (success, errors) == (2, 4)
+    by_line = {result['line']: result for result in results}
+    assert sorted(by_line) == [1, 2, 3, 4, 5, 7]
+
+    assert by_line[1]['ok'] and by_line[1]['id'] == 'a'
+    assert (by_line[1]['width'], by_line[1]['height']) == (300, 300)
+    assert {'decode', 'resize', 'encode'} <= set(by_line[1]['stages_ms'])
+    assert by_line[1]['latency_ms'] >= by_line[1]['time_ms'] > 0
+    assert Image.open(tmp_path / 'o' / 'a.webp').format == 'WEBP'
+
+    assert by_line[2]['error'].startswith("некоректний JSON")
+    assert by_line[3] == {'line': 3, 'id': 'b', 'ok': False,
+                          'error': "потрібні поля src і dst (рядки)"}
+    assert 'w і h' in by_line[4]['error']
+    assert by_line[5]['error'].startswith('FileNotFoundError')
+
+    with Image.open(tmp_path / 'p.bin') as img:
+        assert (img.format, img.size) == ('PNG', (100, 50))
+        assert img.getpixel((0, 25))[:3] == (255, 0, 0)  # поле contain зліва
+
+
+def test_timeout_is_reported_as_quarantine(tmp_path):
+    make_image(tmp_path / 'a.jpg', (800, 600))
+    line = json.dumps({'src': str(tmp_path / 'a.jpg'), 'dst': str(tmp_path / 'b.jpg')})
+    (success, errors), results = run_stream([line], timeout=1e-6)
+    assert (success, errors) == (0, 1)
+    assert results[0]['error'].startswith("карантин (timeout)")
+
+
+def test_new_lines_start_while_earlier_tasks_run(tmp_path, monkeypatch):
+    make_image(tmp_path / 'a.jpg', (800, 600))
+    real_run = image_resizer.ImageResizer.run_job_task
+
+    def slow_run(self, task):
+        time.sleep(1)
+        return real_run(self, task)
+
+    # Процеси пулу створюються форком уже з цією заміною
+    monkeypatch.setattr(image_resizer.ImageResizer, 'run_job_task', slow_run)
+
+    def source():
+        for name in ('b', 'c'):
+            yield json.dumps({'src': str(tmp_path / 'a.jpg'), 'dst': str(tmp_path / f'{name}.jpg')})
+            time.sleep(0.2)  # наступний рядок надходить, поки перший ще обробляється
+
+    started = time.monotonic()
+    (success, errors), results = run_stream(source(), workers=2)
+    assert (success, errors) == (2, 0)
+    assert [result['line'] for result in results] == [1, 2]
+    # Задачі перекриваються, а не йдуть одна за одною
+    assert time.monotonic() - started < 1.9
+
+
+def cli(*args, stdin='', cwd=None):
+    return subprocess.run([sys.executable, SCRIPT, *args], input=stdin, cwd=cwd,
+                          capture_output=True, text=True, timeout=120)
+
+
+def test_cli_stdin_stream_and_exit_codes(tmp_path):
+    make_image(tmp_path / 'a.jpg')
+    good = json.dumps({'src': 'a.jpg', 'dst': 'out/a.jpg', 'w': 64, 'h': 64}) + '\n'
+    done = cli('--jobs', '-', '--workers', '1', stdin=good, cwd=tmp_path)
+    assert done.returncode == 0
+    # stdout - лише JSON-рядки, решта - у stderr
+    assert [json.loads(line)['ok'] for line in done.stdout.splitlines()] == [True]
+    assert '🏁' in done.stderr
+
+    failed = cli('--jobs', '-', '--workers', '1', stdin=good + '{}\n', cwd=tmp_path)
+    assert failed.returncode == 1
+    assert cli('--jobs', '-', '--workers', '0', cwd=tmp_path).returncode == 2
+    assert cli('--jobs', str(tmp_path / 'nope.jsonl')).returncode == 2
+
+
+def test_cli_flags_apply_in_interactive_mode(tmp_path):
+    for i in range(2):
+        make_image(tmp_path / 'in' / f'img{i}.jpg')
+    answers = '\n'.join([str(tmp_path / 'in'), 'n', '', '', '1', '1', '', '', '', '']) + '\n'
+    done = cli('--encoder', 'fast', '--workers', '1', stdin=answers)
+    assert done.returncode == 0, done.stderr
+    assert "профіль кодувача" not in done.stdout
+    assert "Кількість процесів" not in done.stdout
+    assert "jpeg (fast)" in done.stdout
+    assert len(list((tmp_path / 'in' / 'resized').glob('*_resized.jpg'))) == 2
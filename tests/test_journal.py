@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from conftest import image_resizer, make_image
+
+ResizeJournal = image_resizer.ResizeJournal
+
+
+def interrupted_run(photos, output, resizer, done=('img0.jpg', 'img1.jpg')):
+    """Журнал, який лишив би запуск, убитий після обробки файлів done"""
+    params = resizer.cache_params('contain')
+    journal = ResizeJournal(str(output), params)
+    for name in done:
+        target = str(output / resizer.output_name(name[:-4]))
+        assert resizer.resize_one(str(photos / name), target)
+        journal.record(str(photos / name), {'outputs': [target]})
+    journal.close()
+    return params
+
+
+def test_resume_skips_journaled_files(photos, tmp_path):
+    output = tmp_path / 'out'
+    output.mkdir()
+    resizer = image_resizer.ImageResizer(160, 120)
+    interrupted_run(photos, output, resizer)
+    assert ResizeJournal.exists(str(output))
+
+    success, errors = resizer.process_folder(str(photos), str(output), resume=True)
+    assert resizer.stats['resumed'] == resizer.stats['skipped'] == 2
+    assert resizer.stats['processed'] == 5  # img2..img5 + битий файл
+    assert (success, errors) == (4, 1)
+    # Після успішного завершення журнал не потрібен
+    assert not ResizeJournal.exists(str(output))
+
+
+def test_journal_with_other_params_is_ignored(photos, tmp_path):
+    output = tmp_path / 'out'
+    output.mkdir()
+    interrupted_run(photos, output, image_resizer.ImageResizer(160, 120))
+    resizer = image_resizer.ImageResizer(100, 100)
+    resizer.process_folder(str(photos), str(output), resume=True)
+    assert resizer.stats['resumed'] == 0
+    assert resizer.stats['processed'] == 7
+
+
+def test_torn_last_line_is_ignored(photos, tmp_path):
+    output = tmp_path / 'out'
+    output.mkdir()
+    resizer = image_resizer.ImageResizer(160, 120)
+    params = interrupted_run(photos, output, resizer)
+    with open(output / ResizeJournal.FILENAME, 'a', encoding='utf-8') as f:
+        f.write('{"source": "/x/img2.jp')
+    journal = ResizeJournal(str(output), params, resume=True)
+    assert journal.resumed == 2
+    journal.finish()
+
+
+def test_sync_fsyncs_own_files_only(tmp_path, monkeypatch):
+    def no_global_sync():
+        raise AssertionError("os.sync викликано")
+
+    monkeypatch.setattr(os, 'sync', no_global_sync, raising=False)
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: (synced.append(fd), real_fsync(fd)))
+    monkeypatch.setattr(ResizeJournal, 'SYNC_INTERVAL', 0)
+
+    output = make_image(tmp_path / 'a_resized.jpg')
+    journal = ResizeJournal(str(tmp_path), {'width': 1})
+    synced.clear()
+    journal.record(str(tmp_path / 'a.jpg'), {'outputs': [str(output)]})
+    # Результат, його папка і журнал
+    assert len(synced) == 3
+    journal.close()
+
+
+def test_atomic_write_leaves_no_partial_file(tmp_path):
+    target = tmp_path / 'out.jpg'
+    image_resizer.atomic_write(str(target), b'old')
+
+    with pytest.raises(TypeError):
+        image_resizer.atomic_write(str(target), object())
+    assert target.read_bytes() == b'old'
+    assert os.listdir(tmp_path) == ['out.jpg']
+
+
+def test_temp_names_are_unique(tmp_path):
+    target = str(tmp_path / 'out.jpg')
+    assert image_resizer.temp_path(target) != image_resizer.temp_path(target)
+    # Два записи того самого файлу одночасно: кожен у свій тимчасовий файл
+    first = open(image_resizer.temp_path(target), 'wb')
+    image_resizer.atomic_write(target, b'second')
+    first.close()
+    assert open(target, 'rb').read() == b'second'
+
+
+def test_resume_sweeps_stale_temp_files(photos, tmp_path):
+    output = tmp_path / 'out'
+    (output / 'sub').mkdir(parents=True)
+    resizer = image_resizer.ImageResizer(160, 120)
+    interrupted_run(photos, output, resizer)
+    # Тимчасові файли процесу, вбитого посеред запису
+    stale = [output / 'img2_resized.jpg.99999999-0123456789ab.tmp',
+             output / 'sub' / '.resize-manifest.json.99999999-ba9876543210.tmp']
+    for path in stale:
+        path.write_bytes(b'partial')
+    (output / 'notes.tmp').write_bytes(b'not ours')
+
+    resizer.process_folder(str(photos), str(output), resume=True)
+    assert not any(path.exists() for path in stale)
+    assert (output / 'notes.tmp').exists()
@@ -0,0 +1,45 @@
+import pytest
+from PIL import Image
+
+from conftest import image_resizer, make_image
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = make_image(tmp_path / 'src.png', (1021, 767), fmt='PNG')
+    noise = Image.effect_noise((1021, 767), 60).convert('RGB')
+    with Image.open(path) as img:
+        return Image.blend(img.convert('RGB'), noise, 0.3)
+
+
+@pytest.mark.parametrize('size, box', [
+    ((320, 240), None),
+    ((211, 97), None),
+    ((300, 300), (130.5, 0, 897.5, 767)),
+])
+def test_matches_pillow_lanczos_within_tolerance(source, size, box):
+    resampler = image_resizer.NumpyResampler()
+    result = resampler.resize(resampler.stack([source, source]), size, box)[0]
+    expected = np.asarray(source.resize(size, Image.LANCZOS, box))
+    assert result.shape == expected.shape
+    diff = np.abs(result.astype(int) - expected.astype(int))
+    assert diff.max() <= image_resizer.NumpyResampler.TOLERANCE
+
+
+def test_numpy_engine_folder(photos):
+    resizer = image_resizer.ImageResizer(160, 120, engine='numpy')
+    assert resizer.process_folder(str(photos), incremental=False) == (6, 1)
+    with Image.open(photos / 'resized' / 'img3_resized.jpg') as img:
+        assert img.size == (160, 120)
+
+
+def test_reference_cover_group_uses_box(source):
+    resizer = image_resizer.ImageResizer(300, 200, engine='numpy', reference_quality=True)
+    new_sizes = [resizer._scaled_size(*source.size, True, (300, 200))]
+    frames = resizer._render_stack([source, source], new_sizes, [(300, 200)], 'cover', (0, 0, 0))
+    expected = np.asarray(source.resize((300, 200), Image.LANCZOS,
+                                        box=resizer._cover_box(source.size)))
+    diff = np.abs(frames[0][1].astype(int) - expected.astype(int))
+    assert diff.max() <= image_resizer.NumpyResampler.TOLERANCE
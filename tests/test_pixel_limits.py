@@ -0,0 +1,56 @@
+import pytest
+from PIL import Image
+
+from conftest import image_resizer, make_image
+
+PILLOW_LIMIT = Image.MAX_IMAGE_PIXELS
+
+
+def test_import_keeps_pillow_limit():
+    assert Image.MAX_IMAGE_PIXELS == PILLOW_LIMIT is not None
+
+
+@pytest.fixture
+def small_pillow_limit(monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 5000)
+
+
+def test_open_image_keeps_pillow_limit(tmp_path, small_pillow_limit):
+    # 90x100 = 9000 пікселів: між лімітом Pillow і його подвійним значенням
+    source = make_image(tmp_path / 'a.png', (90, 100))
+    with pytest.warns(Image.DecompressionBombWarning):
+        with image_resizer.open_image(str(source), 50000) as img:
+            assert img.size == (90, 100)
+    # 200x100 понад подвійний ліміт Pillow: не відкривається, ліміт не піднімається
+    bomb = make_image(tmp_path / 'b.png', (200, 100))
+    with pytest.raises(Image.DecompressionBombError):
+        image_resizer.open_image(str(bomb), 50000)
+    assert Image.MAX_IMAGE_PIXELS == 5000
+
+
+def test_engine_limit_is_enforced(tmp_path):
+    source = make_image(tmp_path / 'a.png', (200, 100))
+    with pytest.raises(Image.DecompressionBombError, match="перевищує ліміт"):
+        image_resizer.open_image(str(source), 15000)
+    resizer = image_resizer.ImageResizer(50, 50, max_pixels=15000)
+    assert not resizer.resize_one(str(source), str(tmp_path / 'out.jpg'))
+    assert image_resizer.ImageResizer(50, 50, max_pixels=50000).resize_one(
+        str(source), str(tmp_path / 'out.jpg'))
+    assert Image.MAX_IMAGE_PIXELS == PILLOW_LIMIT
+
+
+def test_oversized_file_is_quarantined_by_header(tmp_path):
+    make_image(tmp_path / 'in' / 'big.png', (300, 200))
+    make_image(tmp_path / 'in' / 'ok.png', (100, 100))
+    resizer = image_resizer.ImageResizer(50, 50, max_pixels=30000)
+    success, errors = resizer.process_folder(str(tmp_path / 'in'), incremental=False)
+    assert (success, errors) == (1, 1)
+    assert [item['reason'] for item in resizer.quarantine] == ['pixels']
+
+
+def test_pillow_refusal_is_quarantined(tmp_path, small_pillow_limit):
+    make_image(tmp_path / 'in' / 'big.png', (200, 100))
+    make_image(tmp_path / 'in' / 'ok.png', (50, 50))
+    resizer = image_resizer.ImageResizer(20, 20)
+    assert resizer.process_folder(str(tmp_path / 'in'), incremental=False) == (1, 1)
+    assert [item['reason'] for item in resizer.quarantine] == ['pixels']
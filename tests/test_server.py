@@ -0,0 +1,114 @@
+import json
+import os
+import signal
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import load_module, make_image
+
+server = load_module('image_resizer_server', 'image-resizer-server.py')
+
+
+@pytest.fixture
+def service(tmp_path):
+    make_image(tmp_path / 'a.jpg', (800, 600))
+    make_image(tmp_path / 'b.jpg', (600, 800))
+    service = server.ResizeService(server.image_resizer.ImageResizer(), str(tmp_path),
+                                   workers=1, memory_mb=16, timeout=60)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def http(service):
+    httpd = server.make_server(service, port=0, quiet=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+
+    def get(query):
+        with urllib.request.urlopen(f"http://{host}:{port}{query}", timeout=60) as response:
+            return response.status, dict(response.headers), response.read()
+
+    yield get
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_resize_and_memory_cache(service):
+    data, where = service.resize('a.jpg', 320, 240)
+    assert where == 'miss' and data[:2] == b'\xff\xd8'
+    assert service.resize('a.jpg', 320, 240) == (data, 'memory')
+
+
+def test_source_outside_root_is_forbidden(service):
+    with pytest.raises(server.ServiceError) as error:
+        service.resize('../etc/passwd', 10, 10)
+    assert error.value.status == 403
+
+
+def test_pool_is_rebuilt_after_worker_is_killed(service):
+    service.resize('a.jpg', 100, 100)
+    for pid in list(service.executor._processes):
+        os.kill(pid, signal.SIGKILL)
+    data, where = service.resize('b.jpg', 100, 100)
+    assert where == 'miss' and data
+    assert service.stats()['pool_restarts'] == 1
+
+
+def test_http_errors_are_json(http):
+    status, headers, body = http('/resize?src=a.jpg&w=64&h=64')
+    assert status == 200 and headers['X-Cache'] == 'miss'
+    with pytest.raises(urllib.error.HTTPError) as error:
+        http('/resize?src=a.jpg&w=0&h=64')
+    assert error.value.code == 400
+    assert 'error' in json.loads(error.value.read())
+
+
+def test_unexpected_error_returns_500(http, service, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(service, 'resize', broken)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        http('/resize?src=a.jpg&w=64&h=64')
+    assert error.value.code == 500
+    assert json.loads(error.value.read()) == {'error': "внутрішня помилка сервісу"}
+
+
+def test_hung_resize_recycles_pool_and_quarantines_source(tmp_path, monkeypatch):
+    engine = server.image_resizer
+    make_image(tmp_path / 'hang.jpg', (800, 600))
+    make_image(tmp_path / 'a.jpg', (800, 600))
+    real_render = engine.ImageResizer.render_task
+
+    def render_task(self, task):
+        if task[0].endswith('hang.jpg'):
+            time.sleep(60)
+        return real_render(self, task)
+
+    # Процеси пулу створюються форком уже з цією заміною
+    monkeypatch.setattr(engine.ImageResizer, 'render_task', render_task)
+    service = server.ResizeService(engine.ImageResizer(), str(tmp_path), workers=1,
+                                   memory_mb=16, timeout=1)
+    try:
+        hung = set(service.executor._processes)
+        with pytest.raises(server.ServiceError) as error:
+            service.resize('hang.jpg', 100, 100)
+        assert error.value.status == 504
+        # Завислий процес зупинено, пул новий - інші запити обробляються
+        assert not hung & set(service.executor._processes)
+        assert service.resize('a.jpg', 100, 100)[1] == 'miss'
+        started = time.monotonic()
+        with pytest.raises(server.ServiceError) as error:
+            service.resize('hang.jpg', 64, 64)
+        assert error.value.status == 422
+        assert time.monotonic() - started < 1
+        stats = service.stats()
+        assert (stats['timeouts'], stats['quarantine'], stats['pool_restarts']) == (1, 1, 1)
+    finally:
+        service.close()
@@ -0,0 +1,56 @@
+import os
+import time
+
+from conftest import image_resizer, make_image
+
+FolderWatcher = image_resizer.FolderWatcher
+
+
+def make_watcher(folder, resizer=None, **kwargs):
+    return FolderWatcher(resizer or image_resizer.ImageResizer(50, 50), str(folder),
+                         str(folder.parent / 'out'), settle=0, **kwargs)
+
+
+def test_poll_stats_only_a_slice_of_directories(tmp_path, monkeypatch):
+    monkeypatch.setattr(FolderWatcher, 'DIRS_PER_POLL', 2)
+    monkeypatch.setattr(FolderWatcher, 'RACY_SECONDS', 0)
+    folder = tmp_path / 'in'
+    for i in range(6):
+        (folder / f'dir{i}').mkdir(parents=True)
+    watcher = make_watcher(folder)
+    watcher.poll()
+    assert watcher.status()['directories'] == 7
+
+    time.sleep(0.05)
+    make_image(folder / 'dir4' / 'new.jpg', (80, 60))
+    for _ in range(8):
+        before = watcher.dir_stats
+        queued = watcher.poll()
+        assert watcher.dir_stats - before <= 2
+        if queued:
+            break
+    assert list(watcher.ready) == [str(folder / 'dir4' / 'new.jpg')]
+
+
+def test_quarantine_is_bounded_and_profile_is_reset(tmp_path, monkeypatch):
+    monkeypatch.setattr(FolderWatcher, 'QUARANTINE_SIZE', 2)
+    folder = tmp_path / 'in'
+    for i in range(4):
+        make_image(folder / f'big{i}.jpg', (400, 300))
+    resizer = image_resizer.ImageResizer(50, 50, profile=True, max_pixels=50000)
+    watcher = make_watcher(folder, resizer)
+    watcher.poll()  # файли знайдено, у чергу - на наступному кроці
+    watcher.tick()
+    quarantined = [entry['path'] for entry in resizer.quarantine]
+    assert len(quarantined) == 2
+    assert resizer.profile_records == []
+    assert os.path.exists(tmp_path / 'out' / resizer.PROFILE_REPORT)
+
+    # Файл замінили на придатний - він виходить з карантину
+    time.sleep(0.05)
+    make_image(quarantined[0], (100, 80))
+    watcher._dirty.add(str(folder))
+    watcher.poll()
+    watcher.tick()
+    assert [entry['path'] for entry in resizer.quarantine] == quarantined[1:]
+    assert watcher.status()['quarantined'] == 1